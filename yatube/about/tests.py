@@ -1,10 +1,12 @@
 from http import HTTPStatus
 
+from django.core.cache import cache
 from django.test import Client, TestCase
 
 
 class StaticURLTests(TestCase):
     def setUp(self):
+        cache.clear()
         self.guest_client = Client()
 
     def test_pages_exists_at_desired_location(self):
@@ -0,0 +1,164 @@
+"""Обработка статики при collectstatic: очистка CSS, сжатие картинок,
+заранее сжатые копии .gz и .br.
+
+Из CSS (STATIC_PURGE_CSS) удаляются правила, классы которых не
+встречаются в шаблонах: от Bootstrap остается то, что реально
+используется. Картинки JPEG и PNG уменьшаются до STATIC_IMAGE_MAX_SIZE
+и пересохраняются без метаданных. Brotli используется, если
+установлен пакет brotli.
+"""
+import gzip
+import io
+import os
+import re
+
+from django.conf import settings
+from PIL import Image
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Уже сжатые форматы повторно не сжимаются.
+INCOMPRESSIBLE = (
+    '.jpg', '.jpeg', '.png', '.gif', '.webp', '.ico', '.woff', '.woff2',
+    '.gz', '.br', '.zip',
+)
+IMAGE_FORMATS = {'.jpg': 'JPEG', '.jpeg': 'JPEG', '.png': 'PNG'}
+# Копия сохраняется, только если она заметно меньше оригинала.
+MIN_RATIO = 0.95
+
+WORD_RE = re.compile(r'[A-Za-z_][\w-]*')
+CLASS_RE = re.compile(r'\.(-?[A-Za-z_][\w-]*)')
+COMMENT_RE = re.compile(r'/\*.*?\*/', re.S)
+LICENSE_RE = re.compile(r'/\*!.*?\*/', re.S)
+# Правила внутри этих at-правил проверяются по отдельности.
+NESTED_AT_RULES = ('@media', '@supports', '@document')
+
+
+def used_words(directories, extensions=('.html', '.txt', '.py')):
+    """Все слова из файлов шаблонов: кандидаты в имена CSS-классов."""
+    words = set(getattr(settings, 'STATIC_PURGE_SAFELIST', ()))
+    for directory in directories:
+        for root, _, files in os.walk(directory):
+            for name in files:
+                if not name.endswith(extensions):
+                    continue
+                with open(os.path.join(root, name),
+                          encoding='utf-8', errors='ignore') as file:
+                    words.update(WORD_RE.findall(file.read()))
+    return words
+
+
+def _statements(css):
+    """Делит CSS верхнего уровня на пары (заголовок, тело или None)."""
+    start = depth = 0
+    body_start = None
+    quote = None
+    for position, char in enumerate(css):
+        if quote:
+            if char == quote and css[position - 1] != '\\':
+                quote = None
+        elif char in '"\'':
+            quote = char
+        elif char == '{':
+            if depth == 0:
+                body_start = position
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                yield (css[start:body_start].strip(),
+                       css[body_start + 1:position])
+                start = position + 1
+        elif char == ';' and depth == 0:
+            yield css[start:position].strip(), None
+            start = position + 1
+
+
+def _split_selectors(prelude):
+    """Делит список селекторов по запятым вне скобок."""
+    selectors, depth, start = [], 0, 0
+    for position, char in enumerate(prelude):
+        if char in '([':
+            depth += 1
+        elif char in ')]':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            selectors.append(prelude[start:position].strip())
+            start = position + 1
+    selectors.append(prelude[start:].strip())
+    return selectors
+
+
+def _selector_used(selector, words):
+    return all(name in words for name in CLASS_RE.findall(selector))
+
+
+def purge_css(css, words):
+    """Оставляет правила, все классы которых есть в words.
+
+    Комментарии удаляются, кроме лицензионных /*! ... */.
+    """
+    licenses = '\n'.join(LICENSE_RE.findall(css))
+    return licenses + _purge(COMMENT_RE.sub('', css), words)
+
+
+def _purge(css, words):
+    output = []
+    for prelude, body in _statements(css):
+        if body is None:
+            output.append(prelude + ';')
+        elif prelude.startswith(NESTED_AT_RULES):
+            inner = _purge(body, words)
+            if inner:
+                output.append(f'{prelude}{{{inner}}}')
+        elif prelude.startswith('@'):
+            # @font-face, @keyframes и прочие сохраняются целиком.
+            output.append(f'{prelude}{{{body}}}')
+        else:
+            selectors = [selector for selector in _split_selectors(prelude)
+                         if _selector_used(selector, words)]
+            if selectors:
+                output.append(f'{",".join(selectors)}{{{body}}}')
+    return ''.join(output)
+
+
+def optimize_image(data, extension):
+    """Уменьшенная и пересохраненная картинка или None, если не вышло
+    меньше оригинала.
+    """
+    image_format = IMAGE_FORMATS.get(extension.lower())
+    if image_format is None:
+        return None
+    image = Image.open(io.BytesIO(data))
+    max_size = settings.STATIC_IMAGE_MAX_SIZE
+    if max(image.size) > max_size:
+        image.thumbnail((max_size, max_size), Image.LANCZOS)
+    output = io.BytesIO()
+    if image_format == 'JPEG':
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        image.save(output, image_format, optimize=True, progressive=True,
+                   quality=settings.STATIC_JPEG_QUALITY)
+    else:
+        image.save(output, image_format, optimize=True)
+    optimized = output.getvalue()
+    if len(optimized) >= len(data):
+        return None
+    return optimized
+
+
+def compressible(name):
+    return not name.lower().endswith(INCOMPRESSIBLE)
+
+
+def compressed_copies(data):
+    """Словарь {расширение: сжатые данные} для .gz и .br."""
+    copies = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        copies['.br'] = brotli.compress(data)
+    return {extension: compressed
+            for extension, compressed in copies.items()
+            if len(compressed) < len(data) * MIN_RATIO}
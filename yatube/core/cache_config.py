@@ -0,0 +1,77 @@
+"""Настройки кеша из окружения.
+
+CACHE_URL выбирает общий для всех процессов бэкенд:
+- locmem:// — память процесса (по умолчанию, для разработки);
+- file:///var/tmp/yatube_cache — файлы в каталоге;
+- db://yatube_cache — таблица в основной базе (createcachetable);
+- memcached://host:11211,host2:11211 — нужен pylibmc или
+  python-memcached;
+- redis://host:6379/0 — нужен django-redis.
+Параметры timeout, max_entries и key_prefix передаются в query-строке.
+Модуль импортируется из settings.py.
+"""
+from importlib.util import find_spec
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'db': 'django.core.cache.backends.db.DatabaseCache',
+    'dummy': 'django.core.cache.backends.dummy.DummyCache',
+}
+# Клиенты memcached в порядке предпочтения: модуль и бэкенд Django.
+MEMCACHED_BACKENDS = (
+    ('pylibmc', 'django.core.cache.backends.memcached.PyLibMCCache'),
+    ('memcache', 'django.core.cache.backends.memcached.MemcachedCache'),
+)
+REDIS_BACKEND = 'django_redis.cache.RedisCache'
+
+
+def _installed(module):
+    return find_spec(module) is not None
+
+
+def _memcached_backend():
+    for module, backend in MEMCACHED_BACKENDS:
+        if _installed(module):
+            return backend
+    raise ValueError('Для memcached нужен пакет pylibmc или '
+                     'python-memcached')
+
+
+def parse_cache_url(url):
+    """Словарь для CACHES из URL кеша."""
+    parts = urlsplit(url)
+    scheme = parts.scheme
+    params = dict(parse_qsl(parts.query))
+    if scheme in ('locmem', 'dummy'):
+        config = {'BACKEND': BACKENDS[scheme],
+                  'LOCATION': parts.netloc}
+    elif scheme == 'file':
+        config = {'BACKEND': BACKENDS[scheme],
+                  'LOCATION': unquote(parts.path)}
+    elif scheme == 'db':
+        config = {'BACKEND': BACKENDS[scheme],
+                  'LOCATION': unquote(parts.netloc or parts.path.strip('/'))}
+    elif scheme == 'memcached':
+        config = {'BACKEND': _memcached_backend(),
+                  'LOCATION': parts.netloc.split(',')}
+    elif scheme in ('redis', 'rediss'):
+        if not _installed('django_redis'):
+            raise ValueError('Для redis нужен пакет django-redis')
+        config = {'BACKEND': REDIS_BACKEND,
+                  'LOCATION': url.split('?')[0]}
+    else:
+        raise ValueError(f'Неизвестный бэкенд кеша: {scheme}')
+    if not config['LOCATION'] and scheme not in ('locmem', 'dummy'):
+        raise ValueError(f'Не указано расположение кеша: {url}')
+    if 'timeout' in params:
+        timeout = params.pop('timeout')
+        config['TIMEOUT'] = None if timeout == 'none' else int(timeout)
+    if 'key_prefix' in params:
+        config['KEY_PREFIX'] = params.pop('key_prefix')
+    if 'max_entries' in params:
+        config['OPTIONS'] = {'MAX_ENTRIES': int(params.pop('max_entries'))}
+    if params:
+        raise ValueError(f'Неизвестные параметры кеша: {", ".join(params)}')
+    return config
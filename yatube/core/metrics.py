@@ -0,0 +1,248 @@
+"""Метрики запросов в памяти процесса в текстовом формате Prometheus.
+
+Гистограммы и счетчики хранятся в словарях под блокировкой и живут,
+пока жив процесс; каждый воркер отдает свои значения, суммирует их
+сам Prometheus. Данные текущего запроса (SQL, шаблоны, кеш) копятся
+в thread-local объекте RequestStats, который заводит MetricsMiddleware.
+"""
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (
+    1024, 4 * 1024, 16 * 1024, 64 * 1024, 256 * 1024, 1024 * 1024,
+    4 * 1024 * 1024)
+
+_local = threading.local()
+
+
+class RequestStats:
+    """Сводка одного запроса."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    @property
+    def duration(self):
+        return time.perf_counter() - self.started
+
+    def sql_wrapper(self, execute, sql, params, many, context):
+        """Обертка connection.execute_wrapper: считает запросы и время."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.sql_time += time.perf_counter() - started
+
+
+def start_request():
+    _local.stats = RequestStats()
+    return _local.stats
+
+
+def finish_request():
+    stats = getattr(_local, 'stats', None)
+    _local.stats = None
+    return stats
+
+
+def current():
+    """Сводка текущего запроса или None, если он не замеряется."""
+    return getattr(_local, 'stats', None)
+
+
+def record_cache(hit):
+    """Отмечает попадание или промах кеша в текущем запросе."""
+    stats = current()
+    if stats is None:
+        return
+    if hit:
+        stats.cache_hits += 1
+    else:
+        stats.cache_misses += 1
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets, labels):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self.labels = tuple(labels)
+        self.series = {}
+
+    def observe(self, label_values, value):
+        series = self.series.get(label_values)
+        if series is None:
+            series = self.series[label_values] = {
+                'buckets': [0] * (len(self.buckets) + 1),
+                'sum': 0.0,
+                'count': 0,
+            }
+        series['buckets'][bisect_left(self.buckets, value)] += 1
+        series['sum'] += value
+        series['count'] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}',
+                 f'# TYPE {self.name} histogram']
+        for label_values, series in sorted(self.series.items()):
+            base = _labels(self.labels, label_values)
+            total = 0
+            for bound, count in zip(self.buckets + ('+Inf',),
+                                    series['buckets']):
+                total += count
+                le = _labels(self.labels + ('le',),
+                             label_values + (_number(bound),))
+                lines.append(f'{self.name}_bucket{le} {total}')
+            lines.append(f'{self.name}_sum{base} {_number(series["sum"])}')
+            lines.append(f'{self.name}_count{base} {series["count"]}')
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text, labels):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.series = defaultdict(int)
+
+    def inc(self, label_values, value=1):
+        self.series[label_values] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}',
+                 f'# TYPE {self.name} counter']
+        for label_values, value in sorted(self.series.items()):
+            lines.append(
+                f'{self.name}{_labels(self.labels, label_values)} {value}')
+        return lines
+
+
+def _number(value):
+    if isinstance(value, float):
+        return repr(round(value, 6))
+    return str(value)
+
+
+def _escape(value):
+    return (str(value).replace('\\', r'\\').replace('\n', r'\n')
+            .replace('"', r'\"'))
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(f'{name}="{_escape(value)}"'
+                     for name, value in zip(names, values))
+    return '{' + pairs + '}'
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = Counter(
+            'yatube_requests_total', 'Обработано запросов',
+            ('view', 'method', 'status'))
+        self.sampled = Counter(
+            'yatube_requests_sampled_total', 'Замерено запросов',
+            ('view',))
+        self.cache_hits = Counter(
+            'yatube_cache_hits_total', 'Попадания кеша фрагментов',
+            ('view',))
+        self.cache_misses = Counter(
+            'yatube_cache_misses_total', 'Промахи кеша фрагментов',
+            ('view',))
+        self.duration = Histogram(
+            'yatube_request_duration_seconds', 'Время ответа',
+            DURATION_BUCKETS, ('view',))
+        self.sql_time = Histogram(
+            'yatube_request_sql_seconds', 'Время SQL-запросов',
+            DURATION_BUCKETS, ('view',))
+        self.sql_queries = Histogram(
+            'yatube_request_sql_queries', 'Число SQL-запросов',
+            QUERY_BUCKETS, ('view',))
+        self.template_time = Histogram(
+            'yatube_request_template_seconds', 'Время рендеринга шаблонов',
+            DURATION_BUCKETS, ('view',))
+        self.response_size = Histogram(
+            'yatube_response_size_bytes', 'Размер ответа',
+            SIZE_BUCKETS, ('view',))
+
+    def count(self, view, method, status):
+        with self.lock:
+            self.requests.inc((view, method, str(status)))
+
+    def observe(self, view, stats, duration, size):
+        key = (view,)
+        with self.lock:
+            self.sampled.inc(key)
+            self.duration.observe(key, duration)
+            self.sql_time.observe(key, stats.sql_time)
+            self.sql_queries.observe(key, stats.queries)
+            self.template_time.observe(key, stats.template_time)
+            if size is not None:
+                self.response_size.observe(key, size)
+            if stats.cache_hits:
+                self.cache_hits.inc(key, stats.cache_hits)
+            if stats.cache_misses:
+                self.cache_misses.inc(key, stats.cache_misses)
+
+    def render(self):
+        with self.lock:
+            lines = []
+            for metric in (self.requests, self.sampled, self.duration,
+                           self.sql_queries, self.sql_time,
+                           self.template_time, self.response_size,
+                           self.cache_hits, self.cache_misses):
+                lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def reset():
+    global registry
+    registry = Registry()
+
+
+_patch_lock = threading.Lock()
+_template_timer_installed = False
+
+
+def install_template_timer():
+    """Оборачивает рендеринг шаблонов бэкенда Django замером времени.
+
+    Засекается только внешний render(): include и extends выполняются
+    внутри него и второй раз не считаются.
+    """
+    global _template_timer_installed
+    from django.template.backends.django import Template
+
+    with _patch_lock:
+        if _template_timer_installed:
+            return
+        original = Template.render
+
+        def render(self, context=None, request=None):
+            stats = current()
+            if stats is None:
+                return original(self, context, request)
+            started = time.perf_counter()
+            try:
+                return original(self, context, request)
+            finally:
+                stats.template_time += time.perf_counter() - started
+
+        Template.render = render
+        _template_timer_installed = True
@@ -0,0 +1,206 @@
+import json
+import logging
+import mimetypes
+import os
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date
+
+from . import metrics, replication
+
+logger = logging.getLogger('yatube.performance')
+
+
+class MetricsMiddleware:
+    """Собирает метрики запросов для страницы /metrics/.
+
+    Каждый запрос попадает в счетчик yatube_requests_total, а доля
+    METRICS_SAMPLE_RATE замеряется подробно: время ответа, число и время
+    SQL-запросов, рендеринг шаблонов, кеш фрагментов и размер ответа.
+    Замеренные запросы дольше METRICS_SLOW_REQUEST_MS пишутся в лог.
+    В отличие от debug_toolbar, работает без DEBUG.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        metrics.install_template_timer()
+
+    def __call__(self, request):
+        if not getattr(settings, 'METRICS_ENABLED', True):
+            return self.get_response(request)
+        rate = getattr(settings, 'METRICS_SAMPLE_RATE', 1.0)
+        if rate < 1 and random.random() >= rate:
+            response = self.get_response(request)
+            metrics.registry.count(
+                self._view_name(request), request.method,
+                response.status_code)
+            return response
+        stats = metrics.start_request()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(stats.sql_wrapper))
+                response = self.get_response(request)
+        finally:
+            metrics.finish_request()
+        self._record(request, response, stats)
+        return response
+
+    @staticmethod
+    def _view_name(request):
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return '<unresolved>'
+        return match.view_name
+
+    def _record(self, request, response, stats):
+        view = self._view_name(request)
+        duration = stats.duration
+        size = None if response.streaming else len(response.content)
+        registry = metrics.registry
+        registry.count(view, request.method, response.status_code)
+        registry.observe(view, stats, duration, size)
+        threshold = getattr(settings, 'METRICS_SLOW_REQUEST_MS', None)
+        if threshold is not None and duration * 1000 >= threshold:
+            logger.warning(
+                'Медленный запрос %s %s (%s): %.0f мс, SQL %d за %.0f мс, '
+                'шаблоны %.0f мс, кеш %d/%d, ответ %s байт',
+                request.method, request.get_full_path(), view,
+                duration * 1000, stats.queries, stats.sql_time * 1000,
+                stats.template_time * 1000, stats.cache_hits,
+                stats.cache_hits + stats.cache_misses,
+                '?' if size is None else size)
+
+
+class ReadYourWritesMiddleware:
+    """Закрепляет чтение за основной базой после записи.
+
+    Запрос, изменивший пост, комментарий или подписку, ставит cookie
+    со временем окончания окна REPLICA_PIN_SECONDS; пока окно не
+    истекло, запросы этого браузера читают из основной базы. Без
+    реплик cookie не ставится.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            until = float(request.COOKIES.get(replication.PIN_COOKIE, 0))
+        except ValueError:
+            until = 0
+        replication.start_request(pinned=until > time.time())
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = replication.finish_request()
+        if wrote and replication.replicas():
+            replication.beat()
+            seconds = settings.REPLICA_PIN_SECONDS
+            response.set_cookie(
+                replication.PIN_COOKIE, str(int(time.time() + seconds)),
+                max_age=seconds, httponly=True, samesite='Lax')
+        return response
+
+
+class StaticFile:
+    """Файл из STATIC_ROOT с заранее сжатыми копиями."""
+
+    def __init__(self, path, immutable):
+        self.path = path
+        stat = os.stat(path)
+        self.headers = {
+            'Last-Modified': http_date(stat.st_mtime),
+            'ETag': f'"{int(stat.st_mtime):x}-{stat.st_size:x}"',
+            'Cache-Control': (
+                f'public, max-age={settings.STATIC_IMMUTABLE_MAX_AGE}, '
+                'immutable' if immutable
+                else f'public, max-age={settings.STATIC_MAX_AGE}'),
+        }
+        content_type, _ = mimetypes.guess_type(path)
+        self.content_type = content_type or 'application/octet-stream'
+        self.encodings = {
+            encoding: path + extension
+            for encoding, extension in StaticFilesMiddleware.ENCODINGS
+            if os.path.exists(path + extension)
+        }
+        if self.encodings:
+            self.headers['Vary'] = 'Accept-Encoding'
+
+    def choose(self, accept_encoding):
+        """Путь к лучшей копии, которую примет клиент, и ее кодировка."""
+        accepted = {item.split(';')[0].strip()
+                    for item in accept_encoding.split(',')}
+        for encoding, path in self.encodings.items():
+            if encoding in accepted:
+                return path, encoding
+        return self.path, None
+
+
+class StaticFilesMiddleware:
+    """Отдает собранную статику из STATIC_ROOT прямо из WSGI.
+
+    Нужен, когда перед приложением нет CDN или веб-сервера со статикой.
+    Список файлов читается один раз при старте, поэтому запрос к
+    статике не трогает сессии, базу и URLconf. Файлы с хешем в имени
+    (из манифеста collectstatic) кешируются браузером навсегда, копии
+    .br и .gz отдаются клиентам, которые их принимают.
+    """
+
+    ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+    def __init__(self, get_response):
+        if not settings.STATIC_SERVE:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.files = self._scan(settings.STATIC_ROOT, settings.STATIC_URL)
+
+    @staticmethod
+    def _scan(root, url):
+        if not root or not os.path.isdir(root):
+            return {}
+        immutable = set()
+        manifest = os.path.join(root, 'staticfiles.json')
+        if os.path.exists(manifest):
+            with open(manifest) as file:
+                immutable = set(json.load(file).get('paths', {}).values())
+        compressed = tuple(
+            extension for _, extension in StaticFilesMiddleware.ENCODINGS)
+        files = {}
+        for directory, _, names in os.walk(root):
+            for name in names:
+                if name.endswith(compressed) or name == 'staticfiles.json':
+                    continue
+                path = os.path.join(directory, name)
+                relative = os.path.relpath(path, root).replace(os.sep, '/')
+                files[url + relative] = StaticFile(
+                    path, relative in immutable)
+        return files
+
+    def __call__(self, request):
+        static = self.files.get(request.path_info)
+        if static is None or request.method not in ('GET', 'HEAD'):
+            return self.get_response(request)
+        if request.META.get('HTTP_IF_NONE_MATCH') == static.headers['ETag']:
+            response = HttpResponseNotModified()
+        else:
+            path, encoding = static.choose(
+                request.META.get('HTTP_ACCEPT_ENCODING', ''))
+            if request.method == 'HEAD':
+                response = HttpResponse(content_type=static.content_type)
+            else:
+                response = FileResponse(
+                    open(path, 'rb'), content_type=static.content_type)
+            response['Content-Length'] = os.path.getsize(path)
+            if encoding:
+                response['Content-Encoding'] = encoding
+        for header, value in static.headers.items():
+            response[header] = value
+        return response
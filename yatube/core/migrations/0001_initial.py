@@ -0,0 +1,25 @@
+# Generated by Django 2.2.19 on 2026-10-18 00:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReplicationHeartbeat',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('updated', models.DateTimeField(verbose_name='Время отметки')),
+            ],
+            options={
+                'verbose_name': 'Отметка репликации',
+                'verbose_name_plural': 'Отметки репликации',
+            },
+        ),
+    ]
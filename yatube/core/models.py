@@ -11,3 +11,14 @@ class CreatedModel(models.Model):
 
     class Meta:
         abstract = True
+
+
+class ReplicationHeartbeat(models.Model):
+    """Отметка времени, которую основная база пишет, а реплики
+    получают с задержкой репликации (core/replication.py).
+    """
+    updated = models.DateTimeField('Время отметки')
+
+    class Meta:
+        verbose_name = 'Отметка репликации'
+        verbose_name_plural = 'Отметки репликации'
@@ -0,0 +1,106 @@
+"""Чтение своих записей и отставание реплик.
+
+После записи поста, комментария или подписки (модели из
+REPLICA_PIN_MODELS) текущий запрос и следующие запросы того же
+браузера в течение REPLICA_PIN_SECONDS читают из основной базы: иначе
+после редиректа пользователь может не увидеть только что созданное.
+Состояние запроса хранится в thread-local, окно закрепления — в cookie,
+которую ставит ReadYourWritesMiddleware.
+
+Отставание реплик меряется по отметке ReplicationHeartbeat: основная
+база обновляет ее не чаще раза в REPLICA_HEARTBEAT_SECONDS, а разница
+с отметкой, прочитанной из реплики, и есть задержка репликации.
+Реплики, отставшие больше REPLICA_MAX_LAG_SECONDS, не используются.
+"""
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .db import replica_aliases
+
+PIN_COOKIE = 'primary_pin'
+LAG_CACHE_KEY = 'replication:lag'
+HEARTBEAT_CACHE_KEY = 'replication:heartbeat'
+
+_state = threading.local()
+
+
+def replicas():
+    """Имена настроенных реплик (replica_0, replica_1, ...)."""
+    return replica_aliases(settings.DATABASES)
+
+
+def start_request(pinned=False):
+    _state.pinned = pinned
+    _state.wrote = False
+
+
+def finish_request():
+    wrote = getattr(_state, 'wrote', False)
+    _state.pinned = False
+    _state.wrote = False
+    return wrote
+
+
+def is_pinned():
+    return getattr(_state, 'pinned', False) or getattr(_state, 'wrote', False)
+
+
+def note_write(model):
+    """Отмечает запись модели; для моделей лент закрепляет чтение."""
+    if model._meta.label in settings.REPLICA_PIN_MODELS:
+        _state.wrote = True
+
+
+def beat(force=False):
+    """Обновляет отметку времени в основной базе (с интервалом),
+    если настроены реплики.
+    """
+    from .models import ReplicationHeartbeat
+
+    if not replicas() and not force:
+        return
+    interval = settings.REPLICA_HEARTBEAT_SECONDS
+    if not force and not cache.add(HEARTBEAT_CACHE_KEY, 1, interval):
+        return
+    heartbeats = ReplicationHeartbeat.objects.using('default')
+    now = timezone.now()
+    if not heartbeats.filter(pk=1).update(updated=now):
+        heartbeats.create(pk=1, updated=now)
+
+
+def lag(alias):
+    """Отставание базы alias от основной в секундах или None."""
+    from .models import ReplicationHeartbeat
+
+    primary = ReplicationHeartbeat.objects.using('default').filter(
+        pk=1).values_list('updated', flat=True).first()
+    replica = ReplicationHeartbeat.objects.using(alias).filter(
+        pk=1).values_list('updated', flat=True).first()
+    if primary is None:
+        return None
+    if replica is None:
+        return float('inf')
+    return max((primary - replica).total_seconds(), 0.0)
+
+
+def replica_lags():
+    """Отставание всех реплик, пересчитывается раз в интервал отметок."""
+    lags = cache.get(LAG_CACHE_KEY)
+    if lags is None:
+        lags = {alias: lag(alias) for alias in replicas()}
+        cache.set(LAG_CACHE_KEY, lags, settings.REPLICA_HEARTBEAT_SECONDS)
+    return lags
+
+
+def healthy_replicas():
+    """Реплики, отставшие не больше REPLICA_MAX_LAG_SECONDS."""
+    aliases = replicas()
+    if not aliases:
+        return []
+    limit = settings.REPLICA_MAX_LAG_SECONDS
+    lags = replica_lags()
+    return [alias for alias in aliases
+            if lags.get(alias) is None or lags[alias] <= limit]
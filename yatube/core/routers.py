@@ -0,0 +1,38 @@
+import random
+
+from . import replication
+
+
+class PrimaryReplicaRouter:
+    """Чтение моделей лент из реплик, все записи — в основную базу.
+
+    Реплики берутся из DATABASES (replica_0, replica_1, ...); если их
+    нет, все идет в default. Пользователи, сессии и прочие таблицы
+    читаются из основной базы, чтобы вход и смена пароля не зависели
+    от задержки репликации. После записи поста, комментария или
+    подписки чтение закрепляется за основной базой (core/replication.py),
+    отставшие реплики пропускаются.
+    """
+
+    replicated_apps = ('posts',)
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label not in self.replicated_apps:
+            return 'default'
+        if replication.is_pinned():
+            return 'default'
+        replicas = replication.healthy_replicas()
+        if not replicas:
+            return 'default'
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        replication.note_write(model)
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики содержат те же данные, что и основная база.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
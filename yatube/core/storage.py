@@ -0,0 +1,70 @@
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+from . import assets
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Статика с хешем содержимого в имени и сжатыми копиями.
+
+    Перед хешированием collectstatic очищает CSS из STATIC_PURGE_CSS и
+    оптимизирует картинки в STATIC_ROOT, после — кладет рядом с файлами
+    копии .gz и .br для StaticFilesMiddleware или веб-сервера.
+    """
+
+    manifest_strict = False
+
+    def stored_name(self, name):
+        # Пока collectstatic не запускался (разработка, тесты),
+        # манифеста нет и ссылки ведут на исходные имена.
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        if dry_run:
+            yield from super().post_process(paths, dry_run, **options)
+            return
+        paths = dict(paths)
+        words = None
+        for name, (storage, path) in list(paths.items()):
+            extension = os.path.splitext(name)[1].lower()
+            purge = name in settings.STATIC_PURGE_CSS
+            if not purge and extension not in assets.IMAGE_FORMATS:
+                continue
+            # Читаем исходник, а не копию в STATIC_ROOT: повторный
+            # collectstatic не пережимает картинку еще раз.
+            with storage.open(path) as file:
+                data = file.read()
+            if purge:
+                if words is None:
+                    words = assets.used_words(settings.STATIC_PURGE_SOURCES)
+                prepared = assets.purge_css(data.decode(), words).encode()
+            else:
+                prepared = assets.optimize_image(data, extension)
+            if prepared is not None:
+                self._write(name, prepared)
+                # Хеш считается по обработанной копии в STATIC_ROOT.
+                paths[name] = (self, name)
+        yield from super().post_process(paths, dry_run, **options)
+        self.compress()
+
+    def _write(self, name, data):
+        with open(self.path(name), 'wb') as file:
+            file.write(data)
+
+    def compress(self):
+        """Сжатые копии для всех текстовых файлов в STATIC_ROOT."""
+        for root, _, files in os.walk(self.location):
+            for filename in files:
+                if not assets.compressible(filename):
+                    continue
+                path = os.path.join(root, filename)
+                with open(path, 'rb') as file:
+                    data = file.read()
+                for extension, compressed in assets.compressed_copies(
+                        data).items():
+                    with open(path + extension, 'wb') as file:
+                        file.write(compressed)
@@ -0,0 +1,412 @@
+"""JSON API для постов, групп, комментариев и подписок.
+
+Списки листаются курсором (CursorPaginator), набор полей задается
+параметром ?fields=, автор и группа встраиваются в объект и
+подтягиваются тем же запросом через select_related. Ответ со списком
+отдается потоком: объекты сериализуются по одному, без общего словаря
+на всю страницу.
+
+Читать может любой, писать — пользователь с сессией (с CSRF-токеном)
+или с HTTP Basic авторизацией.
+"""
+import base64
+import binascii
+import json
+from functools import wraps
+
+from django.contrib.auth import authenticate
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import (HttpResponse, JsonResponse, QueryDict,
+                         StreamingHttpResponse)
+from django.middleware.csrf import CsrfViewMiddleware
+from django.urls import reverse
+from django.views.decorators.csrf import csrf_exempt
+
+from . import throttle, thumbnails
+from .forms import CommentForm, PostForm
+from .models import Follow, Group, Post, User
+from .paginator import CursorPaginator
+
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+AUTHOR_COLUMNS = ('username', 'first_name', 'last_name')
+GROUP_COLUMNS = ('slug', 'title')
+
+# Поле ответа -> колонки, которые нужно загрузить для него.
+POST_FIELDS = {
+    'id': (),
+    'text': ('text',),
+    'pub_date': ('pub_date',),
+    'image': ('image',),
+    'comments_count': ('comments_count',),
+    'author': tuple(f'author__{name}' for name in AUTHOR_COLUMNS),
+    'group': tuple(f'group__{name}' for name in GROUP_COLUMNS),
+}
+COMMENT_FIELDS = {
+    'id': (),
+    'post': ('post_id',),
+    'text': ('text',),
+    'created': ('created',),
+    'author': tuple(f'author__{name}' for name in AUTHOR_COLUMNS),
+}
+GROUP_FIELDS = {
+    'id': (),
+    'slug': ('slug',),
+    'title': ('title',),
+    'description': ('description',),
+    'posts_count': ('posts_count',),
+}
+
+
+class ApiError(Exception):
+    def __init__(self, status, detail, **extra):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+        self.extra = extra
+
+
+def _error_response(error):
+    response = JsonResponse(
+        {'detail': error.detail, **error.extra}, status=error.status)
+    if error.status == 401:
+        response['WWW-Authenticate'] = 'Basic realm="api"'
+    if 'retry_after' in error.extra:
+        response['Retry-After'] = error.extra['retry_after']
+    return response
+
+
+def _basic_user(request):
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    scheme, _, credentials = header.partition(' ')
+    if scheme.lower() != 'basic':
+        return None
+    try:
+        username, _, password = base64.b64decode(
+            credentials).decode().partition(':')
+    except (binascii.Error, UnicodeDecodeError):
+        raise ApiError(401, 'Неверный заголовок авторизации.')
+    user = authenticate(request, username=username, password=password)
+    if user is None:
+        raise ApiError(401, 'Неверное имя пользователя или пароль.')
+    return user
+
+
+class CsrfCheck(CsrfViewMiddleware):
+    """Проверка CSRF без рендеринга страницы ошибки."""
+
+    def _reject(self, request, reason):
+        return reason
+
+
+def _authenticate(request):
+    """Пользователь из Basic-заголовка или из сессии; для сессии
+    изменяющие запросы проверяются на CSRF.
+    """
+    user = _basic_user(request)
+    if user is not None:
+        request.user = user
+        return
+    if request.method in SAFE_METHODS or not request.user.is_authenticated:
+        return
+    reason = CsrfCheck().process_view(request, None, (), {})
+    if reason is not None:
+        raise ApiError(403, 'Не пройдена проверка CSRF.')
+
+
+def api_view(*methods):
+    """Декоратор: допустимые методы, авторизация и ошибки в JSON."""
+    def decorator(view):
+        @csrf_exempt
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            try:
+                if request.method not in methods:
+                    raise ApiError(405, 'Метод не поддерживается.')
+                _authenticate(request)
+                if (request.method not in SAFE_METHODS
+                        and not request.user.is_authenticated):
+                    raise ApiError(401, 'Нужна авторизация.')
+                return view(request, *args, **kwargs)
+            except ApiError as error:
+                response = _error_response(error)
+                if error.status == 405:
+                    response['Allow'] = ', '.join(methods)
+                return response
+        return wrapper
+    return decorator
+
+
+def _fetch(queryset, **lookup):
+    try:
+        return queryset.get(**lookup)
+    except queryset.model.DoesNotExist:
+        raise ApiError(404, 'Не найдено.')
+
+
+def _request_data(request):
+    """Данные тела запроса: JSON или обычная форма."""
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            raise ApiError(400, 'Тело запроса не является JSON.')
+        if not isinstance(data, dict):
+            raise ApiError(400, 'Ожидается JSON-объект.')
+        return data, None
+    if request.method == 'POST':
+        return request.POST, request.FILES
+    return QueryDict(request.body, encoding=request.encoding), None
+
+
+def _selected_fields(request, available):
+    """Поля из ?fields=, по умолчанию все доступные."""
+    raw = request.GET.get('fields')
+    if not raw:
+        return list(available)
+    fields = [name.strip() for name in raw.split(',') if name.strip()]
+    unknown = [name for name in fields if name not in available]
+    if unknown:
+        raise ApiError(400, 'Неизвестные поля.', fields=unknown)
+    return fields
+
+
+def _columns(fields, available, ordering=()):
+    """Колонки для only(): нужные полям ответа и ключу курсора."""
+    columns = [name.lstrip('-') for name in ordering]
+    for name in fields:
+        columns.extend(available[name])
+    return list(dict.fromkeys(column for column in columns if column != 'id'))
+
+
+def _page_size(request):
+    try:
+        size = int(request.GET.get('limit', PAGE_SIZE))
+    except ValueError:
+        raise ApiError(400, 'Параметр limit должен быть числом.')
+    return min(max(size, 1), MAX_PAGE_SIZE)
+
+
+def _user_data(user):
+    return {
+        'username': user.username,
+        'first_name': user.first_name,
+        'last_name': user.last_name,
+    }
+
+
+def serialize_post(post, fields):
+    data = {}
+    for name in fields:
+        if name == 'author':
+            data[name] = _user_data(post.author)
+        elif name == 'group':
+            group = post.group
+            data[name] = group and {'slug': group.slug, 'title': group.title}
+        elif name == 'image':
+            data[name] = post.image.url if post.image else None
+        else:
+            data[name] = getattr(post, name)
+    return data
+
+
+def serialize_comment(comment, fields):
+    data = {}
+    for name in fields:
+        if name == 'author':
+            data[name] = _user_data(comment.author)
+        elif name == 'post':
+            data[name] = comment.post_id
+        else:
+            data[name] = getattr(comment, name)
+    return data
+
+
+def serialize_group(group, fields):
+    return {name: getattr(group, name) for name in fields}
+
+
+def serialize_follow(follow, fields):
+    return {'author': _user_data(follow.author)}
+
+
+def _stream(page, request, serialize, fields):
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+
+    def link(query):
+        return request.build_absolute_uri(f'{request.path}?{query}')
+
+    yield '{"next": %s, "previous": %s, "results": [' % (
+        encoder.encode(link(page.next_query) if page.has_next() else None),
+        encoder.encode(
+            link(page.previous_query) if page.has_previous() else None),
+    )
+    for index, obj in enumerate(page.object_list):
+        if index:
+            yield ', '
+        yield encoder.encode(serialize(obj, fields))
+    yield ']}'
+
+
+def _list_response(request, queryset, serialize, fields, ordering):
+    paginator = CursorPaginator(queryset, _page_size(request), ordering)
+    page = paginator.get_page(
+        request.GET.get('cursor'), request.GET.get('page'), request.GET)
+    return StreamingHttpResponse(
+        _stream(page, request, serialize, fields),
+        content_type='application/json')
+
+
+def _object_response(data, status=200):
+    return JsonResponse(data, status=status,
+                        json_dumps_params={'ensure_ascii': False})
+
+
+def _validation_error(form):
+    raise ApiError(400, 'Ошибка в данных.', errors=form.errors)
+
+
+def _posts(fields, ordering=()):
+    queryset = Post.objects.all()
+    if 'author' in fields:
+        queryset = queryset.select_related('author')
+    if 'group' in fields:
+        queryset = queryset.select_related('group')
+    return queryset.only(*_columns(fields, POST_FIELDS, ordering))
+
+
+@api_view('GET', 'POST')
+def post_list(request):
+    if request.method == 'POST':
+        return _save_post(request, None)
+    fields = _selected_fields(request, POST_FIELDS)
+    ordering = ('-pub_date', '-id')
+    queryset = _posts(fields, ordering)
+    if request.GET.get('group'):
+        queryset = queryset.filter(group__slug=request.GET['group'])
+    if request.GET.get('author'):
+        queryset = queryset.filter(author__username=request.GET['author'])
+    return _list_response(request, queryset, serialize_post, fields,
+                          ordering)
+
+
+@api_view('GET', 'PUT', 'PATCH', 'DELETE')
+def post_detail(request, post_id):
+    if request.method == 'GET':
+        fields = _selected_fields(request, POST_FIELDS)
+        post = _fetch(_posts(fields), pk=post_id)
+        return _object_response(serialize_post(post, fields))
+    post = _fetch(Post.objects.all(), pk=post_id)
+    if post.author_id != request.user.pk:
+        raise ApiError(403, 'Изменять пост может только автор.')
+    if request.method == 'DELETE':
+        post.delete()
+        return HttpResponse(status=204)
+    return _save_post(request, post)
+
+
+def _save_post(request, post):
+    data, files = _request_data(request)
+    if request.method == 'PATCH':
+        # Частичное обновление: недостающие поля берутся из поста.
+        current = {'text': post.text, 'group': post.group_id}
+        current.update(data.items())
+        data = current
+    form = PostForm(data, files=files, instance=post)
+    if not form.is_valid():
+        _validation_error(form)
+    created = post is None
+    post = form.save(commit=False)
+    if created:
+        post.author = request.user
+    post.save()
+    thumbnails.schedule(post.image)
+    post = Post.objects.for_feed().get(pk=post.pk)
+    return _object_response(serialize_post(post, list(POST_FIELDS)),
+                            status=201 if created else 200)
+
+
+@api_view('GET')
+def group_list(request):
+    fields = _selected_fields(request, GROUP_FIELDS)
+    ordering = ('title', 'id')
+    queryset = Group.objects.only(*_columns(fields, GROUP_FIELDS, ordering))
+    return _list_response(request, queryset, serialize_group, fields,
+                          ordering)
+
+
+@api_view('GET')
+def group_detail(request, slug):
+    fields = _selected_fields(request, GROUP_FIELDS)
+    group = _fetch(Group.objects.only(*_columns(fields, GROUP_FIELDS)),
+                   slug=slug)
+    return _object_response(serialize_group(group, fields))
+
+
+@api_view('GET', 'POST')
+def comment_list(request, post_id):
+    post = _fetch(Post.objects.only('id'), pk=post_id)
+    if request.method == 'POST':
+        data, _ = _request_data(request)
+        form = CommentForm(data)
+        if not form.is_valid():
+            _validation_error(form)
+        delay = throttle.comment_delay(request.user.pk, post.pk)
+        if delay:
+            raise ApiError(429, 'Слишком много комментариев.',
+                           retry_after=throttle.retry_after(delay))
+        comment = form.save(commit=False)
+        comment.author = request.user
+        comment.post = post
+        comment.save()
+        return _object_response(
+            serialize_comment(comment, list(COMMENT_FIELDS)), status=201)
+    fields = _selected_fields(request, COMMENT_FIELDS)
+    ordering = ('created', 'id')
+    queryset = post.comments.only(
+        *_columns(fields, COMMENT_FIELDS, ordering))
+    if 'author' in fields:
+        queryset = queryset.select_related('author')
+    return _list_response(request, queryset, serialize_comment, fields,
+                          ordering)
+
+
+@api_view('GET', 'POST')
+def follow_list(request):
+    if not request.user.is_authenticated:
+        raise ApiError(401, 'Нужна авторизация.')
+    if request.method == 'POST':
+        data, _ = _request_data(request)
+        author = _fetch(User.objects.all(),
+                        username=data.get('author') or '')
+        if author == request.user:
+            raise ApiError(400, 'Нельзя подписаться на себя.')
+        _, created = Follow.objects.get_or_create(
+            user=request.user, author=author)
+        return _object_response({'author': _user_data(author)},
+                                status=201 if created else 200)
+    ordering = ('-id',)
+    queryset = Follow.objects.filter(user=request.user).select_related(
+        'author').only('author', *POST_FIELDS['author'])
+    return _list_response(request, queryset, serialize_follow, None,
+                          ordering)
+
+
+@api_view('DELETE')
+def follow_detail(request, username):
+    deleted, _ = Follow.objects.filter(
+        user=request.user, author__username=username).delete()
+    if not deleted:
+        raise ApiError(404, 'Подписка не найдена.')
+    return HttpResponse(status=204)
+
+
+@api_view('GET')
+def api_root(request):
+    return _object_response({
+        'posts': request.build_absolute_uri(reverse('api:post_list')),
+        'groups': request.build_absolute_uri(reverse('api:group_list')),
+        'follow': request.build_absolute_uri(reverse('api:follow_list')),
+    })
@@ -0,0 +1,18 @@
+from django.urls import path
+
+from . import api
+
+app_name = 'api'
+
+urlpatterns = [
+    path('', api.api_root, name='root'),
+    path('posts/', api.post_list, name='post_list'),
+    path('posts/<int:post_id>/', api.post_detail, name='post_detail'),
+    path('posts/<int:post_id>/comments/',
+         api.comment_list,
+         name='comment_list'),
+    path('groups/', api.group_list, name='group_list'),
+    path('groups/<slug:slug>/', api.group_detail, name='group_detail'),
+    path('follow/', api.follow_list, name='follow_list'),
+    path('follow/<str:username>/', api.follow_detail, name='follow_detail'),
+]
@@ -0,0 +1,222 @@
+"""Замеры страниц приложения posts через тестовый клиент Django.
+
+Для каждой страницы делается несколько прогревочных запросов, затем
+серия замеров: перцентили времени ответа и число SQL-запросов на запрос
+по всем подключениям (с репликами чтение идет не через default). Пик
+выделенной Python-памяти (tracemalloc) меряется отдельным коротким
+проходом: трассировка замедляет каждое выделение и исказила бы время.
+Результат — словарь,
+который команда benchmark пишет в JSON и сравнивает с прошлым замером.
+
+comment_burst замеряет запись: потоки одновременно комментируют самый
+обсуждаемый пост, как при всплеске активности.
+"""
+import math
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, connections
+from django.db.models import Max
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from . import comment_queue
+from .models import Comment, Follow, Group, Post, Profile, User
+
+BURST_TEXT = 'Комментарий нагрузочного теста'
+MEMORY_REQUESTS = 3
+
+
+def percentile(values, fraction):
+    """Перцентиль по ближайшему рангу."""
+    ordered = sorted(values)
+    index = max(math.ceil(fraction * len(ordered)) - 1, 0)
+    return ordered[min(index, len(ordered) - 1)]
+
+
+def endpoints():
+    """Страницы для замера на самых нагруженных объектах базы.
+
+    Возвращает список (имя, url, имя пользователя или None).
+    """
+    author = Profile.objects.select_related('user').order_by(
+        '-posts_count').first()
+    reader = Profile.objects.select_related('user').order_by(
+        '-following_count').first()
+    group = Group.objects.order_by('-posts_count').first()
+    post = Post.objects.order_by('-comments_count').only('pk').first()
+    deep = Post.objects.order_by('-pub_date', '-id').only('pk')[500:501]
+    result = [
+        ('index', reverse('posts:index'), None),
+        ('index_page_50', reverse('posts:index') + '?page=50', None),
+        ('search', reverse('posts:search') + '?q=кот', None),
+        ('api_posts', reverse('api:post_list'), None),
+    ]
+    if deep:
+        result.append(('api_posts_deep', '%s?limit=20&page=25' % reverse(
+            'api:post_list'), None))
+    if author:
+        username = author.user.username
+        result.append(('profile', reverse(
+            'posts:profile', kwargs={'username': username}), None))
+    if reader:
+        result.append(('follow_index', reverse('posts:follow_index'),
+                       reader.user.username))
+    if group:
+        result.append(('group_posts', reverse(
+            'posts:group_posts', kwargs={'slug': group.slug}), None))
+    if post:
+        result.append(('post_detail', reverse(
+            'posts:post_detail', kwargs={'post_id': post.pk}), None))
+    return result
+
+
+def _get(client, url):
+    response = client.get(url)
+    if response.streaming:
+        b''.join(response.streaming_content)
+    return response
+
+
+def measure(client, url, requests=20, warmup=2, cold=False):
+    """Замер одной страницы; cold=True очищает кеш лент перед запросом."""
+    feed_cache = caches[settings.FEED_CACHE_ALIAS]
+    for _ in range(warmup):
+        client.get(url)
+    timings = []
+    queries = []
+    for _ in range(requests):
+        with ExitStack() as stack:
+            captured = [
+                stack.enter_context(CaptureQueriesContext(connections[alias]))
+                for alias in connections
+            ]
+            if cold:
+                feed_cache.clear()
+            started = time.perf_counter()
+            response = _get(client, url)
+            timings.append((time.perf_counter() - started) * 1000)
+        queries.append(sum(len(context) for context in captured))
+    tracemalloc.start()
+    try:
+        for _ in range(MEMORY_REQUESTS):
+            if cold:
+                feed_cache.clear()
+            _get(client, url)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'url': url,
+        'status': response.status_code,
+        'requests': requests,
+        'p50_ms': round(percentile(timings, 0.50), 2),
+        'p95_ms': round(percentile(timings, 0.95), 2),
+        'p99_ms': round(percentile(timings, 0.99), 2),
+        'max_ms': round(max(timings), 2),
+        'queries': max(queries),
+        'peak_memory_kb': round(peak / 1024, 1),
+    }
+
+
+def run(requests=20, warmup=2, cold=False, only=None):
+    """Замеряет все страницы; only — список имен для выборочного замера."""
+    results = {}
+    for name, url, username in endpoints():
+        if only and name not in only:
+            continue
+        client = Client()
+        if username:
+            client.force_login(Profile.objects.get(
+                user__username=username).user)
+        results[name] = measure(client, url, requests, warmup, cold)
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'database': {
+            'vendor': connection.vendor,
+            'posts': Post.objects.count(),
+            'follows': Follow.objects.count(),
+        },
+        'cold_cache': cold,
+        'results': results,
+    }
+
+
+def compare(previous, current, threshold=0.2):
+    """Страницы, где p95 или число запросов выросли больше threshold."""
+    regressions = []
+    for name, result in current['results'].items():
+        old = previous.get('results', {}).get(name)
+        if old is None:
+            continue
+        for metric in ('p95_ms', 'queries'):
+            before, after = old[metric], result[metric]
+            if after > before * (1 + threshold) and after - before >= 1:
+                regressions.append((name, metric, before, after))
+    return regressions
+
+
+def comment_burst(comments=200, threads=8, write_behind=False):
+    """Всплеск комментариев из threads потоков к одному посту.
+
+    Лимиты частоты и DEBUG (с debug_toolbar) на время замера
+    отключаются. Написанные комментарии удаляются после замера.
+    """
+    post = Post.objects.order_by('-comments_count').only('pk').first()
+    users = list(User.objects.order_by('pk')[:threads])
+    if post is None or not users:
+        return None
+    url = reverse('posts:add_comment', kwargs={'post_id': post.pk})
+    last_id = Comment.objects.aggregate(last=Max('id'))['last'] or 0
+    timings = []
+    errors = []
+
+    def write(user, count):
+        client = Client()
+        client.force_login(user)
+        try:
+            for number in range(count):
+                started = time.perf_counter()
+                response = client.post(
+                    url, {'text': f'{BURST_TEXT} {number}'})
+                timings.append((time.perf_counter() - started) * 1000)
+                if response.status_code != 302:
+                    errors.append(response.status_code)
+        finally:
+            connection.close()
+
+    shares = [comments // len(users)] * len(users)
+    for index in range(comments % len(users)):
+        shares[index] += 1
+    with override_settings(DEBUG=False,
+                           COMMENT_WRITE_BEHIND=write_behind,
+                           COMMENT_THROTTLE_USER=None,
+                           COMMENT_THROTTLE_POST=None):
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(users)) as pool:
+            list(pool.map(write, users, shares))
+        accepted = time.perf_counter() - started
+        if write_behind:
+            comment_queue.join()
+        stored = time.perf_counter() - started
+    written = Comment.objects.filter(
+        pk__gt=last_id, text__startswith=BURST_TEXT)
+    saved = written.count()
+    written.delete()
+    return {
+        'comments': comments,
+        'threads': len(users),
+        'write_behind': write_behind,
+        'saved': saved,
+        'errors': len(errors),
+        'accepted_per_s': round(comments / accepted, 1),
+        'stored_per_s': round(comments / stored, 1),
+        'p50_ms': round(percentile(timings, 0.50), 2),
+        'p95_ms': round(percentile(timings, 0.95), 2),
+        'max_ms': round(max(timings), 2),
+    }
@@ -0,0 +1,245 @@
+"""Версионный кеш отрендеренных карточек постов и страниц лент.
+
+Ключи фрагментов включают номера поколений (generation): поколение
+ленты, поста и групп. Сохранение или удаление поста, комментария или
+группы увеличивает нужные поколения, и старые фрагменты просто
+перестают запрашиваться, без ожидания таймаута и без удаления по маске.
+Работает с любым бэкендом кеша Django (LocMem, файловым, БД).
+
+Анонимным посетителям страницы лент, поста и «Об авторе» отдаются
+целиком из кеша (anonymous_page): ключ страницы тоже строится из
+поколений, поэтому ее сбрасывают те же сигналы моделей.
+"""
+import hashlib
+import random
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+from core import metrics
+
+from .paginator import page_params
+
+GENERATION_PREFIX = 'gen'
+FRAGMENT_PREFIX = 'fragment'
+PAGE_PREFIX = 'page'
+PAGE_CACHE_HEADER = 'X-Page-Cache'
+HITS_KEY = 'fragment-stats:hits'
+MISSES_KEY = 'fragment-stats:misses'
+GROUPS = 'groups'
+FOLLOW_GRAPH = 'follow-graph'
+SUGGESTIONS = 'suggestions'
+TRENDING = 'trending'
+
+
+def get_cache():
+    return caches[settings.FEED_CACHE_ALIAS]
+
+
+def _generation_key(name):
+    return f'{GENERATION_PREFIX}:{name}'
+
+
+def _initial_generation():
+    # Поколение начинается со времени, а не с 1: если счетчик вытеснят
+    # из кеша, новый не совпадет со старыми ключами фрагментов.
+    return int(time.time() * 1000)
+
+
+def generations(*names):
+    """Текущие поколения для списка имен одним запросом к кешу."""
+    cache = get_cache()
+    keys = {_generation_key(name): name for name in names}
+    found = cache.get_many(list(keys))
+    result = {}
+    for key, name in keys.items():
+        value = found.get(key)
+        if value is None:
+            cache.add(key, _initial_generation(), None)
+            value = cache.get(key)
+        result[name] = value
+    return result
+
+
+def bump(*names):
+    """Увеличивает поколения: зависящие от них фрагменты устаревают.
+
+    Возвращает новые поколения по именам.
+    """
+    cache = get_cache()
+    result = {}
+    for name in names:
+        key = _generation_key(name)
+        try:
+            result[name] = cache.incr(key)
+        except ValueError:
+            cache.add(key, _initial_generation(), None)
+            result[name] = cache.get(key)
+    return result
+
+
+def feed_name(kind, pk=None):
+    return kind if pk is None else f'{kind}:{pk}'
+
+
+def invalidate_post(post_id, author_id, group_id):
+    """Сбрасывает карточку поста и все ленты, где она выводится."""
+    names = [feed_name('post', post_id), feed_name('index'),
+             feed_name('profile', author_id)]
+    if group_id:
+        names.append(feed_name('group', group_id))
+    bump(*names)
+
+
+def invalidate_profile(*user_ids):
+    """Сбрасывает страницы со счетчиками и именем пользователей."""
+    bump(*(feed_name('profile', user_id) for user_id in user_ids))
+
+
+def invalidate_group(group_id):
+    bump(GROUPS, feed_name('group', group_id), feed_name('index'))
+
+
+def invalidate_all():
+    """Сбрасывает все фрагменты (поколение групп входит в каждый ключ)
+    и граф подписок после массовой загрузки без сигналов.
+    """
+    bump(GROUPS, FOLLOW_GRAPH)
+
+
+def _make_key(*parts, prefix=FRAGMENT_PREFIX):
+    raw = ':'.join(str(part) for part in parts)
+    return f'{prefix}:' + hashlib.md5(raw.encode()).hexdigest()
+
+
+def feed_key(params, kind, pk=None, extra=()):
+    """Ключ фрагмента страницы ленты: поколение + параметры страницы.
+
+    params — отобранные параметры страницы (paginator.page_params),
+    extra — имена других поколений, от которых зависит лента.
+    """
+    name = feed_name(kind, pk)
+    versions = generations(name, GROUPS, *extra)
+    parts = [versions[key] for key in (name, GROUPS, *extra)]
+    return _make_key(name, *parts, params.urlencode())
+
+
+def annotate_cards(posts):
+    """Проставляет постам card_cache_key по их текущим поколениям."""
+    names = [feed_name('post', post.pk) for post in posts]
+    versions = generations(GROUPS, *names)
+    for post, name in zip(posts, names):
+        post.card_cache_key = _make_key(
+            'card', post.pk, versions[name], versions[GROUPS])
+    return posts
+
+
+def fragment(key, render):
+    """Возвращает фрагмент из кеша или рендерит и сохраняет его."""
+    cache = get_cache()
+    content = cache.get(key)
+    metrics.record_cache(content is not None)
+    if content is not None:
+        _count(HITS_KEY)
+        return content
+    _count(MISSES_KEY)
+    content = render()
+    cache.set(key, content, settings.FEED_CACHE_TIMEOUT)
+    return content
+
+
+def page_key(request, names, params):
+    """Ключ целой страницы: путь, отобранные параметры (params) и
+    поколения, от которых она зависит.
+    """
+    versions = generations(GROUPS, *names)
+    return _make_key(
+        settings.PAGE_CACHE_VERSION, request.path, params.urlencode(),
+        *(f'{name}={versions[name]}' for name in sorted(versions)),
+        prefix=PAGE_PREFIX)
+
+
+def _cacheable(response):
+    return (response.status_code == 200
+            and not response.streaming
+            and not response.cookies
+            and not response.has_header('Set-Cookie'))
+
+
+def anonymous_page(dependencies=None, params=page_params):
+    """Кеширует целые ответы на GET-запросы анонимных посетителей.
+
+    dependencies(request, *args, **kwargs) возвращает имена поколений,
+    от которых зависит страница, или None, если страницы нет.
+    params(request) — параметры запроса, меняющие страницу (по
+    умолчанию курсор и номер страницы); остальные в ключ не входят,
+    чтобы произвольные ?utm=… не заводили новые записи. Для вошедших
+    пользователей, у которых в странице свои данные и CSRF,
+    представление вызывается как обычно.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (request.method != 'GET'
+                    or request.user.is_authenticated):
+                return view(request, *args, **kwargs)
+            names = (dependencies(request, *args, **kwargs)
+                     if dependencies else [])
+            if names is None:
+                return view(request, *args, **kwargs)
+            cache = get_cache()
+            key = page_key(request, names, params(request))
+            cached = cache.get(key)
+            metrics.record_cache(cached is not None)
+            if cached is not None:
+                content, content_type = cached
+                response = HttpResponse(content, content_type=content_type)
+                response[PAGE_CACHE_HEADER] = 'hit'
+                return response
+            response = view(request, *args, **kwargs)
+            if getattr(response, 'render', None) and not getattr(
+                    response, 'is_rendered', True):
+                response.render()
+            if _cacheable(response):
+                cache.set(key, (response.content, response['Content-Type']),
+                          settings.PAGE_CACHE_TIMEOUT)
+                response[PAGE_CACHE_HEADER] = 'miss'
+            return response
+        return wrapper
+    return decorator
+
+
+def _count(key):
+    """Пишет в общий кеш случайное обращение из FEED_CACHE_STATS_SAMPLE
+    с весом выборки: запись на каждый фрагмент страницы стоила бы
+    дороже самого чтения. Точные числа по запросам — в core.metrics.
+    """
+    sample = settings.FEED_CACHE_STATS_SAMPLE
+    if sample > 1 and random.randrange(sample):
+        return
+    cache = get_cache()
+    try:
+        cache.incr(key, sample)
+    except ValueError:
+        cache.add(key, 0, None)
+        cache.incr(key, sample)
+
+
+def stats():
+    """Число попаданий, промахов и доля попаданий кеша фрагментов."""
+    values = get_cache().get_many([HITS_KEY, MISSES_KEY])
+    hits = values.get(HITS_KEY, 0)
+    misses = values.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': hits / total if total else 0.0,
+    }
+
+
+def reset_stats():
+    get_cache().delete_many([HITS_KEY, MISSES_KEY])
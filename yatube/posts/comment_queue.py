@@ -0,0 +1,206 @@
+"""Отложенная запись комментариев (COMMENT_WRITE_BEHIND).
+
+Запрос не пишет комментарий в базу, а ставит его в очередь процесса;
+фоновый поток раз в COMMENT_FLUSH_INTERVAL секунд (или по набору
+COMMENT_BATCH_SIZE штук) сохраняет накопленное одним bulk_create в
+одной транзакции. Вместо сотни коротких блокировок записи SQLite
+получает одну. bulk_create не шлет сигналы, поэтому счетчики, кеш
+лент и поисковый индекс обновляются здесь же.
+
+Пока комментарий в очереди, автор видит его на странице поста: список
+ожидающих хранится в кеше. Очередь живет в памяти процесса: при
+аварийной остановке несохраненные комментарии теряются, при обычной —
+дописываются в atexit.
+"""
+import atexit
+import datetime
+import logging
+import queue
+import threading
+import time
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.db import OperationalError, close_old_connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from . import cache, counters, search, trending
+from .models import Comment, Post
+
+logger = logging.getLogger(__name__)
+
+PENDING_PREFIX = 'comment-queue:pending'
+# Попыток записать пачку, если база занята
+SAVE_ATTEMPTS = 3
+
+_queue = queue.Queue()
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def _pending_key(post_id, author_id):
+    return f'{PENDING_PREFIX}:{post_id}:{author_id}'
+
+
+def enqueue(post_id, author_id, text):
+    """Ставит комментарий в очередь на запись."""
+    item = {
+        'token': uuid.uuid4().hex,
+        'post_id': post_id,
+        'author_id': author_id,
+        'text': text,
+        'queued': time.time(),
+    }
+    store = cache.get_cache()
+    key = _pending_key(post_id, author_id)
+    store.set(key, store.get(key, []) + [item],
+              settings.COMMENT_PENDING_TIMEOUT)
+    _queue.put(item)
+    _ensure_worker()
+    return item
+
+
+def pending(post_id, user):
+    """Еще не записанные комментарии пользователя к посту."""
+    if not settings.COMMENT_WRITE_BEHIND or not user.is_authenticated:
+        return []
+    items = cache.get_cache().get(_pending_key(post_id, user.pk), [])
+    return [
+        Comment(post_id=post_id, author=user, text=item['text'],
+                created=datetime.datetime.fromtimestamp(
+                    item['queued'], timezone.utc))
+        for item in items
+    ]
+
+
+def _forget(items):
+    store = cache.get_cache()
+    saved = {item['token'] for item in items}
+    keys = {_pending_key(item['post_id'], item['author_id'])
+            for item in items}
+    for key in keys:
+        left = [item for item in store.get(key, [])
+                if item['token'] not in saved]
+        if left:
+            store.set(key, left, settings.COMMENT_PENDING_TIMEOUT)
+        else:
+            store.delete(key)
+
+
+def save(items):
+    """Сохраняет пачку из очереди и делает работу сигналов комментария."""
+    if not items:
+        return []
+    posts = {
+        pk: (author_id, group_id)
+        for pk, author_id, group_id in Post.objects.filter(
+            pk__in={item['post_id'] for item in items}).values_list(
+            'pk', 'author_id', 'group_id')
+    }
+    # Комментарии к удаленным за это время постам отбрасываются.
+    comments = [
+        Comment(post_id=item['post_id'], author_id=item['author_id'],
+                text=item['text'])
+        for item in items if item['post_id'] in posts
+    ]
+    # Чтение до транзакции: в WAL транзакция, начатая чтением, не может
+    # перейти к записи, если кто-то записал раньше, и SQLite сразу
+    # отвечает «database is locked», не дожидаясь busy_timeout.
+    last_id = Comment.objects.aggregate(last=Max('id'))['last'] or 0
+    added = Counter(comment.post_id for comment in comments)
+    _write(comments, added)
+    if comments and comments[0].pk is None:
+        # SQLite не возвращает id из bulk_create: перечитываем новые
+        # строки. Чужие комментарии из этого диапазона уже в индексе,
+        # повторная индексация им не вредит.
+        comments = list(Comment.objects.filter(
+            pk__gt=last_id, post_id__in=list(added)))
+    for comment in comments:
+        search.index_object(comment)
+    for post_id in added:
+        author_id, group_id = posts[post_id]
+        cache.invalidate_post(post_id, author_id, group_id)
+    _forget(items)
+    return comments
+
+
+def _write(comments, added):
+    """Комментарии и счетчики одной транзакцией; занятую базу ждем."""
+    for attempt in range(SAVE_ATTEMPTS):
+        try:
+            with transaction.atomic():
+                Comment.objects.bulk_create(comments)
+                for post_id, count in added.items():
+                    counters.bump(
+                        Post.objects.filter(pk=post_id), 'comments_count',
+                        count, trending_score=trending.comment_score(count))
+            return
+        except OperationalError:
+            if attempt == SAVE_ATTEMPTS - 1:
+                raise
+            time.sleep(0.1 * (attempt + 1))
+
+
+def _save_logged(items):
+    try:
+        save(items)
+    except Exception:
+        logger.exception('Не удалось сохранить %d комментариев', len(items))
+    finally:
+        for _ in items:
+            _queue.task_done()
+
+
+def _collect(first):
+    """Добирает пачку, пока не истек интервал или не набран размер."""
+    batch = [first]
+    deadline = time.monotonic() + settings.COMMENT_FLUSH_INTERVAL
+    while len(batch) < settings.COMMENT_BATCH_SIZE:
+        timeout = deadline - time.monotonic()
+        if timeout <= 0:
+            break
+        try:
+            batch.append(_queue.get(timeout=timeout))
+        except queue.Empty:
+            break
+    return batch
+
+
+def _work():
+    while True:
+        batch = _collect(_queue.get())
+        _save_logged(batch)
+        close_old_connections()
+
+
+def _ensure_worker():
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(
+                target=_work, name='comment-queue', daemon=True)
+            _worker.start()
+
+
+def flush():
+    """Сохраняет все, что в очереди, в текущем потоке."""
+    items = []
+    while True:
+        try:
+            items.append(_queue.get_nowait())
+        except queue.Empty:
+            break
+    size = settings.COMMENT_BATCH_SIZE
+    for start in range(0, len(items), size):
+        _save_logged(items[start:start + size])
+    return len(items)
+
+
+def join():
+    """Ждет, пока очередь не будет записана целиком."""
+    _queue.join()
+
+
+atexit.register(flush)
@@ -0,0 +1,128 @@
+"""ETag для условных GET-запросов к лентам и странице поста.
+
+ETag собирается из дешевых признаков свежести: поколений кеша лент
+(posts/cache.py), счетчиков профиля и последнего комментария. Если
+клиент прислал совпадающий If-None-Match, ответ 304 отдается до
+основного запроса и рендеринга шаблона. В ETag входят пользователь и
+его CSRF-cookie, поэтому разные пользователи не получают чужие
+страницы.
+
+Группа, автор и пост ищутся один раз на запрос (group, author, post):
+тот же объект берут ETag, зависимости кеша страниц и представление.
+
+Last-Modified не отдается: правка поста, переименование группы и
+изменение счетчиков не оставляют в моделях времени изменения, а
+поколения кеша — счетчики, а не даты. Дата по pub_date давала бы 304
+на устаревшие страницы клиентам, приславшим только If-Modified-Since.
+"""
+import datetime
+import hashlib
+
+from django.conf import settings
+from django.db.models import Max
+
+from . import cache, comment_queue, follow_graph, trending
+from .models import Comment, Group, Post, Profile, User
+
+LOOKUPS_ATTR = '_posts_lookups'
+
+
+def _memo(request, key, load):
+    lookups = request.__dict__.setdefault(LOOKUPS_ATTR, {})
+    if key not in lookups:
+        lookups[key] = load()
+    return lookups[key]
+
+
+def group(request, slug):
+    """Группа страницы или None."""
+    return _memo(request, ('group', slug),
+                 lambda: Group.objects.filter(slug=slug).first())
+
+
+def author(request, username):
+    """Автор профиля вместе со счетчиками или None."""
+    return _memo(request, ('author', username), lambda: (
+        User.objects.select_related('profile')
+        .filter(username=username).first()))
+
+
+def post(request, post_id):
+    """Пост для страницы поста (с профилем автора) или None."""
+    def load():
+        found = Post.objects.for_feed().filter(pk=post_id).first()
+        if found is not None:
+            profile = Profile.objects.filter(user_id=found.author_id).first()
+            if profile is not None:
+                found.author.profile = profile
+        return found
+    return _memo(request, ('post', post_id), load)
+
+
+def _etag(request, *parts):
+    user = request.user
+    viewer = user.pk if user.is_authenticated else 'anonymous'
+    raw = ':'.join(str(part) for part in (
+        viewer,
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+        datetime.date.today().year,
+        request.GET.urlencode(),
+        *parts,
+    ))
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def _profile_state(request, user):
+    profile = getattr(user, 'profile', None)
+    return (
+        getattr(profile, 'posts_count', None),
+        getattr(profile, 'followers_count', None),
+        getattr(profile, 'following_count', None),
+        follow_graph.is_following(request.user, user.pk),
+    )
+
+
+def _feed_etag(request, name):
+    extra = trending.cache_names(request)
+    versions = cache.generations(name, cache.GROUPS, *extra)
+    return _etag(request, name, versions[name], versions[cache.GROUPS],
+                 *(versions[key] for key in extra))
+
+
+def index_etag(request):
+    return _feed_etag(request, 'index')
+
+
+def group_etag(request, slug):
+    found = group(request, slug)
+    if found is None:
+        return None
+    return _feed_etag(request, cache.feed_name('group', found.pk))
+
+
+def profile_etag(request, username):
+    user = author(request, username)
+    if user is None:
+        return None
+    name = cache.feed_name('profile', user.pk)
+    versions = cache.generations(name, cache.GROUPS, cache.SUGGESTIONS)
+    # Рекомендации меняются после пересчета и после подписок читателя.
+    return _etag(request, name, versions[name], versions[cache.GROUPS],
+                 versions[cache.SUGGESTIONS],
+                 hash(follow_graph.followees(request.user)),
+                 *_profile_state(request, user))
+
+
+def post_detail_etag(request, post_id):
+    found = post(request, post_id)
+    if found is None:
+        return None
+    latest_comment = Comment.objects.filter(post_id=post_id).aggregate(
+        latest=Max('id'))['latest']
+    name = cache.feed_name('post', post_id)
+    versions = cache.generations(name, cache.GROUPS)
+    # Ожидающие записи комментарии автора тоже меняют страницу.
+    pending = len(comment_queue.pending(post_id, request.user))
+    return _etag(request, name, versions[name], versions[cache.GROUPS],
+                 found.comments_count, latest_comment, pending,
+                 *_profile_state(request, found.author))
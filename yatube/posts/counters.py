@@ -0,0 +1,61 @@
+"""Поддержка денормализованных счетчиков постов, комментариев
+и подписок. Инкременты делаются одним UPDATE с F(), поэтому не теряются
+при конкурентных запросах.
+"""
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Group, Post, Profile, User
+
+
+def bump(queryset, field, delta, **extra):
+    """Атомарно меняет счетчик; в минус не уходит.
+
+    extra — другие поля, обновляемые тем же UPDATE.
+    """
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    return queryset.update(**{field: F(field) + delta}, **extra)
+
+
+def bump_profile(user_id, field, delta, **extra):
+    profiles = Profile.objects.filter(user_id=user_id)
+    if not bump(profiles, field, delta, **extra):
+        Profile.objects.get_or_create(user_id=user_id)
+        if delta > 0:
+            bump(profiles, field, delta, **extra)
+
+
+def _count(queryset, field, outer='pk'):
+    """Подзапрос COUNT(*) по внешнему ключу field."""
+    counted = (
+        queryset.filter(**{field: OuterRef(outer)})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counted, output_field=IntegerField()), 0)
+
+
+def recount(users=None, posts=None, groups=None):
+    """Пересчитывает счетчики массовыми UPDATE.
+
+    users, posts и groups — querysets, которыми ограничивается
+    пересчет (например, затронутые импортом); None — все строки.
+    """
+    users = User.objects.all() if users is None else users
+    posts = Post.objects.all() if posts is None else posts
+    groups = Group.objects.all() if groups is None else groups
+    missing = users.filter(profile__isnull=True)
+    Profile.objects.bulk_create(
+        [Profile(user_id=pk)
+         for pk in missing.values_list('pk', flat=True).iterator()])
+    posts.update(
+        comments_count=_count(Comment.objects.all(), 'post'))
+    groups.update(posts_count=_count(Post.objects.all(), 'group'))
+    Profile.objects.filter(user__in=users.values('pk')).update(
+        posts_count=_count(Post.objects.all(), 'author', 'user'),
+        followers_count=_count(Follow.objects.all(), 'author', 'user'),
+        following_count=_count(Follow.objects.all(), 'user', 'user'),
+    )
@@ -0,0 +1,111 @@
+"""Граф подписок: множества id подписок и подписчиков в кеше.
+
+Для пользователя хранятся два frozenset: авторы, на которых он
+подписан (followees), и его подписчики (followers). Множество читается
+из базы одним запросом при первом обращении, а подписка и отписка
+(сигналы Follow) обновляют его на месте: поколение множества
+увеличивается, и новое множество строится из предыдущего. Если
+предыдущего в кеше нет (вытеснено или его одновременно меняет другой
+запрос), новое просто не записывается и перечитается из базы, поэтому
+устаревшее множество не отдается. Проверка подписки — поиск в
+множестве без запроса к базе.
+"""
+from django.conf import settings
+
+from . import cache
+from .models import Follow
+
+FOLLOWEES = 'followees'
+FOLLOWERS = 'followers'
+KEY_PREFIX = 'follow-graph'
+
+
+def _user_id(user):
+    if user is None:
+        return None
+    if isinstance(user, int):
+        return user
+    if not user.is_authenticated:
+        return None
+    return user.pk
+
+
+def _name(kind, user_id):
+    return f'{kind}:{user_id}'
+
+
+def _key(name, version, graph_version):
+    return f'{KEY_PREFIX}:{graph_version}:{name}:{version}'
+
+
+def _query(kind, user_id):
+    if kind == FOLLOWEES:
+        follows = Follow.objects.filter(user_id=user_id)
+        column = 'author_id'
+    else:
+        follows = Follow.objects.filter(author_id=user_id)
+        column = 'user_id'
+    return frozenset(follows.values_list(column, flat=True))
+
+
+def _load(kind, user):
+    user_id = _user_id(user)
+    if user_id is None:
+        return frozenset()
+    name = _name(kind, user_id)
+    versions = cache.generations(name, cache.FOLLOW_GRAPH)
+    key = _key(name, versions[name], versions[cache.FOLLOW_GRAPH])
+    store = cache.get_cache()
+    ids = store.get(key)
+    if ids is None:
+        ids = _query(kind, user_id)
+        store.set(key, ids, settings.FOLLOW_GRAPH_TIMEOUT)
+    return ids
+
+
+def followees(user):
+    """id авторов, на которых подписан пользователь."""
+    return _load(FOLLOWEES, user)
+
+
+def followers(user):
+    """id подписчиков пользователя."""
+    return _load(FOLLOWERS, user)
+
+
+def is_following(user, author):
+    """Подписан ли user на author (объекты или id)."""
+    author_id = author if isinstance(author, int) else author.pk
+    return author_id in followees(user)
+
+
+def followed_among(user, author_ids):
+    """Те из author_ids, на кого подписан пользователь: одна проверка
+    на всю страницу ленты.
+    """
+    return followees(user).intersection(author_ids)
+
+
+def _change(kind, user_id, other_id, add):
+    name = _name(kind, user_id)
+    store = cache.get_cache()
+    graph_version = cache.generations(cache.FOLLOW_GRAPH)[cache.FOLLOW_GRAPH]
+    version = cache.bump(name)[name]
+    previous = store.get(_key(name, version - 1, graph_version))
+    if previous is None:
+        return
+    ids = previous | {other_id} if add else previous - {other_id}
+    store.set(_key(name, version, graph_version), ids,
+              settings.FOLLOW_GRAPH_TIMEOUT)
+
+
+def follow(user_id, author_id):
+    """Обновляет множества после подписки (вызывается из сигнала)."""
+    _change(FOLLOWEES, user_id, author_id, True)
+    _change(FOLLOWERS, author_id, user_id, True)
+
+
+def unfollow(user_id, author_id):
+    """Обновляет множества после отписки (вызывается из сигнала)."""
+    _change(FOLLOWEES, user_id, author_id, False)
+    _change(FOLLOWERS, author_id, user_id, False)
@@ -1,5 +1,7 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 
+from . import thumbnails
 from .models import Comment, Post
 
 
@@ -9,6 +11,12 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('text', 'group', 'image')
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if isinstance(image, UploadedFile):
+            return thumbnails.normalize_upload(image)
+        return image
+
 
 class CommentForm(forms.ModelForm):
 
@@ -0,0 +1,78 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import benchmark
+
+
+class Command(BaseCommand):
+    help = ('Замеряет время ответа, число запросов и память страниц '
+            'постов; пишет результат в JSON')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=20,
+            help='Замеров на страницу')
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Очищать кеш лент перед каждым запросом')
+        parser.add_argument(
+            '--only', nargs='+', help='Замерить только эти страницы')
+        parser.add_argument('-o', '--output', help='Файл для результата')
+        parser.add_argument(
+            '--compare', help='JSON прошлого замера для сравнения')
+        parser.add_argument(
+            '--threshold', type=float, default=0.2,
+            help='Допустимый рост p95 и числа запросов (доля)')
+        parser.add_argument(
+            '--comment-burst', type=int, metavar='N',
+            help='Вместо страниц замерить всплеск из N комментариев: '
+                 'сразу и с отложенной записью')
+        parser.add_argument(
+            '--threads', type=int, default=8,
+            help='Потоков для --comment-burst')
+
+    def handle(self, *args, **options):
+        if options['comment_burst']:
+            return self.comment_burst(
+                options['comment_burst'], options['threads'])
+        result = benchmark.run(
+            requests=options['requests'],
+            warmup=options['warmup'],
+            cold=options['cold'],
+            only=options['only'],
+        )
+        for name, row in result['results'].items():
+            self.stdout.write(
+                f'{name:16} p50 {row["p50_ms"]:8.1f} мс  '
+                f'p95 {row["p95_ms"]:8.1f} мс  p99 {row["p99_ms"]:8.1f} мс  '
+                f'запросов {row["queries"]:3}  '
+                f'память {row["peak_memory_kb"]:8.1f} КБ')
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(result, file, ensure_ascii=False, indent=2)
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as file:
+                previous = json.load(file)
+            regressions = benchmark.compare(
+                previous, result, options['threshold'])
+            for name, metric, before, after in regressions:
+                self.stderr.write(f'{name}: {metric} {before} -> {after}')
+            if regressions:
+                raise CommandError('Есть регрессии относительно '
+                                   f'{options["compare"]}')
+            self.stdout.write(self.style.SUCCESS('Регрессий нет'))
+
+    def comment_burst(self, comments, threads):
+        for write_behind in (False, True):
+            row = benchmark.comment_burst(comments, threads, write_behind)
+            if row is None:
+                raise CommandError('Нет постов или пользователей')
+            mode = 'отложенная' if write_behind else 'сразу'
+            self.stdout.write(
+                f'{mode:10} принято {row["accepted_per_s"]:7.1f}/с  '
+                f'записано {row["stored_per_s"]:7.1f}/с  '
+                f'p50 {row["p50_ms"]:7.1f} мс  p95 {row["p95_ms"]:7.1f} мс  '
+                f'сохранено {row["saved"]}/{row["comments"]}  '
+                f'ошибок {row["errors"]}')
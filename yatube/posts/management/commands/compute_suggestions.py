@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from posts import suggestions
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает рекомендации подписок («кого почитать»)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--stale', action='store_true',
+            help='Только пользователи, чьи подписки изменились')
+        parser.add_argument(
+            '--top', type=int,
+            help='Рекомендаций на пользователя (SUGGESTIONS_TOP)')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Пользователей на одну транзакцию записи')
+
+    def handle(self, *args, **options):
+        total = suggestions.compute(
+            stale=options['stale'], top=options['top'],
+            batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Рекомендации пересчитаны для пользователей: {total}'))
@@ -0,0 +1,64 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import export
+
+
+class Command(BaseCommand):
+    help = 'Выгружает посты или комментарии в NDJSON или CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--kind', choices=sorted(export.KINDS), default='posts',
+            help='Что выгружать')
+        parser.add_argument(
+            '--format', choices=export.FORMATS, default='ndjson',
+            dest='export_format', help='Формат файла')
+        parser.add_argument(
+            '--gzip', action='store_true', help='Сжать выгрузку gzip')
+        parser.add_argument(
+            '--since', help='С даты (YYYY-MM-DD или ISO 8601)')
+        parser.add_argument(
+            '--until', help='По дату включительно')
+        parser.add_argument('--author', help='Имя пользователя автора')
+        parser.add_argument('--group', help='Slug группы')
+        parser.add_argument(
+            '--batch-size', type=int, default=export.BATCH_SIZE,
+            help='Строк в одном запросе к базе')
+        parser.add_argument(
+            '-o', '--output',
+            help='Файл для записи; по умолчанию stdout')
+
+    def handle(self, *args, **options):
+        try:
+            chunks = export.stream(
+                options['kind'],
+                options['export_format'],
+                compress=options['gzip'],
+                batch_size=options['batch_size'],
+                since=export.parse_moment(options['since']),
+                until=export.parse_moment(options['until'], end=True),
+                author=options['author'],
+                group=options['group'],
+            )
+        except ValueError as error:
+            raise CommandError(error)
+        started = time.monotonic()
+        written = 0
+        output = options['output']
+        target = open(output, 'wb') if output else sys.stdout.buffer
+        try:
+            for chunk in chunks:
+                target.write(chunk)
+                written += len(chunk)
+        finally:
+            if output:
+                target.close()
+            else:
+                target.flush()
+        if output:
+            self.stderr.write(self.style.SUCCESS(
+                f'Записано {written} байт в {output} '
+                f'за {time.monotonic() - started:.1f} c'))
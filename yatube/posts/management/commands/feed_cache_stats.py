@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from posts import cache
+
+
+class Command(BaseCommand):
+    help = 'Показывает долю попаданий кеша карточек и лент'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset', action='store_true',
+            help='Обнулить счетчики после вывода')
+
+    def handle(self, *args, **options):
+        stats = cache.stats()
+        self.stdout.write(
+            'hits={hits} misses={misses} hit_rate={hit_rate:.2%}'.format(
+                **stats))
+        if options['reset']:
+            cache.reset_stats()
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+
+from posts import synthetic
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу синтетическими пользователями, постами, '
+            'подписками и комментариями (распределение Ципфа)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--follows', type=int, default=5000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument(
+            '--zipf', type=float, default=1.1,
+            help='Показатель распределения популярности')
+        parser.add_argument(
+            '--seed', type=int, default=1,
+            help='Зерно генератора: одинаковое дает одинаковые данные')
+        parser.add_argument(
+            '--prefix', default='synth',
+            help='Префикс имен пользователей и slug групп')
+        parser.add_argument(
+            '--batch-size', type=int, default=synthetic.BATCH_SIZE)
+        parser.add_argument(
+            '--no-rebuild', action='store_true',
+            help='Не пересобирать счетчики, ленты и поиск')
+
+    def handle(self, *args, **options):
+        created = synthetic.generate(
+            users=options['users'],
+            groups=options['groups'],
+            posts=options['posts'],
+            follows=options['follows'],
+            comments=options['comments'],
+            zipf=options['zipf'],
+            seed=options['seed'],
+            prefix=options['prefix'],
+            batch_size=options['batch_size'],
+            rebuild=not options['no_rebuild'],
+            log=self.stdout.write,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            'Создано: ' + ', '.join(
+                f'{name} {count}' for name, count in created.items())))
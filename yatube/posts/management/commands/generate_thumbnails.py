@@ -0,0 +1,47 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from posts import thumbnails
+from posts.models import Post
+
+
+def _generate(image_name):
+    try:
+        thumbnails.generate(image_name)
+        return True
+    except Exception:
+        thumbnails.logger.exception(
+            'Не удалось создать миниатюры для %s', image_name)
+        return False
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = 'Создает миниатюры для уже загруженных картинок постов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=4,
+            help='Число параллельных потоков')
+
+    def handle(self, *args, **options):
+        images = (
+            Post.objects.exclude(image='')
+            .values_list('image', flat=True)
+            .distinct()
+        )
+        started = time.monotonic()
+        done = failed = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            for ok in pool.map(_generate, list(images.iterator())):
+                if ok:
+                    done += 1
+                else:
+                    failed += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: {done}, ошибок: {failed}, '
+            f'{time.monotonic() - started:.1f} c'))
@@ -0,0 +1,68 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import importer
+
+
+class Command(BaseCommand):
+    help = ('Импортирует пользователей, группы, посты, комментарии '
+            'или подписки из NDJSON или CSV')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл с записями')
+        parser.add_argument(
+            '--kind', choices=list(importer.IMPORTERS), required=True,
+            help='Что импортировать')
+        parser.add_argument(
+            '--format', choices=importer.FORMATS, dest='input_format',
+            help='Формат файла; по умолчанию по расширению')
+        parser.add_argument(
+            '--batch-size', type=int, default=importer.BATCH_SIZE,
+            help='Записей в одной транзакции')
+        parser.add_argument(
+            '--no-rebuild', action='store_true',
+            help='Не пересобирать счетчики, ленты и поиск (если дальше '
+                 'будет еще импорт)')
+        parser.add_argument(
+            '--rebuild-all', action='store_true',
+            help='Пересобрать всю базу, а не только затронутое этим '
+                 'импортом (последний импорт после --no-rebuild)')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        input_format = options['input_format'] or (
+            'csv' if path.endswith('.csv') else 'ndjson')
+        if not os.path.exists(path):
+            raise CommandError(f'Нет файла {path}')
+        stats = importer.ImportStats()
+        failure = None
+        with open(path, encoding='utf-8', newline='') as file:
+            try:
+                importer.import_records(
+                    options['kind'],
+                    importer.read_records(file, input_format),
+                    batch_size=options['batch_size'],
+                    stats=stats,
+                )
+            except ValueError as error:
+                # Пачки до ошибки уже записаны: их все равно нужно
+                # разложить по лентам, поиску и счетчикам.
+                failure = error
+        for line, message in stats.errors[:20]:
+            self.stderr.write(f'Строка {line}: {message}')
+        if len(stats.errors) > 20:
+            self.stderr.write(f'... и еще {len(stats.errors) - 20} ошибок')
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано: {stats.created}, дублей: {stats.skipped}, '
+            f'ошибок: {len(stats.errors)}; {stats.rows} строк '
+            f'за {stats.elapsed:.1f} c ({stats.rate:.0f} строк/с)'))
+        if not options['no_rebuild']:
+            importer.finish(
+                None if options['rebuild_all'] else stats.since)
+            self.stdout.write(self.style.SUCCESS(
+                'Счетчики, ленты и поиск пересобраны'))
+        if failure is not None:
+            raise CommandError(
+                f'Ошибка чтения {path} после {stats.rows} строк: '
+                f'{failure}')
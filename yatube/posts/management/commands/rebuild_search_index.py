@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = 'Переиндексирует посты, комментарии и группы для поиска'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            total = search.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Проиндексировано объектов: {total} '
+            f'(бэкенд {search.get_backend().name})'))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from posts import timeline
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает материализованные ленты подписок'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--trim', action='store_true',
+            help='Только обрезать ленты длиннее TIMELINE_SIZE')
+
+    def handle(self, *args, **options):
+        if options['trim']:
+            total = timeline.trim_overgrown()
+            self.stdout.write(self.style.SUCCESS(
+                f'Обрезано лент: {total}'))
+            return
+        timeline.rebuild()
+        self.stdout.write(self.style.SUCCESS('Ленты пересобраны'))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from posts import trending
+
+
+class Command(BaseCommand):
+    help = 'Переносит просмотры в оценки популярности и уменьшает их'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild', action='store_true',
+            help='Пересчитать оценки с нуля по комментариям')
+
+    def handle(self, *args, **options):
+        if trending.local_cache():
+            self.stderr.write(self.style.WARNING(
+                'Кеш просмотров локален для процесса (locmem или dummy): '
+                'просмотры из воркеров сюда не попадут. Настройте общий '
+                'кеш в CACHE_URL.'))
+        if options['rebuild']:
+            total = trending.rebuild()
+            self.stdout.write(self.style.SUCCESS(
+                f'Оценки пересчитаны, постов с комментариями: {total}'))
+            return
+        factor, views = trending.update()
+        self.stdout.write(self.style.SUCCESS(
+            f'Множитель затухания {factor:.4f}, '
+            f'перенесено просмотров: {views}'))
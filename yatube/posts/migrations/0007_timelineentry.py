@@ -0,0 +1,74 @@
+# Generated by Django 2.2.19 on 2026-10-17 23:28
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_timelines(apps, schema_editor):
+    """Заполняет ленты уже существующих подписок, иначе follow_index
+    пустел бы до ручного rebuild_timelines.
+    """
+    if not settings.TIMELINE_ENABLED:
+        return
+    Follow = apps.get_model('posts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+    TimelineEntry = apps.get_model('posts', 'TimelineEntry')
+    db = schema_editor.connection.alias
+    follows = Follow.objects.using(db).order_by()
+    celebrities = (
+        follows.values('author_id').annotate(size=models.Count('id'))
+        .filter(size__gt=settings.TIMELINE_FANOUT_LIMIT)
+        .values('author_id')
+    )
+    readers = follows.values_list('user_id', flat=True).distinct()
+    for user_id in list(readers):
+        authors = follows.filter(user_id=user_id).values('author_id')
+        posts = (
+            Post.objects.using(db)
+            .filter(author_id__in=authors)
+            .exclude(author_id__in=celebrities)
+            .order_by('-pub_date', '-id')
+            .values_list('id', 'pub_date')[:settings.TIMELINE_SIZE]
+        )
+        TimelineEntry.objects.using(db).bulk_create(
+            [TimelineEntry(user_id=user_id, post_id=post_id,
+                           pub_date=pub_date)
+             for post_id, pub_date in posts],
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0006_follow'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pub_date', models.DateTimeField(verbose_name='Дата публикации')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='posts.Post', verbose_name='Пост')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline', to=settings.AUTH_USER_MODEL, verbose_name='Читатель')),
+            ],
+            options={
+                'verbose_name': 'Запись ленты',
+                'verbose_name_plural': 'Записи ленты',
+                'ordering': ['-pub_date'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['user', '-pub_date'], name='timeline_user_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='timelineentry',
+            constraint=models.UniqueConstraint(fields=('user', 'post'), name='unique_timeline_entry'),
+        ),
+        migrations.RunPython(
+            backfill_timelines, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 2.2.19 on 2026-10-17 23:35
+
+from django.db import migrations, models
+from django.db.utils import OperationalError
+
+FTS_TABLE = 'posts_search_fts'
+
+
+def create_fts_table(apps, schema_editor):
+    """Таблица FTS5 создается, только если SQLite собран с FTS5;
+    иначе поиск работает по таблице SearchTerm.
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    try:
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+            f"USING fts5(body, tokenize='unicode61')")
+    except OperationalError:
+        pass
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64, verbose_name='Основа слова')),
+                ('kind', models.CharField(choices=[('post', 'Пост'), ('comment', 'Комментарий'), ('group', 'Группа')], max_length=10, verbose_name='Тип')),
+                ('object_id', models.PositiveIntegerField(verbose_name='id объекта')),
+                ('weight', models.PositiveIntegerField(default=1, verbose_name='Частота')),
+            ],
+            options={
+                'verbose_name': 'Слово индекса',
+                'verbose_name_plural': 'Слова индекса',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='searchterm',
+            index=models.Index(fields=['term'], name='search_term_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='searchterm',
+            index=models.Index(fields=['kind', 'object_id'], name='search_object_idx'),
+        ),
+        migrations.RunPython(create_fts_table, drop_fts_table),
+    ]
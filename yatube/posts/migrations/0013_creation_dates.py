@@ -0,0 +1,24 @@
+# Generated by Django 2.2.19 on 2026-10-18 00:33
+
+from django.db import migrations
+import posts.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_trending'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='comment',
+            name='created',
+            field=posts.models.CreationDateTimeField(auto_now_add=True, verbose_name='Дата комментария'),
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='pub_date',
+            field=posts.models.CreationDateTimeField(auto_now_add=True, verbose_name='Дата публикации'),
+        ),
+    ]
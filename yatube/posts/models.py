@@ -1,15 +1,80 @@
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import models, router, transaction
 
 User = get_user_model()
 
 
-class Post(models.Model):
+class CreationDateTimeField(models.DateTimeField):
+    """auto_now_add, который не затирает уже заданную дату.
+
+    Импорт и генератор данных передают даты из источника прямо в
+    bulk_create; обычное создание получает текущее время.
+    """
+
+    def pre_save(self, model_instance, add):
+        value = getattr(model_instance, self.attname)
+        if add and value is not None:
+            return value
+        return super().pre_save(model_instance, add)
+
+
+class AtomicSaveMixin:
+    """Сохранение вместе с обработчиками post_save в одной транзакции.
+
+    Обработчики меняют счетчики через F(); при ошибке в них откатывается
+    и сама запись. Колонки COUNTER_FIELDS при обновлении не пишутся:
+    иначе сохранение устаревшего экземпляра (форма, админка) затрет
+    накопленные инкременты.
+    """
+    COUNTER_FIELDS = ()
+
+    def save(self, *args, **kwargs):
+        if (self.COUNTER_FIELDS and not self._state.adding
+                and kwargs.get('update_fields') is None
+                and not kwargs.get('force_insert')):
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.COUNTER_FIELDS
+                and field.attname not in deferred
+            ]
+        using = kwargs.get('using') or router.db_for_write(
+            type(self), instance=self)
+        # Без точки сохранения: внутри чужой транзакции ошибку откатит
+        # внешний блок, а лишние SAVEPOINT не нужны на каждой записи.
+        with transaction.atomic(using=using, savepoint=False):
+            super().save(*args, **kwargs)
+
+
+class PostQuerySet(models.QuerySet):
+    FEED_FIELDS = (
+        'text',
+        'pub_date',
+        'image',
+        'comments_count',
+        'trending_score',
+        'author__username',
+        'author__first_name',
+        'author__last_name',
+        'group__title',
+        'group__slug',
+    )
+
+    def for_feed(self):
+        """Посты для ленты: автор и группа подтягиваются одним JOIN,
+        ненужные в карточке колонки не загружаются.
+        """
+        return self.select_related('author', 'group').only(
+            *self.FEED_FIELDS)
+
+
+class Post(AtomicSaveMixin, models.Model):
     text = models.TextField(
         verbose_name='Текст поста',
         help_text='Текст нового поста'
     )
-    pub_date = models.DateTimeField(
+    pub_date = CreationDateTimeField(
         verbose_name='Дата публикации',
         auto_now_add=True
     )
@@ -33,26 +98,62 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    comments_count = models.PositiveIntegerField(
+        'Число комментариев',
+        default=0,
+        editable=False
+    )
+    trending_score = models.FloatField(
+        'Популярность',
+        default=0,
+        editable=False
+    )
+
+    COUNTER_FIELDS = ('comments_count', 'trending_score')
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ['-pub_date']
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'], name='post_date_idx'),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_date_idx'),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_date_idx'),
+            models.Index(
+                fields=['-trending_score', '-id'], name='post_trending_idx'),
+            models.Index(
+                fields=['group', '-trending_score', '-id'],
+                name='post_group_trending_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
 
-class Group(models.Model):
+class Group(AtomicSaveMixin, models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(unique=True)
     description = models.TextField(blank=True, null=True)
+    posts_count = models.PositiveIntegerField(
+        'Число постов',
+        default=0,
+        editable=False
+    )
+
+    COUNTER_FIELDS = ('posts_count',)
 
     def __str__(self):
         return self.title
 
 
-class Comment(models.Model):
+class Comment(AtomicSaveMixin, models.Model):
     post = models.ForeignKey(
         'Post',
         on_delete=models.CASCADE,
@@ -72,16 +173,23 @@ class Comment(models.Model):
         verbose_name='Комментарий',
         help_text='Введите комментарий к посту',
     )
-    created = models.DateTimeField(
+    created = CreationDateTimeField(
         verbose_name='Дата комментария',
         auto_now_add=True
     )
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['post', 'created', 'id'],
+                name='comment_post_created_idx'),
+        ]
+
     def __str__(self):
         return self.text[:15]
 
 
-class Follow(models.Model):
+class Follow(AtomicSaveMixin, models.Model):
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -94,3 +202,140 @@ class Follow(models.Model):
         related_name='following',
         verbose_name='Подписка'
     )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'], name='unique_follow'),
+        ]
+
+
+class Profile(models.Model):
+    """Денормализованные счетчики пользователя."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='profile',
+        verbose_name='Пользователь'
+    )
+    posts_count = models.PositiveIntegerField(
+        'Число постов',
+        default=0
+    )
+    followers_count = models.PositiveIntegerField(
+        'Число подписчиков',
+        default=0
+    )
+    following_count = models.PositiveIntegerField(
+        'Число подписок',
+        default=0
+    )
+    suggestions_stale = models.BooleanField(
+        'Пересчитать рекомендации',
+        default=True,
+        db_index=True
+    )
+
+    class Meta:
+        verbose_name = 'Профиль'
+        verbose_name_plural = 'Профили'
+
+    def __str__(self):
+        return str(self.user)
+
+
+class FollowSuggestion(models.Model):
+    """Рекомендация подписки, посчитанная compute_suggestions."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='follow_suggestions',
+        verbose_name='Читатель'
+    )
+    suggested = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Рекомендуемый автор'
+    )
+    score = models.FloatField('Оценка')
+    mutual_count = models.PositiveIntegerField(
+        'Общих подписок',
+        default=0
+    )
+
+    class Meta:
+        verbose_name = 'Рекомендация подписки'
+        verbose_name_plural = 'Рекомендации подписок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'suggested'], name='unique_suggestion'),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-score'], name='suggestion_user_score_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.user} -> {self.suggested}'
+
+
+class SearchTerm(models.Model):
+    """Запись инвертированного индекса (если нет SQLite FTS5)."""
+    TERM_LENGTH = 64
+    KIND_CHOICES = (
+        ('post', 'Пост'),
+        ('comment', 'Комментарий'),
+        ('group', 'Группа'),
+    )
+
+    term = models.CharField('Основа слова', max_length=TERM_LENGTH)
+    kind = models.CharField('Тип', max_length=10, choices=KIND_CHOICES)
+    object_id = models.PositiveIntegerField('id объекта')
+    weight = models.PositiveIntegerField('Частота', default=1)
+
+    class Meta:
+        verbose_name = 'Слово индекса'
+        verbose_name_plural = 'Слова индекса'
+        indexes = [
+            models.Index(fields=['term'], name='search_term_idx'),
+            models.Index(
+                fields=['kind', 'object_id'], name='search_object_idx'),
+        ]
+
+    def __str__(self):
+        return self.term
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост'
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации'
+    )
+
+    class Meta:
+        ordering = ['-pub_date']
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique_timeline_entry'),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date'], name='timeline_user_date_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.user} <- {self.post}'
@@ -0,0 +1,236 @@
+import base64
+import json
+import math
+from collections.abc import Sequence
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.http import QueryDict
+
+DEFAULT_ORDERING = ('-pub_date', '-id')
+FORWARD = 'n'
+BACKWARD = 'p'
+# Значений в ключе курсора: поле сортировки и id
+KEY_LENGTH = 2
+# Пределы целых, которые база принимает как параметр запроса
+MAX_INT = 2 ** 63 - 1
+# Номера страниц дальше этого сводятся к нему: OFFSET не растет без конца
+MAX_PAGE = 10000
+
+
+def encode_cursor(direction, values):
+    """Упаковывает направление и значения ключа в непрозрачный токен."""
+    raw = json.dumps([direction] + list(values), default=str)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Распаковывает токен; для битого токена возвращает None."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(data, list) or len(data) < 2:
+        return None
+    if data[0] not in (FORWARD, BACKWARD):
+        return None
+    values = data[1:]
+    if len(values) != KEY_LENGTH or not all(map(_scalar, values)):
+        return None
+    return data[0], values
+
+
+def _scalar(value):
+    """Годится ли значение из токена как значение ключа."""
+    if isinstance(value, bool):
+        return False
+    if isinstance(value, int):
+        return -MAX_INT <= value <= MAX_INT
+    if isinstance(value, float):
+        return math.isfinite(value)
+    return isinstance(value, str)
+
+
+class CursorPage(Sequence):
+    """Страница выдачи с курсорами на соседние страницы."""
+
+    def __init__(self, object_list, paginator, has_next, has_previous,
+                 params=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.has_next_page = has_next
+        self.has_previous_page = has_previous
+        self.params = params
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __repr__(self):
+        return '<CursorPage of %d items>' % len(self)
+
+    def has_next(self):
+        return self.has_next_page and bool(self.object_list)
+
+    def has_previous(self):
+        return self.has_previous_page
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    @property
+    def next_cursor(self):
+        if not self.has_next():
+            return None
+        return self.paginator.cursor_for(self.object_list[-1], FORWARD)
+
+    @property
+    def previous_cursor(self):
+        if not self.has_previous() or not self.object_list:
+            return None
+        return self.paginator.cursor_for(self.object_list[0], BACKWARD)
+
+    def _query(self, cursor=None):
+        if self.params is None:
+            params = QueryDict(mutable=True)
+        else:
+            params = self.params.copy()
+        for key in ('cursor', 'page'):
+            params.pop(key, None)
+        if cursor:
+            params['cursor'] = cursor
+        return params.urlencode()
+
+    @property
+    def first_query(self):
+        return self._query()
+
+    @property
+    def next_query(self):
+        return self._query(self.next_cursor)
+
+    @property
+    def previous_query(self):
+        return self._query(self.previous_cursor)
+
+
+class CursorPaginator:
+    """Постраничный вывод по ключу (keyset) вместо COUNT(*) и OFFSET.
+
+    Порядок задается кортежем полей, последним должно идти уникальное
+    поле (обычно id), чтобы ключ однозначно определял позицию.
+    """
+
+    def __init__(self, object_list, per_page, ordering=DEFAULT_ORDERING):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        self.fields = [name.lstrip('-') for name in self.ordering]
+
+    def cursor_for(self, obj, direction):
+        values = [getattr(obj, name) for name in self.fields]
+        return encode_cursor(direction, values)
+
+    def _parse_values(self, values):
+        if len(values) != len(self.fields):
+            raise ValueError('Неверная длина курсора')
+        return [self._field(name).to_python(value)
+                for name, value in zip(self.fields, values)]
+
+    def _field(self, name):
+        """Поле модели или выходное поле аннотации с этим именем."""
+        annotation = self.object_list.query.annotations.get(name)
+        if annotation is not None:
+            return annotation.output_field
+        return self.object_list.model._meta.get_field(name)
+
+    def _keyset_filter(self, values, backward):
+        """Условие «строго после ключа» с учетом направлений сортировки."""
+        condition = Q()
+        equal = {}
+        for name, field, value in zip(self.ordering, self.fields, values):
+            descending = name.startswith('-')
+            lookup = 'gt' if descending == backward else 'lt'
+            condition |= Q(**equal, **{'%s__%s' % (field, lookup): value})
+            equal[field] = value
+        return condition
+
+    def _reversed_ordering(self):
+        return [name[1:] if name.startswith('-') else '-' + name
+                for name in self.ordering]
+
+    def get_page(self, cursor=None, page=None, params=None):
+        """Возвращает страницу по курсору или по номеру (старые ссылки)."""
+        size = self.per_page
+        decoded = decode_cursor(cursor) if cursor else None
+        if decoded is not None:
+            direction, raw_values = decoded
+            try:
+                values = self._parse_values(raw_values)
+            except (ValueError, TypeError, OverflowError, ValidationError):
+                decoded = None
+        if decoded is None:
+            number = self.page_number(page)
+            queryset = self.object_list.order_by(*self.ordering)
+            offset = (number - 1) * size
+            items = list(queryset[offset:offset + size + 1])
+            return CursorPage(items[:size], self, len(items) > size,
+                              number > 1, params)
+        backward = direction == BACKWARD
+        queryset = self.object_list.filter(
+            self._keyset_filter(values, backward))
+        if backward:
+            queryset = queryset.order_by(*self._reversed_ordering())
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        items = list(queryset[:size + 1])
+        has_more = len(items) > size
+        items = items[:size]
+        if backward:
+            items.reverse()
+            return CursorPage(items, self, True, has_more, params)
+        return CursorPage(items, self, has_more, True, params)
+
+    @staticmethod
+    def page_number(page):
+        """Номер страницы из параметра ?page=; по умолчанию первая."""
+        try:
+            number = int(page)
+        except (TypeError, ValueError):
+            return 1
+        return min(max(number, 1), MAX_PAGE)
+
+
+def page_params(request, **extra):
+    """Параметры страницы ленты: курсор, номер страницы и extra.
+
+    Прочие параметры запроса (метки utm и т. п.) отбрасываются: из
+    этих строятся ключ кеша ленты и ссылки пагинации, и произвольный
+    параметр не должен заводить в кеше новую запись.
+    """
+    params = QueryDict(mutable=True)
+    cursor = request.GET.get('cursor')
+    if cursor and decode_cursor(cursor) is not None:
+        params['cursor'] = cursor
+    number = CursorPaginator.page_number(request.GET.get('page'))
+    if number > 1:
+        params['page'] = str(number)
+    for key, value in extra.items():
+        params[key] = value
+    return params
+
+
+def paginate(request, object_list, per_page, ordering=DEFAULT_ORDERING,
+             params=None):
+    """Страница выдачи по параметрам ?cursor= или ?page= запроса."""
+    if params is None:
+        params = page_params(request)
+    paginator = CursorPaginator(object_list, per_page, ordering)
+    return paginator.get_page(
+        params.get('cursor'),
+        params.get('page'),
+        params=params,
+    )
@@ -0,0 +1,387 @@
+"""Полнотекстовый поиск по постам, комментариям и группам.
+
+Тексты проходят общий анализатор: нижний регистр, ё -> е, стоп-слова
+и стемминг по алгоритму Snowball для русского языка. Индекс хранится
+либо в виртуальной таблице SQLite FTS5 (ранжирование bm25), либо, если
+FTS5 недоступен, в таблице SearchTerm как обычный инвертированный
+индекс с ранжированием tf-idf: оценки суммируются, сортируются и
+обрезаются в SQL, а число документов для idf берется из кеша. Индекс
+обновляется сигналами при сохранении и удалении объектов.
+"""
+import math
+import re
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, Count, F, FloatField, Sum, Value, When
+from django.db.models.functions import Ln
+
+from . import cache
+from .models import Comment, Group, Post, SearchTerm
+
+FTS_TABLE = 'posts_search_fts'
+DOCUMENTS_KEY = 'search:documents'
+KINDS = ('post', 'comment', 'group')
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+STOP_WORDS = frozenset('''
+    а без бы в во вот все всё где да для до еще ещё же за и из или
+    как к ко ли на над не ни но о об от по под при про с со так то
+    только у уже что чтобы это я ты он она оно мы вы они мне меня
+    the a an and or of to in on is are was for with
+'''.split())
+
+VOWELS = 'аеиоуыэюя'
+PERFECTIVE_GERUND = (
+    ('в', 'вши', 'вшись'),
+    ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'),
+)
+ADJECTIVE = (
+    'ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем',
+    'им', 'ым', 'ом', 'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю',
+    'ая', 'яя', 'ою', 'ею',
+)
+PARTICIPLE = (
+    ('ем', 'нн', 'вш', 'ющ', 'щ'),
+    ('ивш', 'ывш', 'ующ'),
+)
+REFLEXIVE = ('ся', 'сь')
+VERB = (
+    ('ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но', 'ет',
+     'ют', 'ны', 'ть', 'ешь', 'нно'),
+    ('ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей', 'уй',
+     'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят', 'ует', 'уют',
+     'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю'),
+)
+NOUN = (
+    'а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии', 'и',
+    'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам', 'ом', 'о',
+    'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия', 'ья', 'я',
+)
+SUPERLATIVE = ('ейш', 'ейше')
+DERIVATIONAL = ('ость', 'ост')
+
+
+def _strip(word, endings, after_a=False):
+    """Отрезает самое длинное окончание; для групп «после а/я»
+    окончание должно идти за а или я, которые остаются в слове.
+    """
+    for ending in sorted(endings, key=len, reverse=True):
+        if word.endswith(ending):
+            stem = word[:-len(ending)]
+            if after_a and not stem.endswith(('а', 'я')):
+                continue
+            return stem
+    return None
+
+
+def _strip_groups(word, groups):
+    first, second = groups
+    candidates = [stem for stem in (_strip(word, first, after_a=True),
+                                    _strip(word, second))
+                  if stem is not None]
+    return min(candidates, key=len) if candidates else None
+
+
+def _region(word, start=0):
+    """Начало области после первой пары «гласная, согласная»."""
+    for i in range(start + 1, len(word)):
+        if word[i] not in VOWELS and word[i - 1] in VOWELS:
+            return i + 1
+    return len(word)
+
+
+def stem(word):
+    """Стемминг русского слова по алгоритму Snowball (Портер)."""
+    if not re.search('[а-я]', word):
+        return word
+    rv_start = next(
+        (i + 1 for i, char in enumerate(word) if char in VOWELS), len(word))
+    r2_start = _region(word, _region(word))
+    prefix, rv = word[:rv_start], word[rv_start:]
+
+    stripped = _strip_groups(rv, PERFECTIVE_GERUND)
+    if stripped is not None:
+        rv = stripped
+    else:
+        stripped = _strip(rv, REFLEXIVE)
+        if stripped is not None:
+            rv = stripped
+        adjective = _strip(rv, ADJECTIVE)
+        if adjective is not None:
+            participle = _strip_groups(adjective, PARTICIPLE)
+            rv = participle if participle is not None else adjective
+        else:
+            stripped = _strip_groups(rv, VERB)
+            if stripped is None:
+                stripped = _strip(rv, NOUN)
+            if stripped is not None:
+                rv = stripped
+
+    if rv.endswith('и'):
+        rv = rv[:-1]
+
+    for ending in DERIVATIONAL:
+        in_r2 = rv_start + len(rv) - len(ending) >= r2_start
+        if rv.endswith(ending) and in_r2:
+            rv = rv[:-len(ending)]
+            break
+
+    if rv.endswith('нн'):
+        rv = rv[:-1]
+    else:
+        stripped = _strip(rv, SUPERLATIVE)
+        if stripped is not None:
+            rv = stripped[:-1] if stripped.endswith('нн') else stripped
+        elif rv.endswith('ь'):
+            rv = rv[:-1]
+    return prefix + rv
+
+
+def tokenize(text):
+    """Список основ слов текста для индекса и запросов."""
+    words = WORD_RE.findall((text or '').lower().replace('ё', 'е'))
+    return [stem(word) for word in words
+            if len(word) > 1 and word not in STOP_WORDS]
+
+
+def document(obj):
+    """Тип и текст объекта для индексации."""
+    if isinstance(obj, Post):
+        return 'post', obj.text
+    if isinstance(obj, Comment):
+        return 'comment', obj.text
+    if isinstance(obj, Group):
+        return 'group', f'{obj.title} {obj.description or ""}'
+    raise TypeError(f'{type(obj).__name__} не индексируется')
+
+
+class FTS5Backend:
+    """Индекс в виртуальной таблице SQLite FTS5."""
+
+    name = 'fts5'
+
+    @staticmethod
+    def _rowid(kind, object_id):
+        return object_id * len(KINDS) + KINDS.index(kind)
+
+    def index(self, kind, object_id, tokens):
+        rowid = self._rowid(kind, object_id)
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                           [rowid])
+            if tokens:
+                cursor.execute(
+                    f'INSERT INTO {FTS_TABLE} (rowid, body) VALUES (%s, %s)',
+                    [rowid, ' '.join(tokens)])
+
+    def index_many(self, kind, documents, replace=True):
+        """documents — пары (object_id, tokens); пишутся executemany."""
+        rows = [(self._rowid(kind, object_id), ' '.join(tokens))
+                for object_id, tokens in documents]
+        with connection.cursor() as cursor:
+            if replace:
+                cursor.executemany(
+                    f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                    [[rowid] for rowid, _ in rows])
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, body) VALUES (%s, %s)',
+                [[rowid, body] for rowid, body in rows if body])
+
+    def remove(self, kind, object_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                           [self._rowid(kind, object_id)])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+
+    def search(self, tokens, limit, offset):
+        query = ' '.join('"%s"' % token.replace('"', '') for token in tokens)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid, bm25({FTS_TABLE}) FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s '
+                f'ORDER BY bm25({FTS_TABLE}), rowid LIMIT %s OFFSET %s',
+                [query, limit, offset])
+            rows = cursor.fetchall()
+        return [(KINDS[rowid % len(KINDS)], rowid // len(KINDS), -score)
+                for rowid, score in rows]
+
+
+class InvertedIndexBackend:
+    """Инвертированный индекс в обычной таблице, tf-idf в SQL."""
+
+    name = 'python'
+
+    @staticmethod
+    def _terms(kind, object_id, tokens):
+        counts = defaultdict(int)
+        for token in tokens:
+            counts[token[:SearchTerm.TERM_LENGTH]] += 1
+        return [
+            SearchTerm(term=term, kind=kind, object_id=object_id,
+                       weight=weight)
+            for term, weight in counts.items()
+        ]
+
+    def index(self, kind, object_id, tokens):
+        self.remove(kind, object_id)
+        SearchTerm.objects.bulk_create(
+            self._terms(kind, object_id, tokens))
+
+    def index_many(self, kind, documents, replace=True):
+        """documents — пары (object_id, tokens); слова всей пачки
+        вставляются одним bulk_create.
+        """
+        if replace:
+            SearchTerm.objects.filter(
+                kind=kind,
+                object_id__in=[object_id for object_id, _ in documents],
+            ).delete()
+        SearchTerm.objects.bulk_create([
+            term for object_id, tokens in documents
+            for term in self._terms(kind, object_id, tokens)
+        ])
+
+    def remove(self, kind, object_id):
+        SearchTerm.objects.filter(kind=kind, object_id=object_id).delete()
+
+    def clear(self):
+        SearchTerm.objects.all().delete()
+        cache.get_cache().delete(DOCUMENTS_KEY)
+
+    @staticmethod
+    def documents():
+        """Число проиндексированных документов для idf.
+
+        Считается не чаще раза в SEARCH_DOCUMENTS_TIMEOUT секунд: на
+        ранжирование неточность в несколько документов не влияет.
+        """
+        store = cache.get_cache()
+        total = store.get(DOCUMENTS_KEY)
+        if total is None:
+            total = SearchTerm.objects.values(
+                'kind', 'object_id').distinct().count()
+            store.set(DOCUMENTS_KEY, total, settings.SEARCH_DOCUMENTS_TIMEOUT)
+        return max(total, 1)
+
+    def search(self, tokens, limit, offset):
+        terms = {token[:SearchTerm.TERM_LENGTH] for token in tokens}
+        frequencies = dict(
+            SearchTerm.objects.filter(term__in=terms)
+            .values('term').annotate(docs=Count('pk'))
+            .values_list('term', 'docs'))
+        if len(frequencies) < len(terms):
+            return []
+        total = self.documents()
+        idf = Case(
+            *(When(term=term, then=Value(math.log(1 + total / docs)))
+              for term, docs in frequencies.items()),
+            output_field=FloatField())
+        rows = (
+            SearchTerm.objects.filter(term__in=terms)
+            .values('kind', 'object_id')
+            .annotate(
+                score=Sum((Value(1.0) + Ln(F('weight'))) * idf,
+                          output_field=FloatField()),
+                matched=Count('term'))
+            .filter(matched=len(terms))
+            .order_by('-score', 'object_id')
+            .values_list('kind', 'object_id', 'score')
+        )
+        return list(rows[offset:offset + limit])
+
+
+_fts5_tables = {}
+
+
+def fts5_available():
+    """Есть ли таблица FTS5 (ее создает миграция, если SQLite умеет)."""
+    if connection.vendor != 'sqlite':
+        return False
+    if connection.alias not in _fts5_tables:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master "
+                "WHERE type = 'table' AND name = %s", [FTS_TABLE])
+            _fts5_tables[connection.alias] = cursor.fetchone() is not None
+    return _fts5_tables[connection.alias]
+
+
+def get_backend():
+    choice = settings.SEARCH_BACKEND
+    if choice == 'fts5' or (choice == 'auto' and fts5_available()):
+        return FTS5Backend()
+    return InvertedIndexBackend()
+
+
+def index_object(obj):
+    kind, text = document(obj)
+    get_backend().index(kind, obj.pk, tokenize(text))
+
+
+def remove_object(obj):
+    kind, _ = document(obj)
+    get_backend().remove(kind, obj.pk)
+
+
+def update(posts, comments, groups, batch_size=500, replace=True):
+    """Индексирует объекты querysets пачками по batch_size.
+
+    replace=False — индекс заведомо пуст, старые записи не удаляются.
+    """
+    backend = get_backend()
+    querysets = (
+        ('post', posts.only('text')),
+        ('comment', comments.only('text')),
+        ('group', groups.only('title', 'description')),
+    )
+    total = 0
+    for kind, queryset in querysets:
+        batch = []
+        for obj in queryset.iterator(chunk_size=batch_size):
+            batch.append((obj.pk, tokenize(document(obj)[1])))
+            if len(batch) == batch_size:
+                backend.index_many(kind, batch, replace)
+                total += len(batch)
+                batch = []
+        if batch:
+            backend.index_many(kind, batch, replace)
+            total += len(batch)
+    return total
+
+
+def rebuild(batch_size=500):
+    """Переиндексирует все посты, комментарии и группы."""
+    get_backend().clear()
+    return update(Post.objects.all(), Comment.objects.all(),
+                  Group.objects.all(), batch_size, replace=False)
+
+
+def search(query, limit, offset=0):
+    """Ранжированные результаты [(kind, object_id, score), ...]."""
+    tokens = tokenize(query)
+    if not tokens:
+        return []
+    return get_backend().search(tokens, limit, offset)
+
+
+def load_results(results):
+    """Подставляет объекты вместо пар (kind, id), сохраняя порядок."""
+    ids = defaultdict(list)
+    for kind, object_id, score in results:
+        ids[kind].append(object_id)
+    objects = {
+        'post': Post.objects.for_feed().in_bulk(ids['post']),
+        'comment': Comment.objects.select_related(
+            'author', 'post').in_bulk(ids['comment']),
+        'group': Group.objects.in_bulk(ids['group']),
+    }
+    return [
+        {'kind': kind, 'object': objects[kind][object_id], 'score': score}
+        for kind, object_id, score in results
+        if object_id in objects[kind]
+    ]
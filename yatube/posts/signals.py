@@ -0,0 +1,123 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import cache, counters, follow_graph, search, timeline, trending
+from .models import Comment, Follow, Group, Post, Profile, User
+
+
+def _invalidate_post_of(comment):
+    post = Post.objects.filter(pk=comment.post_id).values(
+        'author_id', 'group_id').first()
+    if post:
+        cache.invalidate_post(
+            comment.post_id, post['author_id'], post['group_id'])
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    if created and not kwargs.get('raw'):
+        Profile.objects.get_or_create(user=instance)
+    elif kwargs.get('update_fields') != frozenset(['last_login']):
+        # Имя автора выводится в карточке профиля; вход не в счет.
+        cache.invalidate_profile(instance.pk)
+
+
+@receiver(pre_save, sender=Post)
+def post_changing(sender, instance, **kwargs):
+    """Запоминает прежнюю группу, чтобы перенести счетчик."""
+    if instance.pk and not kwargs.get('raw'):
+        instance._old_group_id = (
+            Post.objects.filter(pk=instance.pk)
+            .values_list('group_id', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    if kwargs.get('raw'):
+        return
+    cache.invalidate_post(instance.pk, instance.author_id, instance.group_id)
+    search.index_object(instance)
+    if created:
+        counters.bump_profile(instance.author_id, 'posts_count', 1)
+        if instance.group_id:
+            counters.bump(
+                Group.objects.filter(pk=instance.group_id), 'posts_count', 1)
+        timeline.fan_out(instance)
+        return
+    old_group_id = getattr(instance, '_old_group_id', instance.group_id)
+    if old_group_id != instance.group_id:
+        if old_group_id:
+            counters.bump(
+                Group.objects.filter(pk=old_group_id), 'posts_count', -1)
+            cache.bump(cache.feed_name('group', old_group_id))
+        if instance.group_id:
+            counters.bump(
+                Group.objects.filter(pk=instance.group_id), 'posts_count', 1)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    cache.invalidate_post(instance.pk, instance.author_id, instance.group_id)
+    search.remove_object(instance)
+    counters.bump_profile(instance.author_id, 'posts_count', -1)
+    if instance.group_id:
+        counters.bump(
+            Group.objects.filter(pk=instance.group_id), 'posts_count', -1)
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, **kwargs):
+    if not kwargs.get('raw'):
+        cache.invalidate_group(instance.pk)
+        search.index_object(instance)
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    cache.invalidate_group(instance.pk)
+    search.remove_object(instance)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if kwargs.get('raw') or not instance.post_id:
+        return
+    if created:
+        counters.bump(
+            Post.objects.filter(pk=instance.post_id), 'comments_count', 1,
+            trending_score=trending.comment_score())
+    _invalidate_post_of(instance)
+    search.index_object(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    search.remove_object(instance)
+    if instance.post_id:
+        counters.bump(
+            Post.objects.filter(pk=instance.post_id), 'comments_count', -1)
+        _invalidate_post_of(instance)
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, **kwargs):
+    if created and not kwargs.get('raw'):
+        counters.bump_profile(instance.author_id, 'followers_count', 1)
+        counters.bump_profile(instance.user_id, 'following_count', 1,
+                              suggestions_stale=True)
+        timeline.backfill(instance.user_id, instance.author_id)
+        trending.follow_gained(instance.author_id)
+        follow_graph.follow(instance.user_id, instance.author_id)
+        cache.invalidate_profile(instance.author_id, instance.user_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.bump_profile(instance.author_id, 'followers_count', -1)
+    counters.bump_profile(instance.user_id, 'following_count', -1,
+                          suggestions_stale=True)
+    timeline.prune(instance.user_id, instance.author_id)
+    timeline.restore_author(instance.author_id)
+    follow_graph.unfollow(instance.user_id, instance.author_id)
+    cache.invalidate_profile(instance.author_id, instance.user_id)
@@ -0,0 +1,184 @@
+"""Рекомендации «кого почитать», посчитанные пакетно.
+
+compute_suggestions загружает граф подписок в массивы CSR (array из
+стандартной библиотеки): подписки пользователя u — срез
+indices[indptr[u]:indptr[u + 1]]. На подписку и на пользователя уходит
+по восемь байт без отдельного объекта на ребро, поэтому миллионы
+подписок занимают десятки мегабайт. Так же хранится активность в
+группах: группы, в которых писал автор, и самые активные авторы каждой
+группы (не больше SUGGESTIONS_GROUP_AUTHORS).
+
+Кандидат получает SUGGESTIONS_MUTUAL_WEIGHT за каждую подписку
+пользователя, которая подписана на кандидата (общие подписки), и
+SUGGESTIONS_GROUP_WEIGHT за каждую общую группу. От каждого соседа
+берется не больше SUGGESTIONS_MAX_FANOUT ребер, так что работа на
+пользователя ограничена. Лучшие SUGGESTIONS_TOP кандидатов пишутся в
+FollowSuggestion пачками по batch_size пользователей: в памяти
+одновременно только граф и одна пачка.
+
+Подписка и отписка помечают профиль (Profile.suggestions_stale), и
+compute_suggestions --stale пересчитывает только помеченных.
+Изменения в подписках подписок подхватывает полный пересчет.
+"""
+import heapq
+from array import array
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max
+
+from . import cache, follow_graph
+from .models import Follow, FollowSuggestion, Post, Profile, User
+
+# Строк за один запрос при чтении графа из базы
+ITERATOR_CHUNK = 10000
+
+
+class Adjacency:
+    """Списки смежности в формате CSR для вершин 0..size - 1."""
+
+    def __init__(self, pairs, size):
+        """pairs — пары (вершина, сосед), упорядоченные по вершине."""
+        self.indptr = array('q', bytes(8 * (size + 1)))
+        self.indices = array('q')
+        for node, neighbour in pairs:
+            self.indices.append(neighbour)
+            self.indptr[node + 1] += 1
+        for node in range(size):
+            self.indptr[node + 1] += self.indptr[node]
+
+    def neighbours(self, node, limit=None):
+        if node + 1 >= len(self.indptr):
+            # Вершина появилась после загрузки графа.
+            return self.indices[:0]
+        start, end = self.indptr[node], self.indptr[node + 1]
+        if limit is not None:
+            end = min(end, start + limit)
+        return self.indices[start:end]
+
+
+class Graph:
+    """Подписки и активность в группах, загруженные из базы."""
+
+    def __init__(self):
+        size = (User.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+        groups = (Post.objects.filter(group__isnull=False)
+                  .aggregate(last=Max('group_id'))['last'] or 0) + 1
+        self.follows = Adjacency(
+            Follow.objects.order_by('user_id', 'author_id')
+            .values_list('user_id', 'author_id')
+            .iterator(chunk_size=ITERATOR_CHUNK),
+            size)
+        self.groups = Adjacency(
+            Post.objects.filter(group__isnull=False)
+            .order_by('author_id', 'group_id')
+            .values_list('author_id', 'group_id').distinct()
+            .iterator(chunk_size=ITERATOR_CHUNK),
+            size)
+        self.group_authors = Adjacency(_top_authors(), groups)
+
+
+def _top_authors():
+    """Пары (группа, автор): самые активные авторы каждой группы."""
+    rows = (Post.objects.filter(group__isnull=False)
+            .values('group_id', 'author_id')
+            .annotate(posts=Count('pk'))
+            .order_by('group_id', '-posts', 'author_id')
+            .values_list('group_id', 'author_id')
+            .iterator(chunk_size=ITERATOR_CHUNK))
+    current, taken = None, 0
+    for group_id, author_id in rows:
+        if group_id != current:
+            current, taken = group_id, 0
+        if taken < settings.SUGGESTIONS_GROUP_AUTHORS:
+            taken += 1
+            yield group_id, author_id
+
+
+def suggest(graph, user_id, top):
+    """Лучшие кандидаты: список (id автора, оценка, общих подписок)."""
+    fanout = settings.SUGGESTIONS_MAX_FANOUT
+    followed = set(graph.follows.neighbours(user_id))
+    mutual = Counter()
+    for followee in graph.follows.neighbours(user_id, fanout):
+        mutual.update(graph.follows.neighbours(followee, fanout))
+    shared = Counter()
+    for group_id in graph.groups.neighbours(user_id):
+        shared.update(graph.group_authors.neighbours(group_id))
+    candidates = (mutual.keys() | shared.keys()) - followed - {user_id}
+    scored = (
+        (mutual[candidate] * settings.SUGGESTIONS_MUTUAL_WEIGHT
+         + shared[candidate] * settings.SUGGESTIONS_GROUP_WEIGHT,
+         -candidate)
+        for candidate in candidates
+    )
+    return [(-candidate, score, mutual[-candidate])
+            for score, candidate in heapq.nlargest(top, scored)]
+
+
+def _batches(ids, batch_size):
+    for start in range(0, len(ids), batch_size):
+        yield ids[start:start + batch_size]
+
+
+def _user_ids(stale):
+    """id пользователей для пересчета; их пометки снимаются сразу.
+
+    Пометки снимаются до загрузки графа: подписка, сделанная во время
+    пересчета, снова пометит профиль для следующего запуска.
+    """
+    users = User.objects.all()
+    if stale:
+        users = users.filter(profile__suggestions_stale=True)
+    ids = array('q', users.order_by('pk').values_list('pk', flat=True)
+                .iterator(chunk_size=ITERATOR_CHUNK))
+    if not stale:
+        Profile.objects.update(suggestions_stale=False)
+        return ids
+    for batch in _batches(ids, ITERATOR_CHUNK):
+        Profile.objects.filter(user_id__in=list(batch)).update(
+            suggestions_stale=False)
+    return ids
+
+
+def compute(stale=False, top=None, batch_size=1000):
+    """Пересчитывает рекомендации; возвращает число пользователей."""
+    top = top or settings.SUGGESTIONS_TOP
+    ids = _user_ids(stale)
+    if not ids:
+        return 0
+    graph = Graph()
+    for batch in _batches(ids, batch_size):
+        batch = list(batch)
+        rows = [
+            FollowSuggestion(user_id=user_id, suggested_id=suggested_id,
+                             score=score, mutual_count=mutual)
+            for user_id in batch
+            for suggested_id, score, mutual in suggest(graph, user_id, top)
+        ]
+        with transaction.atomic():
+            FollowSuggestion.objects.filter(user_id__in=batch).delete()
+            FollowSuggestion.objects.bulk_create(rows)
+    cache.bump(cache.SUGGESTIONS)
+    return len(ids)
+
+
+def for_user(user, exclude=None):
+    """Рекомендации для страницы одним запросом.
+
+    Авторы, на которых пользователь подписался после пересчета,
+    отбрасываются по графу подписок в кеше.
+    """
+    if not user.is_authenticated:
+        return []
+    suggestions = list(FollowSuggestion.objects.filter(user=user)
+                       .select_related('suggested')
+                       .order_by('-score', 'suggested_id')
+                       [:settings.SUGGESTIONS_TOP])
+    skip = follow_graph.followed_among(
+        user, [suggestion.suggested_id for suggestion in suggestions])
+    return [suggestion for suggestion in suggestions
+            if suggestion.suggested_id not in skip
+            and suggestion.suggested_id != exclude
+            ][:settings.SUGGESTIONS_SHOWN]
@@ -0,0 +1,142 @@
+"""Генератор синтетических данных для нагрузочных замеров.
+
+Популярность распределена по Ципфу: немногие авторы пишут большую
+часть постов и собирают большую часть подписчиков, немногие группы и
+посты получают большую часть записей и комментариев. Генератор
+детерминирован при одном и том же seed. Объекты вставляются через
+bulk_create пачками, производные данные (счетчики, ленты, поиск)
+пересобираются один раз в конце, как после импорта.
+"""
+import bisect
+import datetime
+import itertools
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from . import importer
+from .models import Comment, Follow, Group, Post, User
+
+BATCH_SIZE = 2000
+
+
+class ZipfSampler:
+    """Выбор ранга 0..n-1 с вероятностью, пропорциональной 1 / (r+1)**s."""
+
+    def __init__(self, n, s, rng):
+        self.rng = rng
+        self.cumulative = list(itertools.accumulate(
+            1 / (rank + 1) ** s for rank in range(n)))
+
+    def __call__(self):
+        point = self.rng.random() * self.cumulative[-1]
+        return bisect.bisect_left(self.cumulative, point)
+
+
+def _batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _bulk(model, objects, batch_size):
+    for batch in _batches(objects, batch_size):
+        with transaction.atomic():
+            model.objects.bulk_create(batch)
+
+
+def _words(rng, count):
+    vocabulary = (
+        'кот', 'город', 'лето', 'книга', 'дорога', 'море', 'горы', 'друг',
+        'фото', 'утро', 'вечер', 'кофе', 'музыка', 'работа', 'дом', 'сад',
+        'снег', 'дождь', 'поезд', 'река', 'история', 'новость', 'идея',
+    )
+    return ' '.join(rng.choice(vocabulary) for _ in range(count)).capitalize()
+
+
+def generate(users=1000, groups=20, posts=10000, follows=5000,
+             comments=20000, zipf=1.1, seed=1, days=365, prefix='synth',
+             batch_size=BATCH_SIZE, rebuild=True, log=None):
+    """Создает данные и возвращает число созданных объектов по типам."""
+    rng = random.Random(seed)
+    log = log or (lambda message: None)
+    now = timezone.now()
+    password = make_password(None)
+    since = importer.mark()
+
+    log(f'Пользователи: {users}')
+    _bulk(User, (
+        User(username=f'{prefix}{number:07d}', password=password)
+        for number in range(users)
+    ), batch_size)
+    user_ids = list(User.objects.filter(
+        username__startswith=prefix).order_by('username').values_list(
+        'pk', flat=True))
+
+    log(f'Группы: {groups}')
+    _bulk(Group, (
+        Group(title=f'Группа {number}', slug=f'{prefix}-{number}')
+        for number in range(groups)
+    ), batch_size)
+    group_ids = list(Group.objects.filter(
+        slug__startswith=f'{prefix}-').values_list('pk', flat=True))
+
+    author = ZipfSampler(len(user_ids), zipf, rng)
+    group = ZipfSampler(len(group_ids), zipf, rng) if group_ids else None
+    span = datetime.timedelta(days=days).total_seconds()
+
+    def post_objects():
+        # Даты возрастают вместе с id, как у настоящей ленты.
+        for number in range(posts):
+            offset = span * (posts - number) / max(posts, 1)
+            yield Post(
+                author_id=user_ids[author()],
+                group_id=(group_ids[group()]
+                          if group and rng.random() < 0.7 else None),
+                text=_words(rng, rng.randint(5, 40)),
+                pub_date=now - datetime.timedelta(seconds=offset),
+            )
+
+    log(f'Посты: {posts}')
+    _bulk(Post, post_objects(), batch_size)
+
+    log(f'Подписки: {follows}')
+    pairs = set()
+    limit = len(user_ids) * (len(user_ids) - 1)
+    while len(pairs) < min(follows, limit):
+        follower = rng.choice(user_ids)
+        followed = user_ids[author()]
+        if follower != followed:
+            pairs.add((follower, followed))
+    _bulk(Follow, (Follow(user_id=user_id, author_id=author_id)
+                   for user_id, author_id in sorted(pairs)), batch_size)
+
+    if comments:
+        post_ids = list(Post.objects.filter(
+            author_id__in=user_ids).order_by('-pub_date').values_list(
+            'pk', flat=True))
+        commented = ZipfSampler(len(post_ids), zipf, rng)
+        log(f'Комментарии: {comments}')
+        _bulk(Comment, (
+            Comment(post_id=post_ids[commented()],
+                    author_id=rng.choice(user_ids),
+                    text=_words(rng, rng.randint(2, 15)),
+                    created=now)
+            for _ in range(comments)
+        ), batch_size)
+
+    if rebuild:
+        log('Пересборка счетчиков, лент и поиска')
+        importer.finish(since)
+    return {
+        'users': len(user_ids),
+        'groups': len(group_ids),
+        'posts': posts,
+        'follows': len(pairs),
+        'comments': comments,
+    }
@@ -0,0 +1,33 @@
+from django import template
+
+from posts import cache
+
+register = template.Library()
+
+
+class FragmentCacheNode(template.Node):
+    def __init__(self, nodelist, key):
+        self.nodelist = nodelist
+        self.key = key
+
+    def render(self, context):
+        key = self.key.resolve(context)
+        if not key:
+            return self.nodelist.render(context)
+        return cache.fragment(key, lambda: self.nodelist.render(context))
+
+
+@register.tag
+def cachefragment(parser, token):
+    """{% cachefragment key %}...{% endcachefragment %}
+
+    Кеширует содержимое под готовым версионным ключом. Пустой ключ
+    отключает кеширование.
+    """
+    bits = token.split_contents()
+    if len(bits) != 2:
+        raise template.TemplateSyntaxError(
+            "'cachefragment' принимает ровно один аргумент (ключ)")
+    nodelist = parser.parse(('endcachefragment',))
+    parser.delete_first_token()
+    return FragmentCacheNode(nodelist, parser.compile_filter(bits[1]))
@@ -0,0 +1,17 @@
+from django import template
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def ready_image(image):
+    """Готовые адаптивные варианты картинки или None.
+
+    При промахе ставит генерацию в фон и ничего не ждет.
+    """
+    variants = thumbnails.lookup(image)
+    if variants is None:
+        thumbnails.schedule(image)
+    return variants
@@ -0,0 +1,178 @@
+import base64
+import json
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts import api
+from posts.models import Comment, Follow, Group, Post, User
+
+
+def basic_auth(username, password):
+    token = base64.b64encode(f'{username}:{password}'.encode()).decode()
+    return {'HTTP_AUTHORIZATION': f'Basic {token}'}
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='Writer', password='secret-pass')
+        cls.reader = User.objects.create_user(
+            username='Reader', password='secret-pass')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {number}')
+            for number in range(5)
+        ]
+        cls.post = cls.posts[-1]
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def get_json(self, url, data=None, **extra):
+        response = self.client.get(url, data, **extra)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        content = b''.join(getattr(response, 'streaming_content', None)
+                           or [response.content])
+        return response, json.loads(content)
+
+    def send(self, method, url, data, **extra):
+        return getattr(self.client, method)(
+            url, json.dumps(data), content_type='application/json',
+            **extra)
+
+    def test_post_list_cursor_pagination(self):
+        """Список постов листается курсором без повторов."""
+        url = reverse('api:post_list') + '?limit=2'
+        seen = []
+        while url:
+            response, data = self.get_json(url)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(item['id'] for item in data['results'])
+            url = data['next']
+        expected = [post.pk for post in reversed(self.posts)]
+        self.assertEqual(seen, expected)
+
+    def test_post_embeds_author_and_group(self):
+        """Автор и группа встроены в пост, запрос к базе один."""
+        with self.assertNumQueries(1):
+            _, data = self.get_json(reverse('api:post_list'))
+        item = data['results'][0]
+        self.assertEqual(item['author']['username'], 'Writer')
+        self.assertEqual(item['group'], {'slug': 'group', 'title': 'Группа'})
+
+    def test_fields_selection(self):
+        """Параметр fields ограничивает поля ответа."""
+        _, data = self.get_json(
+            reverse('api:post_detail', kwargs={'post_id': self.post.pk}),
+            {'fields': 'id,text'})
+        self.assertEqual(data, {'id': self.post.pk, 'text': self.post.text})
+        response, data = self.get_json(
+            reverse('api:post_list'), {'fields': 'id,secret'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(data['fields'], ['secret'])
+
+    def test_filters_and_groups(self):
+        """Фильтр постов по группе и чтение групп."""
+        other = Post.objects.create(author=self.reader, text='Без группы')
+        _, data = self.get_json(reverse('api:post_list'),
+                                {'group': 'group', 'fields': 'id'})
+        self.assertNotIn({'id': other.pk}, data['results'])
+        _, data = self.get_json(reverse('api:group_list'))
+        self.assertEqual(data['results'][0]['posts_count'], 5)
+        response, _ = self.get_json(
+            reverse('api:group_detail', kwargs={'slug': 'missing'}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_write_requires_auth(self):
+        """Гость не может писать, Basic-авторизация работает."""
+        url = reverse('api:post_list')
+        response = self.send('post', url, {'text': 'Новый'})
+        self.assertEqual(response.status_code, 401)
+        response = self.send('post', url, {'text': 'Новый'},
+                             **basic_auth('Reader', 'wrong'))
+        self.assertEqual(response.status_code, 401)
+        response = self.send('post', url,
+                             {'text': 'Новый', 'group': self.group.pk},
+                             **basic_auth('Reader', 'secret-pass'))
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        self.assertEqual(data['author']['username'], 'Reader')
+        self.assertTrue(Post.objects.filter(
+            pk=data['id'], author=self.reader, group=self.group).exists())
+
+    def test_session_writes_check_csrf(self):
+        """Запрос с сессией без CSRF-токена отклоняется."""
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.author)
+        response = client.post(
+            reverse('api:post_list'), json.dumps({'text': 'Новый'}),
+            content_type='application/json')
+        self.assertEqual(response.status_code, 403)
+
+    def test_only_author_edits_post(self):
+        """Редактировать и удалять пост может только автор."""
+        url = reverse('api:post_detail', kwargs={'post_id': self.post.pk})
+        response = self.send('patch', url, {'text': 'Чужой'},
+                             **basic_auth('Reader', 'secret-pass'))
+        self.assertEqual(response.status_code, 403)
+        response = self.send('patch', url, {'text': 'Исправлен'},
+                             **basic_auth('Writer', 'secret-pass'))
+        self.assertEqual(response.status_code, 200)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.text, 'Исправлен')
+        self.assertEqual(self.post.group, self.group)
+        response = self.client.delete(
+            url, **basic_auth('Writer', 'secret-pass'))
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(Post.objects.filter(pk=self.post.pk).exists())
+
+    def test_comments(self):
+        """Комментарии создаются и читаются по порядку."""
+        url = reverse('api:comment_list', kwargs={'post_id': self.post.pk})
+        auth = basic_auth('Reader', 'secret-pass')
+        for text in ('Первый', 'Второй'):
+            response = self.send('post', url, {'text': text}, **auth)
+            self.assertEqual(response.status_code, 201)
+        response = self.send('post', url, {'text': ''}, **auth)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('text', response.json()['errors'])
+        _, data = self.get_json(url)
+        self.assertEqual([item['text'] for item in data['results']],
+                         ['Первый', 'Второй'])
+        self.assertEqual(Comment.objects.count(), 2)
+
+    def test_follow(self):
+        """Подписка, список подписок и отписка."""
+        url = reverse('api:follow_list')
+        auth = basic_auth('Reader', 'secret-pass')
+        response, _ = self.get_json(url)
+        self.assertEqual(response.status_code, 401)
+        response = self.send('post', url, {'author': 'Reader'}, **auth)
+        self.assertEqual(response.status_code, 400)
+        response = self.send('post', url, {'author': 'Writer'}, **auth)
+        self.assertEqual(response.status_code, 201)
+        _, data = self.get_json(url, **auth)
+        self.assertEqual(data['results'][0]['author']['username'], 'Writer')
+        response = self.client.delete(
+            reverse('api:follow_detail', kwargs={'username': 'Writer'}),
+            **auth)
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(Follow.objects.exists())
+
+    def test_method_not_allowed(self):
+        """Неподдерживаемый метод возвращает 405 в JSON."""
+        response = self.client.delete(reverse('api:group_list'))
+        self.assertEqual(response.status_code, 405)
+        self.assertEqual(response['Allow'], 'GET')
+
+    def test_page_size_is_limited(self):
+        """Размер страницы не превышает MAX_PAGE_SIZE."""
+        self.assertEqual(api.MAX_PAGE_SIZE, 100)
+        _, data = self.get_json(reverse('api:post_list'), {'limit': 1000})
+        self.assertEqual(len(data['results']), 5)
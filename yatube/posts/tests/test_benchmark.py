@@ -0,0 +1,90 @@
+import random
+import tracemalloc
+from collections import Counter
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts import benchmark, synthetic
+from posts.models import Comment, Follow, Post, TimelineEntry, User
+
+
+class SyntheticDataTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_zipf_sampler_is_skewed(self):
+        """Первые ранги выпадают заметно чаще последних."""
+        sample = synthetic.ZipfSampler(100, 1.1, random.Random(1))
+        counts = Counter(sample() for _ in range(5000))
+        self.assertGreater(counts[0], 10 * counts[50])
+        self.assertTrue(all(0 <= rank < 100 for rank in counts))
+
+    def test_generate(self):
+        """Генератор создает заданный объем данных и производные."""
+        created = synthetic.generate(
+            users=30, groups=3, posts=200, follows=60, comments=100)
+        self.assertEqual(created['follows'], 60)
+        self.assertEqual(User.objects.count(), 30)
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertEqual(Follow.objects.count(), 60)
+        self.assertEqual(Comment.objects.count(), 100)
+        self.assertTrue(TimelineEntry.objects.exists())
+        top = User.objects.order_by('-profile__posts_count').first()
+        self.assertGreater(top.profile.posts_count, 200 / 30)
+
+    def test_generate_is_reproducible(self):
+        """Одинаковый seed дает одинаковые данные."""
+        synthetic.generate(users=10, groups=2, posts=20, follows=10,
+                           comments=0, prefix='a', rebuild=False)
+        synthetic.generate(users=10, groups=2, posts=20, follows=10,
+                           comments=0, prefix='b', rebuild=False)
+
+        def authors(prefix):
+            return [name[1:] for name in Post.objects.filter(
+                author__username__startswith=prefix).order_by(
+                'id').values_list('author__username', flat=True)]
+        self.assertEqual(authors('a'), authors('b'))
+
+
+class BenchmarkTests(TestCase):
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(benchmark.percentile(values, 0.5), 50)
+        self.assertEqual(benchmark.percentile(values, 0.99), 99)
+        self.assertEqual(benchmark.percentile([7], 0.95), 7)
+
+    def test_run_and_compare(self):
+        """Замер отдает метрики по страницам, сравнение ищет регрессии."""
+        synthetic.generate(users=10, groups=2, posts=30, follows=10,
+                           comments=10)
+        result = benchmark.run(requests=2, warmup=0)
+        for name in ('index', 'profile', 'follow_index', 'post_detail'):
+            with self.subTest(name=name):
+                row = result['results'][name]
+                self.assertEqual(row['status'], 200)
+                self.assertGreater(row['queries'], 0)
+                self.assertLessEqual(row['p50_ms'], row['p99_ms'])
+        worse = {'results': {'index': dict(
+            result['results']['index'],
+            queries=result['results']['index']['queries'] + 5)}}
+        self.assertEqual(benchmark.compare(result, worse)[0][:2],
+                         ('index', 'queries'))
+        self.assertEqual(benchmark.compare(result, result), [])
+
+    def test_memory_measured_outside_timed_requests(self):
+        """tracemalloc не работает во время замера времени."""
+        tracing = []
+        get = benchmark._get
+
+        def traced_get(client, url):
+            tracing.append(tracemalloc.is_tracing())
+            return get(client, url)
+
+        with mock.patch('posts.benchmark._get', traced_get):
+            row = benchmark.measure(
+                Client(), reverse('posts:index'), requests=2, warmup=0)
+        self.assertEqual(
+            tracing, [False] * 2 + [True] * benchmark.MEMORY_REQUESTS)
+        self.assertGreater(row['peak_memory_kb'], 0)
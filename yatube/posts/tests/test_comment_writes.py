@@ -0,0 +1,92 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from posts import comment_queue, throttle
+from posts.models import Comment, Post, User
+
+
+class ThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_token_bucket(self):
+        """Корзина пропускает capacity действий и наполняется со временем."""
+        bucket = [('test', 2, 10)]
+        self.assertEqual(throttle.take(bucket, now=100), 0)
+        self.assertEqual(throttle.take(bucket, now=100), 0)
+        self.assertAlmostEqual(throttle.take(bucket, now=100), 5)
+        self.assertAlmostEqual(throttle.take(bucket, now=103), 2)
+        self.assertEqual(throttle.take(bucket, now=105), 0)
+
+    def test_all_or_nothing(self):
+        """Отказ одной корзины не тратит жетоны других."""
+        throttle.take([('full', 1, 10)], now=100)
+        self.assertTrue(throttle.take(
+            [('spare', 1, 10), ('full', 1, 10)], now=100))
+        self.assertEqual(throttle.take([('spare', 1, 10)], now=100), 0)
+
+
+@override_settings(COMMENT_THROTTLE_USER=(2, 60))
+class CommentWriteTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Writer')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.comment_url = reverse(
+            'posts:add_comment', kwargs={'post_id': self.post.pk})
+        self.detail_url = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk})
+
+    def test_comments_are_throttled(self):
+        """Сверх лимита комментарий отклоняется с 429 и Retry-After."""
+        for number in range(2):
+            response = self.reader_client.post(
+                self.comment_url, {'text': f'Ответ {number}'})
+            self.assertEqual(response.status_code, 302)
+        response = self.reader_client.post(
+            self.comment_url, {'text': 'Лишний'})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '30')
+        self.assertFalse(Comment.objects.filter(text='Лишний').exists())
+        response = self.reader_client.post(
+            reverse('api:comment_list', kwargs={'post_id': self.post.pk}),
+            {'text': 'Лишний'})
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        response = self.author_client.post(
+            self.comment_url, {'text': 'Автор'})
+        self.assertEqual(response.status_code, 302)
+
+    @override_settings(COMMENT_WRITE_BEHIND=True)
+    @mock.patch('posts.comment_queue._ensure_worker')
+    def test_write_behind(self, ensure_worker):
+        """Комментарий ждет в очереди, автор видит его сразу."""
+        self.addCleanup(comment_queue.flush)
+        self.reader_client.post(self.comment_url, {'text': 'В очереди'})
+        ensure_worker.assert_called_once()
+        self.assertFalse(Comment.objects.filter(text='В очереди').exists())
+        self.assertContains(
+            self.reader_client.get(self.detail_url), 'В очереди')
+        self.assertNotContains(
+            self.author_client.get(self.detail_url), 'В очереди')
+
+        self.assertEqual(comment_queue.flush(), 1)
+        comment = Comment.objects.get(text='В очереди')
+        self.assertEqual(comment.author, self.reader)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+        self.assertEqual(comment_queue.pending(self.post.pk, self.reader),
+                         [])
+        response = self.author_client.get(self.detail_url)
+        self.assertEqual(list(response.context['comments']), [comment])
@@ -0,0 +1,64 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts.cache import PAGE_CACHE_HEADER
+from posts.models import Comment, Post, User
+from posts.views import COMMENTS_PER_PAGE
+
+
+class CommentPaginationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Writer')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.author, text=f'Ответ {number}')
+            for number in range(COMMENTS_PER_PAGE * 2 + 5))
+        cls.comments = list(
+            cls.post.comments.order_by('created', 'id').values_list(
+                'text', flat=True))
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.detail_url = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk})
+
+    def texts(self, response):
+        return [comment.text for comment in response.context['comments']]
+
+    def test_only_first_page_is_inline(self):
+        """На странице поста только первая страница комментариев."""
+        response = self.guest_client.get(self.detail_url)
+        self.assertEqual(self.texts(response),
+                         self.comments[:COMMENTS_PER_PAGE])
+        self.assertContains(response, 'data-comments-more')
+
+    def test_load_more_fragments(self):
+        """Фрагменты по курсору отдают остальные комментарии по порядку."""
+        page = self.guest_client.get(self.detail_url).context['comments']
+        texts = [comment.text for comment in page]
+        while page.has_next():
+            response = self.guest_client.get(
+                reverse('posts:post_comments',
+                        kwargs={'post_id': self.post.pk})
+                + f'?cursor={page.next_cursor}')
+            self.assertTemplateNotUsed(response, 'posts/post_detail.html')
+            page = response.context['comments']
+            texts.extend(comment.text for comment in page)
+        self.assertEqual(texts, self.comments)
+        self.assertNotContains(response, 'data-comments-more')
+
+    def test_cursor_without_javascript(self):
+        """Без JS следующая страница открывается на странице поста."""
+        page = self.guest_client.get(self.detail_url).context['comments']
+        response = self.guest_client.get(
+            self.detail_url + f'?comments={page.next_cursor}')
+        self.assertEqual(
+            self.texts(response),
+            self.comments[COMMENTS_PER_PAGE:COMMENTS_PER_PAGE * 2])
+        # Битый курсор дает первую страницу, уже лежащую в кеше.
+        response = self.guest_client.get(self.detail_url + '?comments=bad')
+        self.assertEqual(response[PAGE_CACHE_HEADER], 'hit')
+        self.assertContains(response, self.comments[0])
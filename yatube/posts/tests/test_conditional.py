@@ -0,0 +1,86 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Writer')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_posts', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile',
+                    kwargs={'username': self.author.username}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        )
+
+    def test_unchanged_pages_return_304(self):
+        """Неизменная страница отдается как 304 без основного запроса."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                etag = self.guest_client.get(url)['ETag']
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.guest_client.get(
+                        url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertLessEqual(len(queries), 3)
+                self.assertEqual(response.content, b'')
+
+    def test_changes_invalidate_etag(self):
+        """Новый комментарий и пост меняют ETag."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                etag = self.guest_client.get(url)['ETag']
+                Comment.objects.create(
+                    post=self.post, author=self.reader, text='Коммент')
+                response = self.guest_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_etag_depends_on_user(self):
+        """Разные пользователи получают разные ETag."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                guest_etag = self.guest_client.get(url)['ETag']
+                response = self.reader_client.get(
+                    url, HTTP_IF_NONE_MATCH=guest_etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('Cookie', response['Vary'])
+
+    def test_follow_changes_profile_etag(self):
+        """Подписка меняет ETag профиля для подписчика."""
+        url = reverse('posts:profile',
+                      kwargs={'username': self.author.username})
+        etag = self.reader_client.get(url)['ETag']
+        Follow.objects.create(user=self.reader, author=self.author)
+        response = self.reader_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_page_object_looked_up_once(self):
+        """Группа, автор и пост ищутся один раз на запрос."""
+        lookups = ('"posts_group"."slug" =', '"auth_user"."username" =',
+                   '"posts_post"."id" =')
+        for url, lookup in zip(self.urls[1:], lookups):
+            with self.subTest(url=url):
+                cache.clear()
+                with CaptureQueriesContext(connection) as queries:
+                    self.guest_client.get(url)
+                found = [query['sql'] for query in queries
+                         if query['sql'].startswith('SELECT')
+                         and lookup in query['sql']]
+                self.assertEqual(len(found), 1, found)
@@ -0,0 +1,97 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase
+from posts.models import Comment, Follow, Group, Post, Profile, User
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Writer')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        cls.group2 = Group.objects.create(title='Группа2', slug='group2')
+
+    def profile(self, user):
+        return Profile.objects.get(user=user)
+
+    def test_post_counters(self):
+        """Создание, перенос и удаление поста меняют счетчики."""
+        post = Post.objects.create(
+            author=self.author, group=self.group, text='Пост')
+        self.assertEqual(self.profile(self.author).posts_count, 1)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 1)
+        post.group = self.group2
+        post.save()
+        self.group.refresh_from_db()
+        self.group2.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 0)
+        self.assertEqual(self.group2.posts_count, 1)
+        post.delete()
+        self.group2.refresh_from_db()
+        self.assertEqual(self.profile(self.author).posts_count, 0)
+        self.assertEqual(self.group2.posts_count, 0)
+
+    def test_comment_counter(self):
+        """Комментарии учитываются в счетчике поста."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        comment = Comment.objects.create(
+            post=post, author=self.reader, text='Коммент')
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+
+    def test_follow_counters(self):
+        """Подписка меняет счетчики подписчиков и подписок."""
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.profile(self.author).followers_count, 1)
+        self.assertEqual(self.profile(self.reader).following_count, 1)
+        follow.delete()
+        self.assertEqual(self.profile(self.author).followers_count, 0)
+        self.assertEqual(self.profile(self.reader).following_count, 0)
+
+    def test_stale_save_keeps_counters(self):
+        """Сохранение устаревшего экземпляра не затирает счетчики."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        Comment.objects.create(post=post, author=self.reader, text='Ком')
+        post.text = 'Новый текст'
+        post.save()
+        post.refresh_from_db()
+        self.assertEqual(post.text, 'Новый текст')
+        self.assertEqual(post.comments_count, 1)
+        self.assertGreater(post.trending_score, 0)
+
+    def test_failed_counter_rolls_back_save(self):
+        """Ошибка при обновлении счетчиков откатывает и саму запись."""
+        with mock.patch('posts.signals.counters.bump_profile',
+                        side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                Follow.objects.create(user=self.reader, author=self.author)
+        self.assertFalse(Follow.objects.exists())
+
+    def test_recount_repairs_drift(self):
+        """Команда recount_counters исправляет рассинхронизацию."""
+        post = Post.objects.create(
+            author=self.author, group=self.group, text='Пост')
+        Comment.objects.create(post=post, author=self.reader, text='Ком')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Profile.objects.update(
+            posts_count=7, followers_count=7, following_count=7)
+        Post.objects.update(comments_count=7)
+        Group.objects.update(posts_count=7)
+        Profile.objects.filter(user=self.reader).delete()
+        call_command('recount_counters', stdout=StringIO())
+        post.refresh_from_db()
+        self.group.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(self.group.posts_count, 1)
+        self.assertEqual(self.profile(self.author).posts_count, 1)
+        self.assertEqual(self.profile(self.author).followers_count, 1)
+        self.assertEqual(self.profile(self.reader).following_count, 1)
@@ -0,0 +1,93 @@
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts import export
+from posts.models import Comment, Group, Post, User
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Writer')
+        cls.other = User.objects.create_user(username='Other')
+        cls.staff = User.objects.create_user(
+            username='Staff', is_staff=True)
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост, "{n}"')
+            for n in range(5)
+        ]
+        cls.foreign = Post.objects.create(author=cls.other, text='Чужой')
+        Comment.objects.create(
+            post=cls.posts[0], author=cls.other, text='Комментарий')
+
+    def read(self, **kwargs):
+        return b''.join(export.stream(**kwargs)).decode()
+
+    def test_ndjson_in_batches(self):
+        """Выгрузка пачками по id отдает все строки по одному разу."""
+        with self.assertNumQueries(4):
+            lines = self.read(kind='posts', batch_size=2).splitlines()
+        rows = [json.loads(line) for line in lines]
+        self.assertEqual([row['id'] for row in rows],
+                         [post.pk for post in self.posts]
+                         + [self.foreign.pk])
+        self.assertEqual(rows[0]['author'], 'Writer')
+        self.assertEqual(rows[0]['group'], 'group')
+        self.assertIsNone(rows[-1]['group'])
+
+    def test_csv_and_filters(self):
+        """CSV с заголовком, фильтры по автору и группе."""
+        content = self.read(kind='posts', export_format='csv',
+                            author='Writer', group='group')
+        rows = list(csv.reader(io.StringIO(content)))
+        self.assertEqual(rows[0][:3], ['id', 'pub_date', 'author'])
+        self.assertEqual(len(rows), 1 + len(self.posts))
+        self.assertEqual(rows[1][4], 'Пост, "0"')
+
+    def test_date_filters(self):
+        """Границы дат включают весь последний день."""
+        today = self.posts[0].pub_date.date().isoformat()
+        self.assertEqual(len(self.read(
+            kind='comments', since=export.parse_moment(today),
+            until=export.parse_moment(today, end=True)).splitlines()), 1)
+        self.assertEqual(self.read(
+            kind='comments',
+            until=export.parse_moment(today)), '')
+        with self.assertRaises(ValueError):
+            export.parse_moment('вчера')
+
+    def test_command_writes_gzip_file(self):
+        """Команда пишет сжатый файл."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'comments.ndjson.gz')
+            call_command('export_posts', kind='comments', gzip=True,
+                         output=path, stderr=io.StringIO())
+            with gzip.open(path, 'rt') as file:
+                row = json.loads(file.readline())
+        self.assertEqual(row['text'], 'Комментарий')
+        self.assertEqual(row['post'], self.posts[0].pk)
+
+    def test_view_is_staff_only_and_streaming(self):
+        """Выгрузка доступна только персоналу и отдается потоком."""
+        url = reverse('posts:export')
+        client = Client()
+        client.force_login(self.author)
+        self.assertEqual(client.get(url).status_code, 302)
+        client.force_login(self.staff)
+        response = client.get(url, {'format': 'csv', 'gzip': '1'})
+        self.assertTrue(response.streaming)
+        self.assertIn('posts-', response['Content-Disposition'])
+        content = gzip.decompress(b''.join(response.streaming_content))
+        self.assertEqual(len(content.decode().splitlines()), 7)
+        response = client.get(url, {'format': 'xml'})
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,78 @@
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts import cache as feed_cache
+from posts import follow_graph
+from posts.models import Follow, User
+
+
+class FollowGraphTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.authors = [User.objects.create_user(username=f'Writer{number}')
+                       for number in range(3)]
+        Follow.objects.create(user=cls.reader, author=cls.authors[0])
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_sets_match_database(self):
+        """Множества подписок и подписчиков совпадают с базой."""
+        first, second, _ = self.authors
+        self.assertEqual(follow_graph.followees(self.reader), {first.pk})
+        self.assertEqual(follow_graph.followers(first), {self.reader.pk})
+        self.assertTrue(follow_graph.is_following(self.reader, first))
+        self.assertFalse(follow_graph.is_following(self.reader, second))
+        self.assertFalse(follow_graph.is_following(AnonymousUser(), first))
+        self.assertEqual(
+            follow_graph.followed_among(
+                self.reader, [author.pk for author in self.authors]),
+            {first.pk})
+
+    def test_checks_without_queries(self):
+        """Загруженное множество проверяется без запросов к базе."""
+        follow_graph.followees(self.reader)
+        with self.assertNumQueries(0):
+            for author in self.authors:
+                follow_graph.is_following(self.reader, author)
+
+    def test_follow_and_unfollow_update_sets(self):
+        """Подписка и отписка меняют множества на месте."""
+        author = self.authors[1]
+        follow_graph.followees(self.reader)
+        follow_graph.followers(author)
+        self.reader_client.get(
+            reverse('posts:profile_follow', args=[author.username]))
+        with self.assertNumQueries(0):
+            self.assertTrue(follow_graph.is_following(self.reader, author))
+            self.assertIn(self.reader.pk, follow_graph.followers(author))
+        self.reader_client.get(
+            reverse('posts:profile_unfollow', args=[author.username]))
+        with self.assertNumQueries(0):
+            self.assertFalse(follow_graph.is_following(self.reader, author))
+            self.assertNotIn(self.reader.pk, follow_graph.followers(author))
+        response = self.reader_client.get(
+            reverse('posts:profile', args=[author.username]))
+        self.assertFalse(response.context['following'])
+
+    def test_missing_previous_set_is_reloaded(self):
+        """Без прежнего множества новое читается из базы."""
+        author = self.authors[2]
+        follow_graph.followees(self.reader)
+        cache.clear()
+        Follow.objects.create(user=self.reader, author=author)
+        self.assertTrue(follow_graph.is_following(self.reader, author))
+
+    def test_bulk_load_invalidates_graph(self):
+        """После массовой загрузки без сигналов граф перечитывается."""
+        author = self.authors[2]
+        follow_graph.followees(self.reader)
+        Follow.objects.bulk_create([Follow(user=self.reader, author=author)])
+        self.assertFalse(follow_graph.is_following(self.reader, author))
+        feed_cache.invalidate_all()
+        self.assertTrue(follow_graph.is_following(self.reader, author))
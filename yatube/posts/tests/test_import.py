@@ -0,0 +1,165 @@
+import io
+import json
+import os
+import tempfile
+
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from posts import importer, search
+from posts.models import (Comment, Follow, Group, Post, Profile,
+                          TimelineEntry, User)
+
+
+def ndjson(*records):
+    return io.StringIO(
+        ''.join(json.dumps(record, ensure_ascii=False) + '\n'
+                for record in records))
+
+
+class ImportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def load(self, kind, *records, batch_size=2):
+        return importer.import_records(
+            kind, importer.read_records(ndjson(*records), 'ndjson'),
+            batch_size=batch_size)
+
+    def load_community(self):
+        self.load('users', {'username': 'anna'}, {'username': 'boris'},
+                  {'username': 'vera', 'first_name': 'Вера'})
+        self.load('groups', {'slug': 'cats', 'title': 'Кошки'})
+        self.load(
+            'posts',
+            {'author': 'anna', 'group': 'cats', 'text': 'Первый пост',
+             'pub_date': '2020-01-01T10:00:00+00:00'},
+            {'author': 'anna', 'text': 'Второй пост'},
+            {'author': 'boris', 'text': 'Пост Бориса'},
+        )
+        self.load('follows', {'user': 'vera', 'author': 'anna'})
+
+    def test_batched_insert(self):
+        """Пачка вставляется одним INSERT, авторы берутся из словаря."""
+        self.load('users', {'username': 'anna'})
+        records = [{'author': 'anna', 'text': f'Пост {n}'}
+                   for n in range(10)]
+        # Наибольшие id моделей, группы и авторы загружаются один раз;
+        # на пачку — поиск дублей, INSERT и точки сохранения транзакции.
+        with self.assertNumQueries(len(importer.MODELS) + 2 + 4 * 2):
+            stats = self.load('posts', *records, batch_size=5)
+        self.assertEqual(stats.created, 10)
+        self.assertEqual(Post.objects.count(), 10)
+
+    def test_validation_errors_and_duplicates(self):
+        """Неверные строки пропускаются, повторный импорт идемпотентен."""
+        self.load_community()
+        stats = self.load(
+            'posts',
+            {'author': 'anna', 'group': 'cats', 'text': 'Первый пост',
+             'pub_date': '2020-01-01T10:00:00+00:00'},
+            {'author': 'anna', 'text': ''},
+            {'author': 'nobody', 'text': 'Текст'},
+            {'author': 'anna', 'group': 'dogs', 'text': 'Текст'},
+        )
+        self.assertEqual(stats.created, 0)
+        self.assertEqual(stats.skipped, 1)
+        self.assertEqual([line for line, _ in stats.errors], [2, 3, 4])
+        self.assertEqual(Post.objects.count(), 3)
+        self.assertEqual(self.load('users', {'username': 'anna'}).skipped, 1)
+        self.assertEqual(
+            self.load('follows', {'user': 'vera', 'author': 'anna'}).skipped,
+            1)
+
+    def test_dates_are_kept(self):
+        """Даты публикации берутся из источника."""
+        self.load_community()
+        post = Post.objects.get(text='Первый пост')
+        self.assertEqual(post.pub_date.year, 2020)
+        self.assertTrue(Post._meta.get_field('pub_date').auto_now_add)
+
+    def test_finish_rebuilds_derived_data(self):
+        """После импорта пересобираются счетчики, ленты и поиск."""
+        self.load_community()
+        post = Post.objects.get(text='Пост Бориса')
+        self.load('comments', {'post': post.pk, 'author': 'anna',
+                               'text': 'Комментарий'},
+                  {'post': 0, 'author': 'anna', 'text': 'Нет поста'})
+        importer.finish()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertGreater(post.trending_score, 0)
+        self.assertEqual(Group.objects.get(slug='cats').posts_count, 1)
+        vera = User.objects.get(username='vera')
+        self.assertEqual(vera.profile.following_count, 1)
+        self.assertEqual(TimelineEntry.objects.filter(user=vera).count(), 2)
+        found = [(kind, pk) for kind, pk, _ in search.search('бориса', 10)]
+        self.assertEqual(found, [('post', post.pk)])
+
+    def test_finish_limited_to_import(self):
+        """finish(since) пересчитывает только затронутое импортом."""
+        self.load_community()
+        importer.finish()
+        post = Post.objects.get(text='Пост Бориса')
+        Profile.objects.filter(user__username='anna').update(posts_count=7)
+        Post.objects.filter(pk=post.pk).update(trending_score=1)
+        stats = self.load('comments', {'post': post.pk, 'author': 'vera',
+                                       'text': 'Отличный пост'})
+        importer.finish(stats.since)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertAlmostEqual(post.trending_score, 4.0, places=3)
+        self.assertEqual(
+            Profile.objects.get(user__username='anna').posts_count, 7)
+        found = [(kind, pk) for kind, pk, _ in search.search('отличн', 10)]
+        self.assertEqual(found, [('comment', Comment.objects.get().pk)])
+
+    def test_broken_line_keeps_imported_batches_consistent(self):
+        """После ошибки разбора уже записанные пачки пересобираются."""
+        self.load_community()
+        importer.finish()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'posts.ndjson')
+            with open(path, 'w', encoding='utf-8') as file:
+                file.write(json.dumps(
+                    {'author': 'anna', 'text': 'Котики'},
+                    ensure_ascii=False) + '\n{broken\n')
+            with self.assertRaisesMessage(CommandError, 'после 1 строк'):
+                call_command('import_content', path, kind='posts',
+                             batch_size=1, stdout=io.StringIO(),
+                             stderr=io.StringIO())
+        post = Post.objects.get(text='Котики')
+        self.assertTrue(TimelineEntry.objects.filter(
+            user__username='vera', post=post).exists())
+        self.assertEqual(
+            Profile.objects.get(user__username='anna').posts_count, 3)
+        found = [pk for _, pk, _ in search.search('котик', 10)]
+        self.assertEqual(found, [post.pk])
+
+    def test_default_prepare_cleans_fields(self):
+        """Базовый prepare собирает объекты из полей и проверяет их."""
+        base = importer.Importer(importer.Lookups())
+        base.model = Group
+        objects, skipped, errors = base.prepare([
+            (1, {'slug': 'dogs', 'title': 'Собаки', 'extra': 1}),
+            (2, {'slug': 'bad slug', 'title': 'Плохо'}),
+        ])
+        self.assertEqual([group.slug for group in objects], ['dogs'])
+        self.assertEqual(skipped, 0)
+        self.assertEqual([line for line, _ in errors], [2])
+
+    def test_command_reads_csv(self):
+        """Команда читает CSV и сообщает скорость."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'users.csv')
+            with open(path, 'w', encoding='utf-8') as file:
+                file.write('username,first_name\nanna,Анна\nboris,Борис\n')
+            out = io.StringIO()
+            call_command('import_content', path, kind='users', stdout=out,
+                         stderr=io.StringIO())
+        self.assertIn('Создано: 2', out.getvalue())
+        self.assertIn('строк/с', out.getvalue())
+        self.assertEqual(
+            User.objects.get(username='anna').profile.posts_count, 0)
+        self.assertFalse(Follow.objects.exists())
+        self.assertFalse(Comment.objects.exists())
@@ -0,0 +1,47 @@
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, skipUnlessDBFeature
+from posts.models import Comment, Follow, Group, Post, User
+
+
+@skipUnlessDBFeature('supports_explaining_query_execution')
+class IndexUsageTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Writer')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        cls.post = Post.objects.create(
+            author=cls.user, group=cls.group, text='Пост')
+
+    def assertUsesIndex(self, queryset, index_name):
+        if connection.vendor != 'sqlite':
+            self.skipTest('План проверяется только на SQLite')
+        plan = queryset.explain()
+        self.assertIn(index_name, plan)
+
+    def test_feed_queries_use_indexes(self):
+        """Запросы лент идут по составным индексам."""
+        feeds = {
+            'post_date_idx': Post.objects.for_feed(),
+            'post_author_date_idx':
+                Post.objects.for_feed().filter(author=self.user),
+            'post_group_date_idx':
+                Post.objects.for_feed().filter(group=self.group),
+        }
+        for index_name, queryset in feeds.items():
+            with self.subTest(index_name=index_name):
+                self.assertUsesIndex(
+                    queryset.order_by('-pub_date', '-id')[:10], index_name)
+
+    def test_comment_query_uses_index(self):
+        """Комментарии поста выбираются по индексу (post, created)."""
+        queryset = Comment.objects.filter(
+            post=self.post).order_by('created', 'id')
+        self.assertUsesIndex(queryset, 'comment_post_created_idx')
+
+    def test_follow_is_unique(self):
+        """Повторная подписка на того же автора запрещена."""
+        Follow.objects.create(user=self.reader, author=self.user)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Follow.objects.create(user=self.reader, author=self.user)
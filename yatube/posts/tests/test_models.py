@@ -1,5 +1,8 @@
+import datetime
+
 from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.utils import timezone
 
 from ..models import Group, Post
 
@@ -55,3 +58,15 @@ class PostModelTest(TestCase):
             with self.subTest(field=field):
                 self.assertEqual(
                     post._meta.get_field(field).help_text, expected_value)
+
+    def test_pub_date_kept_when_given(self):
+        """Заданная дата публикации сохраняется и при bulk_create,
+        без даты ставится текущее время.
+        """
+        date = timezone.now() - datetime.timedelta(days=400)
+        Post.objects.bulk_create(
+            [Post(author=self.user, text='Старый пост', pub_date=date)])
+        self.assertEqual(Post.objects.get(text='Старый пост').pub_date, date)
+        self.assertLess(
+            timezone.now() - PostModelTest.post.pub_date,
+            datetime.timedelta(minutes=1))
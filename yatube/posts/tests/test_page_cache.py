@@ -0,0 +1,112 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts.cache import PAGE_CACHE_HEADER
+from posts.models import Comment, Follow, Group, Post, User
+from posts.paginator import FORWARD, encode_cursor
+
+
+class AnonymousPageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Writer')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.index = reverse('posts:index')
+        self.group_url = reverse(
+            'posts:group_posts', kwargs={'slug': self.group.slug})
+        self.profile_url = reverse(
+            'posts:profile', kwargs={'username': self.author.username})
+        self.post_url = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk})
+
+    def assertCached(self, url, cached=True):
+        status = self.guest_client.get(url).get(PAGE_CACHE_HEADER)
+        self.assertEqual(status, 'hit' if cached else 'miss')
+
+    def test_anonymous_pages_are_cached(self):
+        """Повторный анонимный запрос отдается из кеша без шаблонов."""
+        urls = (self.index, self.group_url, self.profile_url, self.post_url,
+                reverse('about:author'), reverse('about:tech'))
+        for url in urls:
+            with self.subTest(url=url):
+                first = self.guest_client.get(url)
+                self.assertEqual(first[PAGE_CACHE_HEADER], 'miss')
+                with CaptureQueriesContext(connection) as queries:
+                    second = self.guest_client.get(url)
+                self.assertEqual(second[PAGE_CACHE_HEADER], 'hit')
+                self.assertEqual(second.content, first.content)
+                self.assertEqual(second.templates, [])
+                self.assertLessEqual(len(queries), 4)
+
+    def test_page_and_cursor_are_part_of_key(self):
+        """Номер страницы и курсор дают разные записи кеша."""
+        self.assertCached(self.index, cached=False)
+        self.assertCached(self.index + '?page=2', cached=False)
+        cursor = encode_cursor(FORWARD, ['2020-01-01T00:00:00', 1])
+        self.assertCached(self.index + '?cursor=' + cursor, cached=False)
+        self.assertCached(self.index + '?page=2')
+        self.assertCached(self.index)
+
+    def test_foreign_params_share_key(self):
+        """Посторонние параметры и битый курсор не заводят новую запись
+        кеша, курсор комментариев страницы поста — заводит.
+        """
+        self.assertCached(self.index, cached=False)
+        for query in ('?utm_source=x', '?x=1', '?x=2', '?page=1',
+                      '?cursor=abc', '?sort=new'):
+            with self.subTest(query=query):
+                self.assertCached(self.index + query)
+        self.assertCached(self.post_url, cached=False)
+        self.assertCached(self.post_url + '?utm=1')
+        cursor = encode_cursor(FORWARD, ['2020-01-01T00:00:00', 1])
+        self.assertCached(self.post_url + '?comments=' + cursor,
+                          cached=False)
+
+    def test_logged_in_users_bypass_cache(self):
+        """Вошедшим пользователям страница рендерится каждый раз."""
+        self.guest_client.get(self.index)
+        response = self.reader_client.get(self.index)
+        self.assertFalse(response.has_header(PAGE_CACHE_HEADER))
+        self.assertContains(response, self.reader.username)
+
+    def test_signals_invalidate_pages(self):
+        """Изменения моделей сбрасывают зависящие от них страницы."""
+        changes = {
+            self.index: lambda: Post.objects.create(
+                author=self.reader, text='Новый пост'),
+            self.group_url: lambda: Group.objects.filter(
+                pk=self.group.pk).first().save(),
+            self.profile_url: lambda: Follow.objects.create(
+                user=self.reader, author=self.author),
+            self.post_url: lambda: Comment.objects.create(
+                post=self.post, author=self.reader, text='Комментарий'),
+        }
+        for url, change in changes.items():
+            with self.subTest(url=url):
+                self.guest_client.get(url)
+                self.assertCached(url)
+                change()
+                self.assertCached(url, cached=False)
+
+    def test_author_rename_invalidates_profile(self):
+        """Смена имени автора сбрасывает его профиль, вход — нет."""
+        self.guest_client.get(self.profile_url)
+        Client().force_login(self.author)
+        self.assertCached(self.profile_url)
+        self.author.first_name = 'Лев'
+        self.author.save()
+        response = self.guest_client.get(self.profile_url)
+        self.assertEqual(response[PAGE_CACHE_HEADER], 'miss')
+        self.assertContains(response, 'Лев')
@@ -1,6 +1,10 @@
+from django.core.cache import cache
+from django.db import connection
 from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from posts.models import Group, Post, User
+from posts.paginator import encode_cursor
 
 
 class PaginatorViewsTest(TestCase):
@@ -18,6 +22,8 @@ class PaginatorViewsTest(TestCase):
         Post.objects.bulk_create(posts)
 
     def setUp(self):
+        # bulk_create не шлет сигналы, поэтому кеш страниц сбрасываем.
+        cache.clear()
         self.guest_client = Client()
 
     def test_pages_contains_ten_and_five_records(self):
@@ -35,3 +41,57 @@ class PaginatorViewsTest(TestCase):
                 self.assertEqual(len(response.context['page_obj']), 10)
                 response = self.guest_client.get(page + '?page=2')
                 self.assertEqual(len(response.context['page_obj']), 5)
+
+    def test_cursor_navigation(self):
+        """По курсорам можно пройти вперед и назад без COUNT(*)."""
+        page = reverse('posts:index')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.guest_client.get(page)
+        self.assertFalse(
+            [q for q in queries if 'COUNT(' in q['sql'].upper()])
+        first_page = response.context['page_obj']
+        self.assertFalse(first_page.has_previous())
+        self.assertTrue(first_page.has_next())
+        response = self.guest_client.get(
+            page, {'cursor': first_page.next_cursor})
+        second_page = response.context['page_obj']
+        self.assertEqual(len(second_page), 5)
+        self.assertFalse(second_page.has_next())
+        self.assertTrue(second_page.has_previous())
+        response = self.guest_client.get(
+            page, {'cursor': second_page.previous_cursor})
+        self.assertEqual(
+            list(response.context['page_obj']), list(first_page))
+
+    def test_broken_cursor_returns_first_page(self):
+        """Битый курсор не ломает страницу, а открывает первую."""
+        response = self.guest_client.get(
+            reverse('posts:index'), {'cursor': 'broken'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['page_obj']), 10)
+
+    def test_malformed_cursor_and_page(self):
+        """Курсоры с неверными значениями и огромный номер страницы
+        не приводят к ошибке 500.
+        """
+        index = reverse('posts:index')
+        tokens = (
+            ['n', {'a': 1}, 1],
+            ['n', [1], 1],
+            ['n', '2020-01-01T00:00:00', 10 ** 30],
+            ['n', None, None],
+            ['n', True, 1],
+            ['n', '2020-01-01T00:00:00', 1, 2],
+            ['n', 'не дата', 1],
+        )
+        for token in tokens:
+            with self.subTest(token=token):
+                cache.clear()
+                cursor = encode_cursor(token[0], token[1:])
+                response = self.guest_client.get(index, {'cursor': cursor})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.context['page_obj']), 10)
+        response = self.guest_client.get(
+            index, {'page': '99999999999999999999'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['page_obj']), 0)
@@ -0,0 +1,131 @@
+"""Регрессия числа SQL-запросов на всех именованных адресах.
+
+Каждая страница открывается на маленьких и на больших данных: число
+запросов не должно зависеть от объема (O(1)) и не должно превышать
+бюджет из QUERY_BUDGETS. Новый адрес без бюджета роняет тест.
+"""
+from about import urls as about_urls
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts import urls as posts_urls
+from posts.models import Comment, Follow, Group, Post, User
+from users import urls as users_urls
+
+URL_MODULES = (posts_urls, about_urls, users_urls)
+
+# Адрес -> наибольшее допустимое число запросов (страница без кеша,
+# пользователь вошел).
+QUERY_BUDGETS = {
+    'posts:index': 3,
+    'posts:group_posts': 5,
+    'posts:profile': 7,
+    'posts:post_detail': 9,
+    'posts:post_comments': 4,
+    'posts:post_create': 3,
+    'posts:post_edit': 5,
+    'posts:add_comment': 3,
+    'posts:follow_index': 6,
+    'posts:search': 2,
+    'posts:export': 2,
+    'posts:profile_follow': 14,
+    'posts:profile_unfollow': 9,
+    'about:author': 2,
+    'about:tech': 2,
+    'users:logout': 4,
+    'users:signup': 2,
+    'users:login': 2,
+    'users:password_change': 2,
+    'users:password_change_done': 2,
+    'users:password_reset': 2,
+    'users:password_reset_done': 2,
+    'users:password_reset_confirm': 3,
+    'users:password_reset_complete': 2,
+}
+
+
+def named_routes():
+    for module in URL_MODULES:
+        for pattern in module.urlpatterns:
+            if pattern.name:
+                yield (f'{module.app_name}:{pattern.name}',
+                       list(pattern.pattern.converters))
+
+
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='Writer', is_staff=True)
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Пост')
+        cls.readers = []
+
+    def grow(self, size):
+        """Добавляет size авторов, постов, комментариев и подписок."""
+        for number in range(size):
+            reader = User.objects.create_user(
+                username=f'reader{len(self.readers)}')
+            self.readers.append(reader)
+            Follow.objects.create(user=reader, author=self.author)
+            Follow.objects.create(user=self.author, author=reader)
+            Post.objects.create(author=self.author, group=self.group,
+                                text=f'Пост автора {number}')
+            Post.objects.create(author=reader, group=self.group,
+                                text=f'Пост читателя {number}')
+            Comment.objects.create(post=self.post, author=reader,
+                                   text=f'Комментарий {number}')
+
+    def url(self, name, params):
+        values = {
+            'slug': self.group.slug,
+            'username': self.readers[0].username,
+            'post_id': self.post.pk,
+            'uidb64': 'MQ',
+            'token': 'set-password',
+        }
+        return reverse(name, kwargs={param: values[param]
+                                     for param in params})
+
+    def measure(self, name, params):
+        # Подписка и отписка меняют состояние: приводим его к исходному.
+        Follow.objects.get_or_create(
+            user=self.author, author=self.readers[0])
+        if name == 'posts:profile_follow':
+            Follow.objects.filter(
+                user=self.author, author=self.readers[0]).delete()
+        cache.clear()
+        client = Client()
+        client.force_login(self.author)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(self.url(name, params))
+        self.assertLess(response.status_code, 400, name)
+        return [query['sql'] for query in queries]
+
+    def test_every_route_has_budget(self):
+        """У каждого именованного адреса есть бюджет запросов."""
+        names = {name for name, _ in named_routes()}
+        self.assertEqual(names - set(QUERY_BUDGETS), set())
+        self.assertEqual(set(QUERY_BUDGETS) - names, set())
+
+    def test_query_count_does_not_grow_with_data(self):
+        """Число запросов не растет с объемом данных и в бюджете."""
+        routes = list(named_routes())
+        self.grow(2)
+        small = {name: self.measure(name, params)
+                 for name, params in routes}
+        self.grow(15)
+        for name, params in routes:
+            with self.subTest(route=name):
+                large = self.measure(name, params)
+                sql = '\n'.join(large)
+                self.assertEqual(
+                    len(large), len(small[name]),
+                    f'{name}: число запросов зависит от данных\n{sql}')
+                self.assertLessEqual(
+                    len(large), QUERY_BUDGETS[name],
+                    f'{name}: превышен бюджет запросов\n{sql}')
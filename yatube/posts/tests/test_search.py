@@ -0,0 +1,103 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts import search
+from posts.models import Comment, Group, Post, User
+
+
+class StemmerTests(TestCase):
+    def test_russian_word_forms_share_stem(self):
+        """Формы одного слова сводятся к одной основе."""
+        forms = (
+            ('пост', 'посты', 'постами', 'поста'),
+            ('книга', 'книги', 'книгой', 'книгах'),
+            ('красивый', 'красивая', 'красивые', 'красивого'),
+            ('читать', 'читали', 'читает'),
+        )
+        for words in forms:
+            with self.subTest(words=words):
+                self.assertEqual(len({search.stem(w) for w in words}), 1)
+
+    def test_tokenize(self):
+        """Регистр, ё и стоп-слова нормализуются."""
+        self.assertEqual(search.tokenize('Ёлка и ЕЛКИ'), ['елк', 'елк'])
+
+
+class SearchBackendsMixin:
+    def setUp(self):
+        self.user = User.objects.create_user(username='Writer')
+        self.group = Group.objects.create(
+            title='Путешествия', slug='travel',
+            description='Заметки о поездках')
+        self.post = Post.objects.create(
+            author=self.user, group=self.group,
+            text='Летом мы ездили в горы. Горы были прекрасны.')
+        self.other = Post.objects.create(
+            author=self.user, text='Зимой смотрели на горы из окна.')
+        self.comment = Comment.objects.create(
+            post=self.other, author=self.user,
+            text='Отличные фотографии гор!')
+
+    def found(self, query):
+        return [(kind, object_id)
+                for kind, object_id, score in search.search(query, 10)]
+
+    def test_ranked_results_over_all_kinds(self):
+        """Находятся посты и комментарии, частые совпадения выше."""
+        found = self.found('горами')
+        self.assertEqual(found[0], ('post', self.post.pk))
+        self.assertEqual(set(found), {
+            ('post', self.post.pk),
+            ('post', self.other.pk),
+            ('comment', self.comment.pk),
+        })
+        self.assertEqual(self.found('поездки'), [('group', self.group.pk)])
+
+    def test_index_updates_on_save_and_delete(self):
+        """Индекс обновляется при изменении и удалении."""
+        self.post.text = 'Теперь про море'
+        self.post.save()
+        self.assertNotIn(('post', self.post.pk), self.found('горы'))
+        self.assertEqual(self.found('морем'), [('post', self.post.pk)])
+        self.post.delete()
+        self.assertEqual(self.found('морем'), [])
+
+    def test_rebuild(self):
+        """Полная переиндексация восстанавливает индекс."""
+        search.get_backend().clear()
+        self.assertEqual(self.found('горы'), [])
+        search.rebuild()
+        self.assertIn(('post', self.post.pk), self.found('горы'))
+
+    def test_search_view(self):
+        """Страница поиска выводит найденные объекты."""
+        response = Client().get(reverse('posts:search'), {'q': 'Путешествия'})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '#Путешествия')
+        results = response.context['results']
+        self.assertEqual(results[0]['object'], self.group)
+
+
+@override_settings(SEARCH_BACKEND='python')
+class InvertedIndexSearchTests(SearchBackendsMixin, TestCase):
+    def test_scores_in_sql(self):
+        """Оценки считаются и обрезаются в SQL, число документов берется
+        из кеша.
+        """
+        cache.clear()
+        everything = search.search('горы', 10)
+        with CaptureQueriesContext(connection) as queries:
+            page = search.search('горы', 1, offset=1)
+        self.assertEqual(page, everything[1:2])
+        self.assertEqual(len(queries), 2)
+        self.assertIn('LIMIT 1 OFFSET 1', queries[-1]['sql'])
+
+
+@override_settings(SEARCH_BACKEND='fts5')
+class FTS5SearchTests(SearchBackendsMixin, TestCase):
+    def setUp(self):
+        if not search.fts5_available():
+            self.skipTest('SQLite собран без FTS5')
+        super().setUp()
@@ -0,0 +1,99 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts import suggestions
+from posts.models import Follow, FollowSuggestion, Group, Post, Profile, User
+
+
+class AdjacencyTests(TestCase):
+    def test_neighbours(self):
+        """CSR отдает соседей вершины, предел и пустой список для новых."""
+        graph = suggestions.Adjacency([(1, 5), (1, 7), (3, 2)], 4)
+        self.assertEqual(list(graph.neighbours(1)), [5, 7])
+        self.assertEqual(list(graph.neighbours(1, limit=1)), [5])
+        self.assertEqual(list(graph.neighbours(2)), [])
+        self.assertEqual(list(graph.neighbours(3)), [2])
+        self.assertEqual(list(graph.neighbours(10)), [])
+
+
+class SuggestionTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        names = ('Reader', 'First', 'Second', 'Popular', 'Other', 'Peer')
+        cls.users = {name: User.objects.create_user(username=name)
+                     for name in names}
+        for user, author in (('Reader', 'First'), ('Reader', 'Second'),
+                             ('First', 'Popular'), ('Second', 'Popular'),
+                             ('First', 'Other')):
+            Follow.objects.create(
+                user=cls.users[user], author=cls.users[author])
+        group = Group.objects.create(title='Группа', slug='group')
+        for name in ('Reader', 'Peer'):
+            Post.objects.create(
+                author=cls.users[name], group=group, text='Пост')
+        cls.reader = cls.users['Reader']
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def suggested(self, user):
+        return list(FollowSuggestion.objects.filter(user=user).order_by(
+            '-score', 'suggested_id').values_list(
+            'suggested__username', 'score', 'mutual_count'))
+
+    def test_scores_mutual_follows_and_groups(self):
+        """Общие подписки весят больше общей группы, подписки и сам
+        пользователь не рекомендуются.
+        """
+        suggestions.compute()
+        self.assertEqual(self.suggested(self.reader), [
+            ('Popular', 2.0, 2), ('Other', 1.0, 1), ('Peer', 0.5, 0)])
+
+    def test_top_limits_suggestions(self):
+        """Хранится не больше top рекомендаций."""
+        suggestions.compute(top=1)
+        self.assertEqual(self.suggested(self.reader), [('Popular', 2.0, 2)])
+
+    def test_stale_recomputes_changed_users(self):
+        """--stale пересчитывает только пользователей с новыми
+        подписками.
+        """
+        suggestions.compute()
+        self.assertFalse(
+            Profile.objects.filter(suggestions_stale=True).exists())
+        Follow.objects.create(user=self.reader, author=self.users['Popular'])
+        self.assertEqual(suggestions.compute(stale=True), 1)
+        self.assertEqual(self.suggested(self.reader), [
+            ('Other', 1.0, 1), ('Peer', 0.5, 0)])
+        call_command('compute_suggestions', '--stale', stdout=StringIO())
+        self.assertEqual(suggestions.compute(stale=True), 0)
+
+    def test_pages_show_suggestions(self):
+        """Лента подписок и профиль показывают рекомендации без уже
+        оформленных подписок и без автора профиля.
+        """
+        suggestions.compute()
+        popular = reverse('posts:profile', args=['Popular'])
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            [item.suggested.username
+             for item in response.context['suggestions']],
+            ['Popular', 'Other', 'Peer'])
+        self.assertContains(response, f'href="{popular}"')
+        response = self.reader_client.get(popular)
+        self.assertEqual(
+            [item.suggested.username
+             for item in response.context['suggestions']],
+            ['Other', 'Peer'])
+        Follow.objects.create(user=self.reader, author=self.users['Other'])
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            [item.suggested.username
+             for item in response.context['suggestions']],
+            ['Popular', 'Peer'])
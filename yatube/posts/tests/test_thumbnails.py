@@ -0,0 +1,117 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from posts import thumbnails
+from posts.models import Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def make_image(name='pic.png', size=(64, 32)):
+    buffer = BytesIO()
+    Image.new('RGB', size, 'red').save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), 'image/png')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Writer')
+        cls.post = Post.objects.create(
+            author=cls.user, text='Пост с картинкой', image=make_image())
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        shutil.rmtree(os.path.join(TEMP_MEDIA_ROOT,
+                                   thumbnails.MANIFEST_PREFIX),
+                      ignore_errors=True)
+        self.client = Client()
+
+    def test_lookup_never_generates(self):
+        """Поиск вариантов не создает их в запросе."""
+        self.assertIsNone(thumbnails.lookup(self.post.image))
+        self.assertIsNone(thumbnails.lookup(self.post.image))
+
+    def test_template_shows_placeholder_then_srcset(self):
+        """Пока вариантов нет, карточка выводит заглушку, затем srcset."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        response = self.client.get(url)
+        self.assertContains(response, 'Картинка обрабатывается')
+        thumbnails.generate(self.post.image.name)
+        variants = thumbnails.lookup(self.post.image)
+        self.assertIsNotNone(variants)
+        response = self.client.get(url)
+        self.assertContains(response, variants['src'])
+        self.assertContains(response, 'srcset=')
+        self.assertNotContains(response, 'Картинка обрабатывается')
+
+    @override_settings(POST_IMAGE_WIDTHS={16: 10 ** 6, 32: 10 ** 6,
+                                          1200: 10 ** 6})
+    def test_variants_are_not_upscaled(self):
+        """Варианты не шире оригинала и не повторяются."""
+        thumbnails.generate(self.post.image.name)
+        sources = cache.get(
+            thumbnails._manifest_key(self.post.image.name))['sources']
+        widths = [width for url, width in sources['JPEG']]
+        self.assertEqual(widths, [16, 32, 64])
+
+    def test_manifest_survives_cache_loss(self):
+        """Манифест читается из хранилища, если его нет в кеше."""
+        thumbnails.generate(self.post.image.name)
+        variants = thumbnails.lookup(self.post.image)
+        cache.clear()
+        self.assertEqual(thumbnails.lookup(self.post.image), variants)
+
+    def test_variant_written_once(self):
+        """Каждый вариант пишется в хранилище один раз."""
+        with mock.patch('posts.thumbnails.get_thumbnail',
+                        wraps=thumbnails.get_thumbnail) as thumbnail:
+            thumbnails.generate(self.post.image.name)
+        self.assertEqual(
+            thumbnail.call_count,
+            len(thumbnails.formats()) * len(settings.POST_IMAGE_WIDTHS))
+
+    @override_settings(POST_IMAGE_WIDTHS={32: 10})
+    def test_oversized_variant_is_logged(self):
+        """Вариант, не влезший в бюджет, сохраняется с предупреждением."""
+        with self.assertLogs('posts.thumbnails', 'WARNING'):
+            thumbnails.generate(self.post.image.name)
+        self.assertIsNotNone(thumbnails.lookup(self.post.image))
+
+    @override_settings(POST_IMAGE_MAX_SIDE=100)
+    def test_large_upload_is_downscaled(self):
+        """Слишком большой оригинал пережимается при загрузке."""
+        client = Client()
+        client.force_login(self.user)
+        client.post(reverse('posts:post_create'), {
+            'text': 'Большая картинка',
+            'image': make_image('big.png', size=(400, 200))})
+        post = Post.objects.get(text='Большая картинка')
+        self.assertTrue(post.image.name.endswith('.jpg'))
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (100, 50))
+
+    def test_post_create_schedules_generation(self):
+        """Создание поста ставит генерацию миниатюр после коммита."""
+        client = Client()
+        client.force_login(self.user)
+        with mock.patch('posts.thumbnails.transaction.on_commit') as commit:
+            client.post(reverse('posts:post_create'), {
+                'text': 'Новый пост', 'image': make_image('new.png')})
+        self.assertTrue(commit.called)
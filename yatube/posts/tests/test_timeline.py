@@ -0,0 +1,140 @@
+from importlib import import_module
+from io import StringIO
+from types import SimpleNamespace
+
+from django.apps import apps
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts.models import Follow, Post, TimelineEntry, User
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.author = User.objects.create_user(username='Writer')
+        cls.old_post = Post.objects.create(
+            author=cls.author, text='Старый пост')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def follow(self):
+        self.client.get(reverse(
+            'posts:profile_follow',
+            kwargs={'username': self.author.username}))
+
+    def feed(self):
+        response = self.client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_follow_backfills_timeline(self):
+        """После подписки в ленте появляются старые посты автора."""
+        self.follow()
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=self.old_post).exists())
+        self.assertEqual(self.feed(), [self.old_post])
+
+    def test_new_post_fans_out_to_followers(self):
+        """Новый пост раскладывается в ленты подписчиков."""
+        self.follow()
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=post).exists())
+        self.assertEqual(self.feed(), [post, self.old_post])
+
+    def test_unfollow_prunes_timeline(self):
+        """После отписки посты автора уходят из ленты."""
+        self.follow()
+        self.client.get(reverse(
+            'posts:profile_unfollow',
+            kwargs={'username': self.author.username}))
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.reader).exists())
+        self.assertEqual(self.feed(), [])
+
+    @override_settings(TIMELINE_SIZE=2)
+    def test_timeline_is_bounded(self):
+        """rebuild_timelines --trim обрезает ленты до TIMELINE_SIZE и
+        не трогает короткие.
+        """
+        other = User.objects.create_user(username='Other')
+        self.follow()
+        for i in range(3):
+            Post.objects.create(author=self.author, text='Пост%d' % i)
+        post = Post.objects.create(author=other, text='Другой')
+        TimelineEntry.objects.create(
+            user=other, post=post, pub_date=post.pub_date)
+        with CaptureQueriesContext(connection) as queries:
+            call_command('rebuild_timelines', '--trim', stdout=StringIO())
+        self.assertEqual(len(queries), 2)
+        self.assertIn(f'IN ({self.reader.pk})', queries[1]['sql'])
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 2)
+        self.assertEqual(self.feed()[0].text, 'Пост2')
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_celebrity_posts_are_read_on_request(self):
+        """Посты авторов с огромной аудиторией читаются без fan-out."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.reader).exists())
+        self.assertEqual(self.feed(), [post, self.old_post])
+
+    def test_fan_out_queries_do_not_grow_with_followers(self):
+        """Раскладка не делает запросов на подписчика и не обрезает
+        ленты в запросе.
+        """
+        counts = []
+        for number in range(3):
+            follower = User.objects.create_user(username=f'Follower{number}')
+            Follow.objects.create(user=follower, author=self.author)
+            with CaptureQueriesContext(connection) as queries:
+                Post.objects.create(author=self.author, text='Пост')
+            counts.append(len(queries))
+        self.assertEqual(len(set(counts)), 1)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user__username='Follower0').count(),
+            4)
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_author_back_under_limit_is_fanned_out(self):
+        """Посты, написанные автором выше предела, попадают в ленты,
+        когда он опускается до предела.
+        """
+        other = User.objects.create_user(username='Other')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=other, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+        Follow.objects.filter(user=other).delete()
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=post).exists())
+        self.assertEqual(self.feed(), [post, self.old_post])
+
+    def test_feed_ordered_by_timeline_entry(self):
+        """Лента сортируется по дате записи ленты (индекс
+        user, -pub_date), а не по дате поста из JOIN.
+        """
+        self.follow()
+        with CaptureQueriesContext(connection) as queries:
+            self.feed()
+        sql = next(query['sql'] for query in queries
+                   if 'INNER JOIN "posts_timelineentry"' in query['sql'])
+        self.assertIn('"posts_timelineentry"."pub_date" AS "entry_date"', sql)
+        self.assertIn('ORDER BY "entry_date" DESC', sql)
+
+    def test_migration_backfills_existing_follows(self):
+        """Миграция заполняет ленты уже существующих подписок."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        TimelineEntry.objects.all().delete()
+        migration = import_module('posts.migrations.0007_timelineentry')
+        migration.backfill_timelines(
+            apps, SimpleNamespace(connection=connection))
+        self.assertEqual(self.feed(), [self.old_post])
@@ -0,0 +1,156 @@
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from posts import cache as feed_cache
+from posts import trending
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class TrendingTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Writer')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        cls.posts = [
+            Post.objects.create(author=cls.author, group=cls.group,
+                                text=f'Пост {number}')
+            for number in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.trending_urls = (
+            reverse('posts:index') + '?sort=trending',
+            reverse('posts:group_posts', args=[self.group.slug])
+            + '?sort=trending',
+        )
+
+    def score(self, post):
+        return Post.objects.get(pk=post.pk).trending_score
+
+    def feed(self, url):
+        response = self.reader_client.get(url)
+        return [post.pk for post in response.context['page_obj']]
+
+    def test_comment_raises_score(self):
+        """Комментарий поднимает пост в популярном."""
+        first = self.posts[0]
+        Comment.objects.create(post=first, author=self.reader, text='Да')
+        self.assertEqual(self.score(first), 3.0)
+        for url in self.trending_urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.feed(url)[0], first.pk)
+        self.assertEqual(
+            self.feed(reverse('posts:index'))[0], self.posts[-1].pk)
+
+    def test_follow_raises_recent_posts(self):
+        """Новый подписчик поднимает только свежие посты автора."""
+        old = self.posts[0]
+        Post.objects.filter(pk=old.pk).update(
+            pub_date=timezone.now() - timedelta(days=30))
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.score(old), 0)
+        self.assertEqual(self.score(self.posts[1]), 2.0)
+
+    def test_views_applied_by_update(self):
+        """Просмотры, в том числе из кеша страниц, переносятся в оценку
+        только задачей update_trending.
+        """
+        post = self.posts[0]
+        url = reverse('posts:post_detail', args=[post.pk])
+        for _ in range(3):
+            self.guest_client.get(url)
+        self.reader_client.get(url)
+        self.assertEqual(self.score(post), 0)
+        call_command('update_trending', stdout=StringIO())
+        self.assertAlmostEqual(self.score(post), 0.4)
+        self.assertEqual(trending.apply_views(), 0)
+
+    def test_expired_views_key_is_skipped(self):
+        """Истекший ключ просмотров не прерывает перенос."""
+        first, second = self.posts[:2]
+        for post in (first, second):
+            trending.record_view(post.pk)
+        with mock.patch.object(feed_cache.get_cache(), 'decr',
+                               side_effect=ValueError):
+            self.assertEqual(trending.apply_views(), 2)
+        self.assertAlmostEqual(self.score(first), 0.1)
+        self.assertAlmostEqual(self.score(second), 0.1)
+
+    def test_decay_halves_scores(self):
+        """За период полураспада оценка уменьшается вдвое, а слишком
+        маленькая обнуляется.
+        """
+        high, low = self.posts[:2]
+        Post.objects.filter(pk=high.pk).update(trending_score=8)
+        Post.objects.filter(pk=low.pk).update(trending_score=0.015)
+        now = time.time()
+        cache.set(trending.DECAYED_KEY, now - 24 * 3600)
+        self.assertAlmostEqual(trending.decay(now), 0.5)
+        self.assertAlmostEqual(self.score(high), 4)
+        self.assertEqual(self.score(low), 0)
+
+    def test_update_refreshes_cached_feed(self):
+        """После update_trending закешированная лента перестраивается."""
+        url = self.trending_urls[0]
+        self.assertEqual(self.feed(url)[0], self.posts[-1].pk)
+        Post.objects.filter(pk=self.posts[0].pk).update(trending_score=5)
+        self.assertEqual(self.guest_client.get(url).status_code, 200)
+        trending.update()
+        self.assertEqual(self.feed(url)[0], self.posts[0].pk)
+        self.assertEqual(
+            self.guest_client.get(url)[feed_cache.PAGE_CACHE_HEADER],
+            'miss')
+
+    def test_trending_feed_costs_same_queries(self):
+        """Популярное читается одним запросом, как и хронологическая
+        лента.
+        """
+        counts = []
+        for url in (reverse('posts:index'), self.trending_urls[0]):
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                self.reader_client.get(url)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_rebuild_from_comments(self):
+        """--rebuild считает оценки по комментариям с затуханием."""
+        post = self.posts[1]
+        Comment.objects.create(post=post, author=self.reader, text='Да')
+        Post.objects.filter(pk=self.posts[0].pk).update(trending_score=7)
+        call_command('update_trending', '--rebuild', stdout=StringIO())
+        self.assertAlmostEqual(self.score(post), 3.0, places=3)
+        self.assertEqual(self.score(self.posts[0]), 0)
+
+    def test_rebuild_updates_in_batches(self):
+        """--rebuild пишет оценки пачкой, а не UPDATE на каждый пост."""
+        for post in self.posts:
+            Comment.objects.create(post=post, author=self.reader, text='Да')
+        with CaptureQueriesContext(connection) as queries:
+            trending.rebuild()
+        updates = [query for query in queries
+                   if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 2)
+        for post in self.posts:
+            self.assertAlmostEqual(self.score(post), 3.0, places=3)
+
+    def test_update_warns_about_local_cache(self):
+        """update_trending предупреждает, что locmem не общий."""
+        stderr = StringIO()
+        call_command('update_trending', stdout=StringIO(), stderr=stderr)
+        self.assertIn('locmem', stderr.getvalue())
@@ -1,13 +1,17 @@
 import shutil
 import tempfile
+from unittest import mock
 
 from django import forms
 from django.conf import settings
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from posts.models import Follow, Group, Post, User
+from posts import cache as feed_cache
+from posts.models import Comment, Follow, Group, Post, User
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
@@ -168,20 +172,56 @@ class TaskPagesTests(TestCase):
                 self.assertEqual(post_text_0, post2.text)
                 self.assertEqual(post_group_0, self.group2.slug)
 
+    @override_settings(FEED_CACHE_STATS_SAMPLE=1)
     def test_cache_index_page(self):
+        """Лента кешируется до изменения постов, а не по таймауту."""
+        cache.clear()
         page = reverse('posts:index')
         response_0 = self.authorized_client.get(page)
         post_0 = Post.objects.create(text="Test",
                                      author=self.user,
                                      group=self.group)
         response_1 = self.authorized_client.get(page)
-        Post.objects.filter(pk=post_0.pk).delete()
+        self.assertNotEqual(response_0.content, response_1.content)
+        self.assertIn(post_0, response_1.context['page_obj'])
+        hits = feed_cache.stats()['hits']
         response_2 = self.authorized_client.get(page)
         self.assertEqual(response_1.content, response_2.content)
-        cache.clear()
+        self.assertGreater(feed_cache.stats()['hits'], hits)
+        Post.objects.filter(pk=post_0.pk).delete()
         response_3 = self.authorized_client.get(page)
         self.assertEqual(response_0.content, response_3.content)
 
+    def test_feed_key_ignores_foreign_params(self):
+        """Посторонние параметры не меняют ключ кеша ленты и не попадают
+        в ссылки пагинации.
+        """
+        page = reverse('posts:index')
+        keys = [
+            self.authorized_client.get(page + query).context[
+                'feed_cache_key']
+            for query in ('', '?utm_source=x', '?page=1&ref=y', '?page=z')
+        ]
+        self.assertEqual(len(set(keys)), 1)
+        response = self.authorized_client.get(page + '?sort=x&utm=1')
+        self.assertEqual(response.context['feed_cache_key'], keys[0])
+        self.assertNotContains(response, 'utm=')
+
+    def test_cache_invalidated_by_comment_and_group(self):
+        """Комментарий и правка группы сбрасывают карточку в ленте."""
+        cache.clear()
+        page = reverse('posts:index')
+        self.authorized_client.get(page)
+        Comment.objects.create(post=self.post, author=self.user2,
+                               text='Коммент')
+        response = self.authorized_client.get(page)
+        self.assertContains(response, 'Комментариев: 1')
+        group = Group.objects.get(pk=self.group.pk)
+        group.title = 'Новое название'
+        group.save()
+        response = self.authorized_client.get(page)
+        self.assertContains(response, '#Новое название')
+
     def test_follow_another_user(self):
         """Follow на другого пользователя работает корректно"""
         self.authorized_client.get(reverse(
@@ -237,3 +277,52 @@ class TaskPagesTests(TestCase):
         response = self.authorized_client.get(reverse('posts:follow_index'))
         count1 = len(response.context.get('page_obj'))
         self.assertEqual(count0 - 1, count1)
+
+
+class FeedQueriesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Reader')
+        authors = [User.objects.create_user(username='Author%d' % i)
+                   for i in range(3)]
+        groups = [Group.objects.create(title='Группа%d' % i,
+                                       slug='group-%d' % i)
+                  for i in range(3)]
+        Post.objects.bulk_create(
+            Post(author=authors[i % 3], group=groups[i % 3],
+                 text='Пост%d' % i)
+            for i in range(30))
+        for author in authors:
+            Follow.objects.create(user=cls.user, author=author)
+        cls.author = authors[0]
+        cls.group = groups[0]
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_feed_query_count_does_not_depend_on_page_size(self):
+        """Число запросов на страницу ленты не зависит от PER_PAGE."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_posts', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile',
+                    kwargs={'username': self.author.username}),
+            reverse('posts:follow_index'),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                with mock.patch('posts.views.PER_PAGE', 2):
+                    small = self.count_queries(url)
+                with mock.patch('posts.views.PER_PAGE', 10):
+                    large = self.count_queries(url)
+                self.assertEqual(small, large)
@@ -0,0 +1,73 @@
+"""Ограничение частоты записи комментариев (token bucket).
+
+Корзина вмещает capacity жетонов и наполняется заново за period
+секунд; каждый комментарий забирает по жетону из корзины автора и
+корзины поста. Так один пользователь не заваливает базу записями, а
+всплеск на популярном посте не блокирует SQLite для остальных.
+Состояние корзин хранится в кеше лент, общем для процессов при
+CACHE_URL; чтение и запись не атомарны, поэтому при одновременных
+запросах лимит может быть превышен на несколько комментариев.
+"""
+import math
+import time
+
+from django.conf import settings
+from django.http import HttpResponse
+
+from .cache import get_cache
+
+BUCKET_PREFIX = 'throttle'
+
+
+def take(buckets, now=None):
+    """Забирает по жетону из всех корзин сразу или ни из одной.
+
+    buckets — список (ключ, capacity, period). Возвращает 0, если
+    действие разрешено, иначе число секунд до появления жетона.
+    """
+    cache = get_cache()
+    now = time.time() if now is None else now
+    keys = [f'{BUCKET_PREFIX}:{key}' for key, _, _ in buckets]
+    states = cache.get_many(keys)
+    updated = {}
+    wait = 0
+    for key, (_, capacity, period) in zip(keys, buckets):
+        rate = capacity / period
+        tokens, checked = states.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - checked) * rate)
+        if tokens < 1:
+            wait = max(wait, (1 - tokens) / rate)
+        updated[key] = (tokens - 1, now)
+    if wait:
+        return wait
+    # Полная корзина и отсутствие ключа равнозначны: храним ключ, пока
+    # корзина не наполнится.
+    cache.set_many(updated, max(period for _, _, period in buckets))
+    return 0
+
+
+def comment_delay(user_id, post_id):
+    """Сколько секунд пользователю ждать до следующего комментария."""
+    buckets = []
+    if settings.COMMENT_THROTTLE_USER:
+        buckets.append((f'comment:user:{user_id}',
+                        *settings.COMMENT_THROTTLE_USER))
+    if settings.COMMENT_THROTTLE_POST:
+        buckets.append((f'comment:post:{post_id}',
+                        *settings.COMMENT_THROTTLE_POST))
+    if not buckets:
+        return 0
+    return take(buckets)
+
+
+def retry_after(delay):
+    return max(math.ceil(delay), 1)
+
+
+def too_many_requests(delay):
+    seconds = retry_after(delay)
+    response = HttpResponse(
+        f'Слишком много комментариев. Попробуйте через {seconds} с.',
+        content_type='text/plain; charset=utf-8', status=429)
+    response['Retry-After'] = seconds
+    return response
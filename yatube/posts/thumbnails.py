@@ -0,0 +1,259 @@
+"""Фоновая подготовка адаптивных вариантов картинок постов.
+
+Шаблоны не генерируют миниатюры в запросе: они читают манифест готовых
+вариантов (ширины из POST_IMAGE_WIDTHS в JPEG и, если Pillow умеет, в
+WebP) и, если его нет, выводят заглушку. Манифест лежит JSON-файлом в
+хранилище рядом с вариантами, кеш — только быстрый путь к нему, так что
+вытеснение из кеша или отдельный кеш воркера не возвращают заглушку.
+Генерация запускается после сохранения поста (и при первом промахе) в
+пуле потоков, а для старых картинок есть команда generate_thumbnails.
+
+Загружаемые оригиналы больше POST_IMAGE_MAX_SIDE или
+POST_IMAGE_MAX_BYTES пережимаются при приеме формы (normalize_upload),
+поэтому слишком большие файлы не хранятся и не отдаются.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from PIL import Image, ImageOps, features
+from sorl.thumbnail import get_thumbnail
+
+from . import cache
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_PREFIX = 'image-variants'
+
+_executor = None
+_executor_lock = threading.Lock()
+_in_flight = set()
+
+
+def formats():
+    """Форматы вариантов: WebP добавляется, только если его умеет Pillow."""
+    result = ['JPEG']
+    if settings.POST_IMAGE_WEBP and features.check('webp'):
+        result.append('WEBP')
+    return result
+
+
+def _manifest_key(image_name):
+    return f'{MANIFEST_PREFIX}:{image_name}'
+
+
+def _manifest_cache():
+    return caches[settings.FEED_CACHE_ALIAS]
+
+
+def _manifest_path(image_name):
+    digest = hashlib.md5(image_name.encode()).hexdigest()
+    return f'{MANIFEST_PREFIX}/{digest}.json'
+
+
+def _save_manifest(image_name, manifest):
+    path = _manifest_path(image_name)
+    # storage.save не перезаписывает файл, а выбирает новое имя.
+    default_storage.delete(path)
+    default_storage.save(path, ContentFile(json.dumps(manifest).encode()))
+    _manifest_cache().set(_manifest_key(image_name), manifest, None)
+
+
+def _load_manifest(image_name):
+    store = _manifest_cache()
+    manifest = store.get(_manifest_key(image_name))
+    if manifest is not None:
+        return manifest
+    path = _manifest_path(image_name)
+    if not default_storage.exists(path):
+        return None
+    with default_storage.open(path) as file:
+        manifest = json.loads(file.read())
+    store.set(_manifest_key(image_name), manifest, None)
+    return manifest
+
+
+def _image_name(image):
+    return getattr(image, 'name', image)
+
+
+def _to_rgb(image):
+    if image.mode in ('RGB', 'L'):
+        return image
+    image = image.convert('RGBA')
+    background = Image.new('RGB', image.size, 'white')
+    background.paste(image, mask=image.getchannel('A'))
+    return background
+
+
+def normalize_upload(upload):
+    """Уменьшает и пережимает в JPEG слишком большой оригинал."""
+    max_side = settings.POST_IMAGE_MAX_SIDE
+    max_bytes = settings.POST_IMAGE_MAX_BYTES
+    upload.seek(0)
+    image = Image.open(upload)
+    if max(image.size) <= max_side and upload.size <= max_bytes:
+        upload.seek(0)
+        return upload
+    image = _to_rgb(ImageOps.exif_transpose(image))
+    image.thumbnail((max_side, max_side), Image.LANCZOS)
+    while True:
+        for quality in settings.POST_IMAGE_QUALITIES:
+            buffer = BytesIO()
+            image.save(buffer, 'JPEG', quality=quality, optimize=True,
+                       progressive=True)
+            if buffer.tell() <= max_bytes:
+                name = os.path.splitext(upload.name)[0] + '.jpg'
+                return SimpleUploadedFile(
+                    name, buffer.getvalue(), 'image/jpeg')
+        # Даже худшее качество не влезает в бюджет: уменьшаем размеры.
+        width, height = image.size
+        image = image.resize(
+            (max(width * 3 // 4, 1), max(height * 3 // 4, 1)),
+            Image.LANCZOS)
+
+
+def _open_source(image_name):
+    with default_storage.open(image_name) as file:
+        image = Image.open(file)
+        image.load()
+    return _to_rgb(ImageOps.exif_transpose(image))
+
+
+def _pick_quality(source, width, image_format, max_bytes):
+    """Лучшее качество из POST_IMAGE_QUALITIES, при котором вариант
+    укладывается в max_bytes, и уложился ли он. Пробы кодируются в
+    памяти, в хранилище ничего не пишется.
+    """
+    image = source
+    if source.width > width:
+        height = max(round(source.height * width / source.width), 1)
+        image = source.resize((width, height), Image.LANCZOS)
+    for quality in settings.POST_IMAGE_QUALITIES:
+        buffer = BytesIO()
+        image.save(buffer, image_format, quality=quality)
+        if buffer.tell() <= max_bytes:
+            return quality, True
+    return settings.POST_IMAGE_QUALITIES[-1], False
+
+
+def make_variant(image_name, width, image_format, max_bytes, source=None):
+    """Создает вариант заданной ширины с качеством, при котором файл
+    укладывается в бюджет max_bytes; файл пишется один раз.
+
+    Если бюджет не выдержан даже при худшем качестве, вариант все равно
+    сохраняется, а в лог пишется предупреждение.
+    """
+    if source is None:
+        source = _open_source(image_name)
+    quality, fits = _pick_quality(source, width, image_format, max_bytes)
+    thumbnail = get_thumbnail(
+        image_name, str(width), format=image_format, quality=quality,
+        upscale=False)
+    size = thumbnail.storage.size(thumbnail.name)
+    if not fits or size > max_bytes:
+        logger.warning(
+            'Вариант %s %s шириной %s: %s байт больше бюджета %s',
+            image_name, image_format, width, size, max_bytes)
+    return thumbnail
+
+
+def generate(image_name):
+    """Создает все варианты картинки, сохраняет манифест и сбрасывает
+    закешированные карточки с заглушкой.
+    """
+    manifest = {'sources': {}}
+    source = _open_source(image_name)
+    for image_format in formats():
+        seen = set()
+        sources = []
+        for width, max_bytes in sorted(settings.POST_IMAGE_WIDTHS.items()):
+            thumbnail = make_variant(
+                image_name, width, image_format, max_bytes, source)
+            if thumbnail.width in seen:
+                # Исходник уже этой ширины: больше вариантов не нужно.
+                continue
+            seen.add(thumbnail.width)
+            sources.append((thumbnail.url, thumbnail.width))
+            if image_format == 'JPEG':
+                manifest['src'] = thumbnail.url
+                manifest['width'] = thumbnail.width
+                manifest['height'] = thumbnail.height
+        manifest['sources'][image_format] = sources
+    _save_manifest(image_name, manifest)
+    posts = Post.objects.filter(image=image_name).values_list(
+        'pk', 'author_id', 'group_id')
+    for post_id, author_id, group_id in posts:
+        cache.invalidate_post(post_id, author_id, group_id)
+    return manifest
+
+
+def _srcset(sources):
+    return ', '.join(f'{url} {width}w' for url, width in sources)
+
+
+def lookup(image):
+    """Готовые варианты для шаблона или None. Ничего не генерирует."""
+    if not image:
+        return None
+    manifest = _load_manifest(_image_name(image))
+    if manifest is None:
+        return None
+    webp = manifest['sources'].get('WEBP')
+    return {
+        'src': manifest['src'],
+        'width': manifest['width'],
+        'height': manifest['height'],
+        'srcset': _srcset(manifest['sources']['JPEG']),
+        'webp_srcset': _srcset(webp) if webp else '',
+        'sizes': settings.POST_IMAGE_SIZES,
+    }
+
+
+def _run(image_name):
+    try:
+        generate(image_name)
+    except Exception:
+        logger.exception('Не удалось создать миниатюры для %s', image_name)
+    finally:
+        with _executor_lock:
+            _in_flight.discard(image_name)
+        connection.close()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails',
+            )
+        return _executor
+
+
+def schedule(image):
+    """Ставит генерацию в очередь после фиксации транзакции."""
+    if not image:
+        return
+    image_name = _image_name(image)
+
+    def submit():
+        with _executor_lock:
+            if image_name in _in_flight:
+                return
+            _in_flight.add(image_name)
+        get_executor().submit(_run, image_name)
+
+    transaction.on_commit(submit)
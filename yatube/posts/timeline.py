@@ -0,0 +1,217 @@
+"""Материализованная лента подписок (fan-out on write).
+
+При публикации поста его id раскладывается в ленты подписчиков автора,
+поэтому чтение follow_index сводится к выборке по индексу
+(user, -pub_date). Авторы, у которых подписчиков больше
+TIMELINE_FANOUT_LIMIT, в ленты не раскладываются: их посты
+подмешиваются при чтении (fan-out on read). Когда такой автор снова
+опускается до предела, его свежие посты раскладываются по лентам
+подписчиков, иначе написанное за это время пропало бы из лент.
+
+Ленты обрезаются до TIMELINE_SIZE записей одним DELETE с оконной
+функцией (SQLite 3.25+, PostgreSQL, MySQL 8). При публикации обрезка
+не выполняется: окно по лентам всех подписчиков обходило бы сотни
+тысяч строк на каждый пост. Переросшие ленты обрезает
+rebuild_timelines --trim по cron; до этого в ленте остаются лишние
+старые записи, на чтение свежих страниц они не влияют.
+"""
+from django.conf import settings
+from django.db import connections, router
+from django.db.models import Count, F, Q
+
+from .models import Follow, Post, Profile, TimelineEntry
+
+# Порядок ленты: по дате записи ленты, чтобы работал индекс
+# (user, -pub_date); у fan-out on read это дата поста.
+ORDERING = ('-entry_date', '-id')
+
+TRIM_SQL = """
+    DELETE FROM {entries} WHERE id IN (
+        SELECT id FROM (
+            SELECT id, ROW_NUMBER() OVER (
+                PARTITION BY user_id ORDER BY pub_date DESC, id DESC
+            ) AS position
+            FROM {entries} WHERE user_id IN ({users})
+        ) ranked WHERE position > %s
+    )
+"""
+FAN_OUT_SQL = """
+    {insert} {entries} (user_id, post_id, pub_date)
+    SELECT follows.user_id, recent.id, recent.pub_date
+    FROM {follows} follows, (
+        SELECT id, pub_date FROM {posts} WHERE author_id = %s
+        ORDER BY pub_date DESC, id DESC LIMIT %s
+    ) recent
+    WHERE follows.author_id = %s {suffix}
+"""
+
+
+def is_enabled():
+    return settings.TIMELINE_ENABLED
+
+
+def is_celebrity(author_id):
+    """Автор со слишком большим числом подписчиков для fan-out."""
+    return Profile.objects.filter(
+        user_id=author_id,
+        followers_count__gt=settings.TIMELINE_FANOUT_LIMIT,
+    ).exists()
+
+
+def followed_celebrities(user):
+    """id авторов из подписок пользователя, читаемых при запросе."""
+    return list(
+        Follow.objects.filter(
+            user=user,
+            author__profile__followers_count__gt=(
+                settings.TIMELINE_FANOUT_LIMIT),
+        ).values_list('author_id', flat=True)
+    )
+
+
+def _connection():
+    return connections[router.db_for_write(TimelineEntry)]
+
+
+def _tables():
+    return {
+        'entries': TimelineEntry._meta.db_table,
+        'follows': Follow._meta.db_table,
+        'posts': Post._meta.db_table,
+    }
+
+
+def trim(user_ids):
+    """Обрезает ленты до TIMELINE_SIZE самых свежих записей."""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    sql = TRIM_SQL.format(
+        users=', '.join(['%s'] * len(user_ids)), **_tables())
+    with _connection().cursor() as cursor:
+        cursor.execute(sql, [*user_ids, settings.TIMELINE_SIZE])
+
+
+def trim_overgrown(batch_size=500):
+    """Обрезает только ленты длиннее TIMELINE_SIZE, пачками читателей.
+
+    Возвращает число обрезанных лент.
+    """
+    user_ids = list(
+        TimelineEntry.objects.order_by().values('user_id')
+        .annotate(size=Count('id'))
+        .filter(size__gt=settings.TIMELINE_SIZE)
+        .values_list('user_id', flat=True)
+    )
+    for start in range(0, len(user_ids), batch_size):
+        trim(user_ids[start:start + batch_size])
+    return len(user_ids)
+
+
+def fan_out(post):
+    """Кладет новый пост в ленты всех подписчиков автора."""
+    if not is_enabled():
+        return
+    limit = settings.TIMELINE_FANOUT_LIMIT
+    follower_ids = list(
+        Follow.objects.filter(author_id=post.author_id)
+        .values_list('user_id', flat=True)[:limit + 1]
+    )
+    if len(follower_ids) > limit:
+        return
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+         for user_id in follower_ids],
+        ignore_conflicts=True,
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту последние посты автора после подписки."""
+    if not is_enabled() or is_celebrity(author_id):
+        return
+    posts = (
+        Post.objects.filter(author_id=author_id)
+        .order_by('-pub_date', '-id')
+        .values_list('id', 'pub_date')[:settings.TIMELINE_SIZE]
+    )
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+         for post_id, pub_date in posts],
+        ignore_conflicts=True,
+    )
+    trim([user_id])
+
+
+def restore_author(author_id):
+    """Раскладывает свежие посты автора, опустившегося до
+    TIMELINE_FANOUT_LIMIT подписчиков, по лентам подписчиков.
+
+    Вызывается после отписки; пока автор выше предела, его посты в
+    ленты не попадали.
+    """
+    if not is_enabled() or not Profile.objects.filter(
+            user_id=author_id,
+            followers_count=settings.TIMELINE_FANOUT_LIMIT).exists():
+        return
+    connection = _connection()
+    sql = FAN_OUT_SQL.format(
+        insert=connection.ops.insert_statement(ignore_conflicts=True),
+        suffix=connection.ops.ignore_conflicts_suffix_sql(
+            ignore_conflicts=True),
+        **_tables())
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [author_id, settings.TIMELINE_SIZE, author_id])
+
+
+def prune(user_id, author_id):
+    """Убирает из ленты посты автора после отписки."""
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id).delete()
+
+
+def rebuild(users=None):
+    """Пересобирает ленты целиком (после массового импорта)."""
+    follows = Follow.objects.all()
+    if users is not None:
+        follows = follows.filter(user__in=users)
+        TimelineEntry.objects.filter(user__in=users).delete()
+    else:
+        TimelineEntry.objects.all().delete()
+    if not is_enabled():
+        return
+    # Одна выборка на читателя: свежие посты всех его подписок сразу,
+    # без поочередного backfill и обрезки по каждой подписке.
+    user_ids = follows.order_by().values_list('user_id', flat=True)
+    for user_id in list(user_ids.distinct()):
+        posts = (
+            Post.objects.filter(
+                author__following__user_id=user_id,
+                author__profile__followers_count__lte=(
+                    settings.TIMELINE_FANOUT_LIMIT),
+            )
+            .order_by('-pub_date', '-id')
+            .values_list('id', 'pub_date')[:settings.TIMELINE_SIZE]
+        )
+        TimelineEntry.objects.bulk_create(
+            [TimelineEntry(user_id=user_id, post_id=post_id,
+                           pub_date=pub_date)
+             for post_id, pub_date in posts],
+            ignore_conflicts=True,
+        )
+
+
+def timeline_posts(user):
+    """Посты ленты подписок пользователя для порядка ORDERING."""
+    posts = Post.objects.for_feed()
+    if not is_enabled():
+        return posts.filter(author__following__user=user).annotate(
+            entry_date=F('pub_date'))
+    celebrities = followed_celebrities(user)
+    if not celebrities:
+        return posts.filter(timeline_entries__user=user).annotate(
+            entry_date=F('timeline_entries__pub_date'))
+    entries = TimelineEntry.objects.filter(user=user).values('post_id')
+    return posts.filter(
+        Q(pk__in=entries) | Q(author_id__in=celebrities)).annotate(
+        entry_date=F('pub_date'))
@@ -0,0 +1,223 @@
+"""Популярные посты (?sort=trending) по затухающей оценке.
+
+Оценка хранится в Post.trending_score и меняется по событиям, поэтому
+лента популярного — выборка по индексу (-trending_score, -id), без
+подсчета при запросе:
+- комментарий добавляет TRENDING_COMMENT_WEIGHT тем же UPDATE, что и
+  счетчик комментариев;
+- новый подписчик автора добавляет TRENDING_FOLLOW_WEIGHT его постам
+  за последние TRENDING_WINDOW_DAYS дней;
+- просмотр поста только увеличивает счетчик в кеше, без записи в базу.
+
+Команда update_trending (по cron раз в несколько минут) переносит
+накопленные просмотры в оценки с весом TRENDING_VIEW_WEIGHT и
+уменьшает все оценки вдвое за каждые TRENDING_HALF_LIFE часов с
+прошлого запуска. Пока она не запущена, просмотры на порядок ленты не
+влияют.
+
+Счетчики просмотров и время прошлого затухания лежат в кеше
+FEED_CACHE_ALIAS, поэтому он должен быть общим для воркеров и cron
+(memcached, redis, файловый или в БД). С locmem каждый процесс видит
+только свои просмотры, с dummy они не хранятся вовсе; update_trending
+в этом случае предупреждает (local_cache).
+"""
+import time
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import cache, counters
+from .models import Comment, Post
+from .paginator import DEFAULT_ORDERING, page_params
+
+SORT_PARAM = 'sort'
+TRENDING = 'trending'
+ORDERING = ('-trending_score', '-id')
+VIEWS_PREFIX = 'trending:views'
+DECAYED_KEY = 'trending:decayed-at'
+# Постов за один запрос при переносе просмотров
+CHUNK_SIZE = 500
+LOCAL_CACHES = (LocMemCache, DummyCache)
+
+
+def requested(request):
+    return request.GET.get(SORT_PARAM) == TRENDING
+
+
+def ordering(request):
+    """Порядок ленты по параметру ?sort=."""
+    return ORDERING if requested(request) else DEFAULT_ORDERING
+
+
+def feed_params(request):
+    """Параметры страницы ленты вместе с сортировкой."""
+    if requested(request):
+        return page_params(request, **{SORT_PARAM: TRENDING})
+    return page_params(request)
+
+
+def cache_names(request):
+    """Поколения кеша, от которых дополнительно зависит лента."""
+    return [cache.TRENDING] if requested(request) else []
+
+
+def comment_score(count=1):
+    """Выражение для UPDATE счетчика комментариев поста."""
+    return F('trending_score') + settings.TRENDING_COMMENT_WEIGHT * count
+
+
+def _window_start():
+    return timezone.now() - timedelta(days=settings.TRENDING_WINDOW_DAYS)
+
+
+def follow_gained(author_id):
+    """Поднимает свежие посты автора, у которого новый подписчик."""
+    counters.bump(
+        Post.objects.filter(author_id=author_id,
+                            pub_date__gte=_window_start()),
+        'trending_score', settings.TRENDING_FOLLOW_WEIGHT)
+    cache.bump(cache.TRENDING)
+
+
+def local_cache():
+    """Виден ли кеш просмотров только текущему процессу."""
+    return isinstance(cache.get_cache(), LOCAL_CACHES)
+
+
+def _views_key(post_id):
+    return f'{VIEWS_PREFIX}:{post_id}'
+
+
+def record_view(post_id):
+    store = cache.get_cache()
+    key = _views_key(post_id)
+    timeout = settings.TRENDING_WINDOW_DAYS * 24 * 60 * 60
+    if store.add(key, 1, timeout):
+        return
+    try:
+        store.incr(key)
+    except ValueError:
+        # Ключ истек между add и incr.
+        store.add(key, 1, timeout)
+
+
+def counts_views(view):
+    """Считает успешные GET-запросы к посту, в том числе ответы из
+    кеша страниц и 304.
+    """
+    @wraps(view)
+    def wrapper(request, post_id, *args, **kwargs):
+        response = view(request, post_id, *args, **kwargs)
+        if request.method == 'GET' and response.status_code in (200, 304):
+            record_view(post_id)
+        return response
+    return wrapper
+
+
+def apply_views():
+    """Переносит просмотры из кеша в оценки свежих постов.
+
+    Из счетчика вычитается перенесенное, а не удаляется ключ: просмотры,
+    пришедшие во время переноса, не теряются. Возвращает число
+    перенесенных просмотров.
+    """
+    store = cache.get_cache()
+    post_ids = Post.objects.filter(
+        pub_date__gte=_window_start()).values_list('pk', flat=True)
+    post_ids = list(post_ids.order_by('pk'))
+    total = 0
+    for start in range(0, len(post_ids), CHUNK_SIZE):
+        keys = {_views_key(pk): pk
+                for pk in post_ids[start:start + CHUNK_SIZE]}
+        views = store.get_many(list(keys))
+        posts = []
+        for key, count in views.items():
+            if count:
+                weight = settings.TRENDING_VIEW_WEIGHT * count
+                post = Post(pk=keys[key])
+                post.trending_score = F('trending_score') + weight
+                posts.append(post)
+                total += count
+        Post.objects.bulk_update(posts, ['trending_score'])
+        for key, count in views.items():
+            if not count:
+                continue
+            try:
+                store.decr(key, count)
+            except ValueError:
+                # Ключ истек после get_many: вычитать уже не из чего.
+                pass
+    return total
+
+
+def decay(now=None):
+    """Уменьшает оценки за время с прошлого запуска; возвращает
+    множитель.
+    """
+    store = cache.get_cache()
+    now = time.time() if now is None else now
+    last = store.get(DECAYED_KEY)
+    hours = (settings.TRENDING_DECAY_INTERVAL / 60 if last is None
+             else max(now - last, 0) / 3600)
+    factor = 0.5 ** (hours / settings.TRENDING_HALF_LIFE)
+    scored = Post.objects.filter(trending_score__gt=0)
+    with transaction.atomic():
+        scored.update(trending_score=F('trending_score') * factor)
+        scored.filter(trending_score__lt=settings.TRENDING_MIN_SCORE).update(
+            trending_score=0)
+    store.set(DECAYED_KEY, now, None)
+    return factor
+
+
+def update():
+    """Периодическая задача: затухание, затем новые просмотры."""
+    factor = decay()
+    views = apply_views()
+    cache.bump(cache.TRENDING)
+    return factor, views
+
+
+def rebuild(comments=None):
+    """Пересчитывает оценки с нуля по комментариям за окно.
+
+    Каждый комментарий весит TRENDING_COMMENT_WEIGHT с затуханием по
+    его возрасту; подписки и просмотры времени не хранят и не
+    учитываются. Нужна после первой миграции и массового импорта.
+    comments — только новые комментарии (импорт поверх базы): их вес
+    добавляется к текущим оценкам без сброса остальных.
+    """
+    now = timezone.now()
+    half_life = settings.TRENDING_HALF_LIFE * 3600
+    scores = {}
+    scored = Comment.objects.all() if comments is None else comments
+    rows = scored.filter(created__gte=_window_start()).values_list(
+        'post_id', 'created').iterator(chunk_size=CHUNK_SIZE * 10)
+    for post_id, created in rows:
+        age = (now - created).total_seconds()
+        scores[post_id] = scores.get(post_id, 0) + (
+            settings.TRENDING_COMMENT_WEIGHT * 0.5 ** (age / half_life))
+    if comments is None:
+        posts = [Post(pk=post_id, trending_score=score)
+                 for post_id, score in scores.items()
+                 if score >= settings.TRENDING_MIN_SCORE]
+    else:
+        posts = [Post(pk=post_id,
+                      trending_score=F('trending_score') + score)
+                 for post_id, score in scores.items()]
+    with transaction.atomic():
+        if comments is None:
+            Post.objects.filter(trending_score__gt=0).update(
+                trending_score=0)
+        # Пачки UPDATE ... CASE WHEN, размер под предел параметров базы.
+        Post.objects.bulk_update(posts, ['trending_score'],
+                                 batch_size=CHUNK_SIZE)
+    if comments is None:
+        cache.get_cache().set(DECAYED_KEY, now.timestamp(), None)
+    cache.bump(cache.TRENDING)
+    return len(scores)
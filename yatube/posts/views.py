@@ -1,74 +1,170 @@
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.http import (Http404, HttpResponseBadRequest,
+                         StreamingHttpResponse)
 from django.shortcuts import get_object_or_404, redirect, render
 from django.utils import timezone
+from django.views.decorators.http import condition
+from django.views.decorators.vary import vary_on_cookie
 
+from . import (cache, comment_queue, conditional, export, follow_graph,
+               search, suggestions, thumbnails, throttle, timeline,
+               trending)
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
+from .models import Follow, Post, User
+from .paginator import (CursorPaginator, decode_cursor, page_params,
+                        paginate)
 
 PER_PAGE = 10
+COMMENTS_PER_PAGE = 20
+COMMENT_ORDERING = ('created', 'id')
 
 
+def _index_page(request):
+    return [cache.feed_name('index'), *trending.cache_names(request)]
+
+
+def _found(obj):
+    if obj is None:
+        raise Http404
+    return obj
+
+
+def _group_page(request, slug):
+    group = conditional.group(request, slug)
+    if group is None:
+        return None
+    return [cache.feed_name('group', group.pk),
+            *trending.cache_names(request)]
+
+
+def _profile_page(request, username):
+    author = conditional.author(request, username)
+    if author is None:
+        return None
+    return [cache.feed_name('profile', author.pk)]
+
+
+def _post_params(request):
+    """Параметры страницы поста: еще и курсор комментариев ?comments=."""
+    comments = request.GET.get('comments')
+    if comments and decode_cursor(comments) is not None:
+        return page_params(request, comments=comments)
+    return page_params(request)
+
+
+def _post_page(request, post_id):
+    post = conditional.post(request, post_id)
+    if post is None:
+        return None
+    return [cache.feed_name('post', post_id),
+            cache.feed_name('profile', post.author_id)]
+
+
+@vary_on_cookie
+@condition(etag_func=conditional.index_etag)
+@cache.anonymous_page(_index_page)
 def index(request):
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = Post.objects.for_feed()
+    params = trending.feed_params(request)
+    page_obj = paginate(
+        request, post_list, PER_PAGE, trending.ordering(request), params)
+    cache.annotate_cards(page_obj.object_list)
 
     template = 'posts/index.html'
     context = {
         'page_obj': page_obj,
+        'trending': trending.requested(request),
+        'feed_cache_key': cache.feed_key(
+            params, 'index', extra=trending.cache_names(request)),
     }
     return render(request, template, context)
 
 
+@vary_on_cookie
+@condition(etag_func=conditional.group_etag)
+@cache.anonymous_page(_group_page)
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    paginator = Paginator(post_list, PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    group = _found(conditional.group(request, slug))
+    post_list = group.posts.for_feed()
+    params = trending.feed_params(request)
+    page_obj = paginate(
+        request, post_list, PER_PAGE, trending.ordering(request), params)
+    cache.annotate_cards(page_obj.object_list)
     template = 'posts/group_list.html'
     context = {
         'group': group,
         'page_obj': page_obj,
+        'trending': trending.requested(request),
+        'feed_cache_key': cache.feed_key(
+            params, 'group', group.pk,
+            extra=trending.cache_names(request)),
     }
     return render(request, template, context)
 
 
+@vary_on_cookie
+@condition(etag_func=conditional.profile_etag)
+@cache.anonymous_page(_profile_page)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    post_list = Post.objects.filter(author__username=username)
-    paginator = Paginator(post_list, PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    following = Follow.objects.filter(user__username=request.user,
-                                      author=author)
+    author = _found(conditional.author(request, username))
+    post_list = Post.objects.for_feed().filter(author=author)
+    params = page_params(request)
+    page_obj = paginate(request, post_list, PER_PAGE, params=params)
+    cache.annotate_cards(page_obj.object_list)
+    following = follow_graph.is_following(request.user, author)
     context = {
         'author': author,
         'page_obj': page_obj,
         'following': following,
+        'feed_cache_key': cache.feed_key(params, 'profile', author.pk),
+        'suggestions': suggestions.for_user(request.user, author.pk),
     }
     return render(request, 'posts/profile.html', context)
 
 
+@trending.counts_views
+@vary_on_cookie
+@condition(etag_func=conditional.post_detail_etag)
+@cache.anonymous_page(_post_page, _post_params)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = _found(conditional.post(request, post_id))
     comment_form = CommentForm(request.POST or None)
-    comments = post.comments.all()
+    # Без JS «Показать еще» открывает пост со следующей страницей
+    # комментариев в параметре ?comments=.
+    comments = _comments_page(post, request.GET.get('comments'))
     author = post.author
-    following = Follow.objects.filter(user__username=request.user,
-                                      author=author)
+    following = follow_graph.is_following(request.user, author)
     context = {
         'author': author,
         'post': post,
         'form': comment_form,
         'following': following,
         'comments': comments,
+        'pending_comments': comment_queue.pending(post.pk, request.user),
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+def _comments_page(post, cursor):
+    paginator = CursorPaginator(
+        post.comments.select_related('author'), COMMENTS_PER_PAGE,
+        COMMENT_ORDERING)
+    return paginator.get_page(cursor)
+
+
+@cache.anonymous_page(_post_page)
+def post_comments(request, post_id):
+    """Следующая страница комментариев для кнопки «Показать еще»."""
+    post = get_object_or_404(Post.objects.only('id'), id=post_id)
+    context = {
+        'post': post,
+        'comments': _comments_page(post, request.GET.get('cursor')),
+    }
+    return render(request, 'posts/includes/comment_list.html', context)
+
+
 @login_required
 def post_create(request):
     form = PostForm(request.POST or None, files=request.FILES or None)
@@ -77,6 +173,7 @@ def post_create(request):
         post.author = request.user
         post.published_date = timezone.now()
         post.save()
+        thumbnails.schedule(post.image)
         return redirect('posts:profile', username=post.author)
     context = {
         'form': form
@@ -94,7 +191,8 @@ def post_edit(request, post_id):
         files=request.FILES or None,
         instance=post)
     if request.method == "POST" and form.is_valid():
-        form.save()
+        post = form.save()
+        thumbnails.schedule(post.image)
         return redirect('posts:post_detail', post_id=post_id)
     context = {
         'form': form,
@@ -108,21 +206,28 @@ def add_comment(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     form = CommentForm(request.POST or None)
     if form.is_valid():
-        comment = form.save(commit=False)
-        comment.author = request.user
-        comment.post = post
-        comment.save()
+        delay = throttle.comment_delay(request.user.pk, post.pk)
+        if delay:
+            return throttle.too_many_requests(delay)
+        if settings.COMMENT_WRITE_BEHIND:
+            comment_queue.enqueue(
+                post.pk, request.user.pk, form.cleaned_data['text'])
+        else:
+            comment = form.save(commit=False)
+            comment.author = request.user
+            comment.post = post
+            comment.save()
     return redirect('posts:post_detail', post_id=post_id)
 
 
 @login_required
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(post_list, PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = timeline.timeline_posts(request.user)
+    page_obj = paginate(request, post_list, PER_PAGE, timeline.ORDERING)
+    cache.annotate_cards(page_obj.object_list)
     context = {
         'page_obj': page_obj,
+        'suggestions': suggestions.for_user(request.user),
     }
     return render(request, 'posts/follow.html', context)
 
@@ -137,7 +242,54 @@ def profile_follow(request, username):
 @login_required
 def profile_unfollow(request, username):
     user = get_object_or_404(User, username=username)
-    follow, created = Follow.objects.get_or_create(
-        user=request.user, author=user)
-    follow.delete()
+    Follow.objects.filter(user=request.user, author=user).delete()
     return redirect('posts:profile', username)
+
+
+def search_results(request):
+    query = request.GET.get('q', '').strip()
+    page_number = CursorPaginator.page_number(request.GET.get('page'))
+    results = []
+    has_next = False
+    if query:
+        found = search.search(
+            query, PER_PAGE + 1, (page_number - 1) * PER_PAGE)
+        has_next = len(found) > PER_PAGE
+        results = search.load_results(found[:PER_PAGE])
+    context = {
+        'query': query,
+        'results': results,
+        'page_number': page_number,
+        'has_next': has_next,
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@staff_member_required
+def export_data(request):
+    kind = request.GET.get('kind', 'posts')
+    export_format = request.GET.get('format', 'ndjson')
+    compress = request.GET.get('gzip') == '1'
+    try:
+        chunks = export.stream(
+            kind,
+            export_format,
+            compress=compress,
+            since=export.parse_moment(request.GET.get('since')),
+            until=export.parse_moment(request.GET.get('until'), end=True),
+            author=request.GET.get('author'),
+            group=request.GET.get('group'),
+        )
+    except ValueError as error:
+        return HttpResponseBadRequest(str(error))
+    content_types = {
+        'ndjson': 'application/x-ndjson; charset=utf-8',
+        'csv': 'text/csv; charset=utf-8',
+    }
+    response = StreamingHttpResponse(
+        chunks,
+        content_type=('application/gzip' if compress
+                      else content_types[export_format]))
+    response['Content-Disposition'] = 'attachment; filename="%s"' % (
+        export.filename(kind, export_format, compress))
+    return response
@@ -18,12 +18,16 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from core.views import metrics_view
+
 handler404 = 'core.views.page_not_found'
 handler500 = 'core.views.server_error'
 urlpatterns = [
     path('about/', include('about.urls', namespace='about')),
     path('auth/', include('users.urls', namespace='users')),
     path('auth/', include('django.contrib.auth.urls')),
+    path('api/v1/', include('posts.api_urls', namespace='api')),
+    path('metrics/', metrics_view, name='metrics'),
     path('', include('posts.urls')),
     path('admin/', admin.site.urls),
 ]